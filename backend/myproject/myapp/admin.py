@@ -1,14 +1,18 @@
 from django.contrib import admin, messages
-from .models import Cart, Categories, Faq, OrderItems, Orders, Products, Subcategories, Users
+from .models import Broadcasts, Cart, Categories, Faq, OrderItems, Orders, Products, Subcategories, Users
 from django.utils.html import format_html
-from django.urls import path
+from django.urls import path, reverse
 from django.http import HttpResponseRedirect
-import requests
+from django.core.exceptions import PermissionDenied
+from django.template.response import TemplateResponse
 import os
 from pathlib import Path
 import environ
 from asgiref.sync import sync_to_async
 
+from .catalog_import import COLUMNS, detect_format, import_catalog
+from .paginators import EstimatedCountPaginator
+
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 env = environ.Env()
@@ -32,46 +36,135 @@ class UsersAdmin(admin.ModelAdmin):
 
     def custom_action(self, request):
         if request.method == 'POST':
-            success = True
             message = request.POST.get('message', '')
-            users = Users.objects.all()
-            for user in users:
-                TOKEN = env('BOT_TOKEN')
-                CHAT_ID = user.user_id 
-                TEXT = message
-
-                print(TOKEN)
-                print(CHAT_ID)
-                print(TEXT)
-
-                url = f"https://api.telegram.org/bot{TOKEN}/sendMessage"
-
-                payload = {
-                    "chat_id": CHAT_ID,
-                    "text": TEXT,
-                    "parse_mode": "Markdown"
-                }
-
-                response = requests.post(url, json=payload)
-
-                if response.status_code == 200:
-                    print("✅ Сообщение отправлено!")
-                else:
-                    success = False
-                    print(f"❌ Ошибка отправки: {response.text}")
-
-            if success:
-                self.message_user(request, "Рассылка выполнена успешно для всех пользователей.", messages.SUCCESS)
+            if not message:
+                self.message_user(request, "Рассылка не выполнена: пустое сообщение.", messages.ERROR)
             else:
-                self.message_user(request, "Рассылка не выполнена.", messages.ERROR)
+                # Рассылку выполняет воркер run_broadcasts, здесь только ставим её в очередь
+                broadcast = Broadcasts.objects.create(text=message)
+                self.message_user(request, f"Рассылка #{broadcast.pk} поставлена в очередь.", messages.SUCCESS)
             return HttpResponseRedirect(request.META.get('HTTP_REFERER', '/admin/myapp/users/'))
 
 
-admin.site.register(Cart)
+class BroadcastsAdmin(admin.ModelAdmin):
+    list_display = ('id', 'status', 'created_at', 'started_at', 'finished_at', 'sent_count', 'failed_count')
+    list_filter = ('status',)
+    readonly_fields = ('created_at', 'started_at', 'finished_at', 'last_user_id', 'sent_count', 'failed_count')
+    actions = ['cancel_broadcasts']
+
+    @admin.action(description="Отменить выбранные рассылки")
+    def cancel_broadcasts(self, request, queryset):
+        cancelled = queryset.filter(
+            status__in=(Broadcasts.STATUS_PENDING, Broadcasts.STATUS_RUNNING)
+        ).update(status=Broadcasts.STATUS_CANCELLED)
+        self.message_user(request, f"Отменено рассылок: {cancelled}.", messages.SUCCESS)
+
+
+class ProductsAdmin(admin.ModelAdmin):
+    change_list_template = "admin/myapp/products_change_list.html"
+
+    def get_urls(self):
+        urls = super().get_urls()
+        custom_urls = [
+            path('import/', self.admin_site.admin_view(self.import_view), name='myapp_products_import'),
+        ]
+        return custom_urls + urls
+
+    def import_view(self, request):
+        """Загрузка каталога из CSV/JSONL (см. catalog_import.py)."""
+        if not (self.has_add_permission(request) and self.has_change_permission(request)):
+            raise PermissionDenied
+        if request.method == 'POST':
+            upload = request.FILES.get('file')
+            if not upload:
+                self.message_user(request, "Выберите файл.", messages.ERROR)
+                return HttpResponseRedirect(request.path)
+            try:
+                result = import_catalog(upload.file, detect_format(upload.name))
+            except ValueError as e:
+                self.message_user(request, f"Импорт не выполнен: {e}", messages.ERROR)
+                return HttpResponseRedirect(request.path)
+            self.message_user(request, result.summary(), messages.SUCCESS)
+            for line_number, error in result.rejects[:20]:
+                self.message_user(request, f"Строка {line_number}: {error}", messages.WARNING)
+            return HttpResponseRedirect(reverse('admin:myapp_products_changelist'))
+
+        context = {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'title': "Импорт каталога",
+            'columns': COLUMNS,
+        }
+        return TemplateResponse(request, "admin/myapp/products_import.html", context)
+
+
+class OrderStatusFilter(admin.SimpleListFilter):
+    """Фильтр по статусу с фиксированными вариантами.
+
+    Стандартный list_filter = ('status',) строит варианты запросом
+    SELECT DISTINCT status по всей таблице заказов на каждое открытие списка.
+    """
+    title = "статус"
+    parameter_name = 'status'
+
+    def lookups(self, request, model_admin):
+        return (('paid', "Оплачен"), ('new', "Не оплачен"), ('expired', "Истёк срок оплаты"))
+
+    def queryset(self, request, queryset):
+        if self.value() in ('paid', 'expired'):
+            return queryset.filter(status=self.value())
+        if self.value() == 'new':
+            return queryset.filter(status__isnull=True)
+        return queryset
+
+
+class OrderItemsInline(admin.TabularInline):
+    model = OrderItems
+    extra = 0
+    fields = ('product', 'quantity')
+    # Только для чтения: виджет raw_id_fields делал бы отдельный запрос товара на каждую позицию
+    readonly_fields = ('product',)
+
+    def get_queryset(self, request):
+        # Товары позиций загружаются тем же запросом, что и позиции
+        return super().get_queryset(request).select_related('product')
+
+
+class OrdersAdmin(admin.ModelAdmin):
+    list_display = ('order_id', 'user_id', 'status', 'total_price', 'created_at')
+    list_filter = (OrderStatusFilter, ('created_at', admin.DateFieldListFilter))
+    search_fields = ('=order_id', '=user_id')
+    ordering = ('-order_id',)
+    inlines = (OrderItemsInline,)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+
+class OrderItemsAdmin(admin.ModelAdmin):
+    list_display = ('id', 'order', 'product', 'quantity')
+    list_select_related = ('order', 'product')
+    raw_id_fields = ('order', 'product')
+    ordering = ('-id',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+
+class CartAdmin(admin.ModelAdmin):
+    list_display = ('id', 'user_id', 'product', 'quantity', 'updated_at')
+    list_select_related = ('product',)
+    raw_id_fields = ('product',)
+    search_fields = ('=user_id',)
+    ordering = ('-id',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+
+admin.site.register(Cart, CartAdmin)
 admin.site.register(Categories)
 admin.site.register(Faq)
-admin.site.register(OrderItems)
-admin.site.register(Orders)
-admin.site.register(Products)
+admin.site.register(OrderItems, OrderItemsAdmin)
+admin.site.register(Orders, OrdersAdmin)
+admin.site.register(Products, ProductsAdmin)
 admin.site.register(Subcategories)
-admin.site.register(Users, UsersAdmin)
\ No newline at end of file
+admin.site.register(Users, UsersAdmin)
+admin.site.register(Broadcasts, BroadcastsAdmin)
\ No newline at end of file
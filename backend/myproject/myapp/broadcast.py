@@ -0,0 +1,176 @@
+import asyncio
+import time
+from itertools import islice
+
+import aiohttp
+from django.db import connection
+from django.db.models import F
+from django.utils import timezone
+
+from .models import BroadcastFailures, Broadcasts, Users
+
+# Лимиты Bot API: ~30 сообщений в секунду всего и ~1 сообщение в секунду в один чат
+GLOBAL_RATE = 30
+PER_CHAT_INTERVAL = 1.0
+
+CHUNK_SIZE = 1000  # Получателей за один проход курсора (и между сохранениями прогресса)
+CONCURRENCY = 50  # Одновременных HTTP-запросов к Bot API
+MAX_ATTEMPTS = 5
+LOCK_NAMESPACE = 5001  # Первый ключ advisory-блокировки рассылок (второй — id рассылки)
+
+
+class TokenBucket:
+    """Асинхронный token bucket: не больше rate запросов в секунду с запасом capacity."""
+
+    def __init__(self, rate: float, capacity: float | None = None):
+        self.rate = rate
+        self.capacity = capacity or rate
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+                self.updated_at = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    def pause(self, seconds: float):
+        """Останавливает выдачу токенов на seconds (после 429 от Telegram)."""
+        self.tokens = min(self.tokens, 0) - seconds * self.rate
+
+
+class BroadcastSender:
+    """Отправляет сообщения через Bot API параллельно, соблюдая лимиты Telegram."""
+
+    def __init__(self, token: str, api_url: str = "https://api.telegram.org",
+                 rate: float = GLOBAL_RATE, concurrency: int = CONCURRENCY):
+        self.url = f"{api_url.rstrip('/')}/bot{token}/sendMessage"
+        self.bucket = TokenBucket(rate)
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.concurrency = concurrency
+        self.chat_next_send = {}
+        self.session = None
+
+    async def start(self):
+        self.session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=self.concurrency),
+            timeout=aiohttp.ClientTimeout(total=30),
+        )
+
+    async def close(self):
+        if self.session:
+            await self.session.close()
+
+    async def _wait_for_chat(self, chat_id: int):
+        """Выдерживает интервал между сообщениями в один чат."""
+        now = time.monotonic()
+        next_send = self.chat_next_send.get(chat_id, now)
+        self.chat_next_send[chat_id] = max(now, next_send) + PER_CHAT_INTERVAL
+        if next_send > now:
+            await asyncio.sleep(next_send - now)
+
+    async def send(self, chat_id: int, text: str) -> str | None:
+        """Отправляет одно сообщение. Возвращает None при успехе или текст ошибки."""
+        payload = {"chat_id": chat_id, "text": text, "parse_mode": "Markdown"}
+        error = None
+        async with self.semaphore:
+            for attempt in range(MAX_ATTEMPTS):
+                await self._wait_for_chat(chat_id)
+                await self.bucket.acquire()
+                try:
+                    async with self.session.post(self.url, json=payload) as response:
+                        data = await response.json(content_type=None)
+                except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+                    error = f"{type(e).__name__}: {e}"
+                    await asyncio.sleep(2 ** attempt)
+                    continue
+
+                if data.get("ok"):
+                    return None
+                error = f"{data.get('error_code')}: {data.get('description')}"
+                if data.get("error_code") == 429:
+                    # Flood control: ждём, сколько сказал Telegram, и тормозим всех отправителей
+                    retry_after = data.get("parameters", {}).get("retry_after", 1)
+                    self.bucket.pause(retry_after)
+                    await asyncio.sleep(retry_after)
+                elif response.status >= 500:
+                    await asyncio.sleep(2 ** attempt)
+                else:
+                    # 400/403: чат не найден, бот заблокирован и т.п. — повтор не поможет
+                    return error
+        return error
+
+    async def send_many(self, chat_ids: list[int], text: str) -> dict[int, str]:
+        """Отправляет сообщение в пачку чатов. Возвращает ошибки по chat_id."""
+        self.chat_next_send.clear()
+        errors = await asyncio.gather(*(self.send(chat_id, text) for chat_id in chat_ids))
+        return {chat_id: error for chat_id, error in zip(chat_ids, errors) if error}
+
+
+def recipients(after_user_id: int | None):
+    """Потоково отдаёт user_id получателей через серверный курсор, начиная после курсора."""
+    users = Users.objects.order_by('user_id')
+    if after_user_id is not None:
+        users = users.filter(user_id__gt=after_user_id)
+    return users.values_list('user_id', flat=True).iterator(chunk_size=CHUNK_SIZE)
+
+
+def run_broadcast(broadcast: Broadcasts, token: str, api_url: str, rate: float = GLOBAL_RATE,
+                  concurrency: int = CONCURRENCY, log=print):
+    """Выполняет (или продолжает) рассылку, сохраняя прогресс после каждой пачки."""
+    if broadcast.started_at is None:
+        broadcast.started_at = timezone.now()
+    broadcast.status = Broadcasts.STATUS_RUNNING
+    broadcast.save(update_fields=['status', 'started_at'])
+
+    loop = asyncio.new_event_loop()
+    sender = BroadcastSender(token, api_url, rate, concurrency)
+    loop.run_until_complete(sender.start())
+    try:
+        users = recipients(broadcast.last_user_id)
+        while chunk := list(islice(users, CHUNK_SIZE)):
+            started = time.monotonic()
+            errors = loop.run_until_complete(sender.send_many(chunk, broadcast.text))
+
+            BroadcastFailures.objects.bulk_create(
+                BroadcastFailures(broadcast=broadcast, user_id=user_id, error=error)
+                for user_id, error in errors.items()
+            )
+            Broadcasts.objects.filter(pk=broadcast.pk).update(
+                last_user_id=chunk[-1],
+                sent_count=F('sent_count') + len(chunk) - len(errors),
+                failed_count=F('failed_count') + len(errors),
+            )
+            log(f"📨 Рассылка #{broadcast.pk}: {len(chunk)} получателей за "
+                f"{time.monotonic() - started:.1f} с, ошибок {len(errors)}")
+
+            broadcast.refresh_from_db(fields=['status'])
+            if broadcast.status == Broadcasts.STATUS_CANCELLED:
+                log(f"⛔ Рассылка #{broadcast.pk} отменена.")
+                return
+    finally:
+        loop.run_until_complete(sender.close())
+        loop.close()
+
+    broadcast.status = Broadcasts.STATUS_DONE
+    broadcast.finished_at = timezone.now()
+    broadcast.save(update_fields=['status', 'finished_at'])
+    log(f"✅ Рассылка #{broadcast.pk} завершена.")
+
+
+def try_lock(broadcast: Broadcasts) -> bool:
+    """Захватывает рассылку advisory-блокировкой, чтобы её не выполняли два воркера сразу."""
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT pg_try_advisory_lock(%s, %s)", [LOCK_NAMESPACE, broadcast.pk])
+        return cursor.fetchone()[0]
+
+
+def unlock(broadcast: Broadcasts):
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT pg_advisory_unlock(%s, %s)", [LOCK_NAMESPACE, broadcast.pk])
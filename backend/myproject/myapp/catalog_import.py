@@ -0,0 +1,222 @@
+import csv
+import io
+import json
+import time
+from dataclasses import dataclass, field
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+from pathlib import Path
+
+from django.db import connection, transaction
+
+from .signals import notify_catalog_changed
+
+# Колонки файла импорта: CSV с заголовком или JSONL с такими ключами
+COLUMNS = ('sku', 'name', 'description', 'price', 'image_url', 'category', 'subcategory')
+REQUIRED = ('sku', 'name', 'price', 'category', 'subcategory')
+
+CHUNK_SIZE = 5000  # Строк на одну проверку и один COPY
+MAX_PRICE = Decimal('99999999.99')  # numeric(10, 2)
+MAX_REJECTS_KEPT = 1000  # Сколько отклонённых строк запоминать для отчёта (считаются все)
+LOCK_KEY = 5002  # Ключ advisory-блокировки: импорты каталога идут по одному
+
+STAGING_SQL = """
+    CREATE TEMP TABLE catalog_import (
+        line integer,
+        sku text,
+        name text,
+        description text,
+        price numeric(10, 2),
+        image_url text,
+        category text,
+        subcategory text
+    ) ON COMMIT DROP
+"""
+
+COPY_SQL = ("COPY catalog_import (line, sku, name, description, price, image_url, category, subcategory) "
+            "FROM STDIN WITH (FORMAT csv)")
+
+# Одно выражение переносит весь файл: создаёт недостающие категории и подкатегории
+# (по названию), вставляет новые товары и обновляет изменившиеся по sku.
+# Если у товара сменилась картинка, file_id сбрасывается — бот загрузит её заново.
+UPSERT_SQL = """
+    WITH rows AS (
+        SELECT DISTINCT ON (sku) * FROM catalog_import ORDER BY sku, line DESC
+    ), new_categories AS (
+        INSERT INTO categories (name)
+        SELECT DISTINCT r.category FROM rows r
+        WHERE NOT EXISTS (SELECT 1 FROM categories c WHERE c.name = r.category)
+        RETURNING id, name
+    ), all_categories AS (
+        SELECT id, name FROM new_categories
+        UNION ALL
+        (SELECT DISTINCT ON (name) id, name FROM categories
+         WHERE name IN (SELECT category FROM rows)
+         ORDER BY name, id)
+    ), new_subcategories AS (
+        INSERT INTO subcategories (category_id, name)
+        SELECT DISTINCT c.id, r.subcategory
+        FROM rows r JOIN all_categories c ON c.name = r.category
+        WHERE NOT EXISTS (SELECT 1 FROM subcategories s WHERE s.category_id = c.id AND s.name = r.subcategory)
+        RETURNING id, category_id, name
+    ), all_subcategories AS (
+        SELECT id, category_id, name FROM new_subcategories
+        UNION ALL
+        (SELECT DISTINCT ON (s.category_id, s.name) s.id, s.category_id, s.name
+         FROM subcategories s JOIN all_categories c ON s.category_id = c.id
+         ORDER BY s.category_id, s.name, s.id)
+    ), upserted AS (
+        INSERT INTO products AS p (sku, name, description, price, image_url, subcategory_id)
+        SELECT r.sku, r.name, r.description, r.price, r.image_url, s.id
+        FROM rows r
+        JOIN all_categories c ON c.name = r.category
+        JOIN all_subcategories s ON s.category_id = c.id AND s.name = r.subcategory
+        ON CONFLICT (sku) DO UPDATE
+        SET name = EXCLUDED.name,
+            description = EXCLUDED.description,
+            price = EXCLUDED.price,
+            image_url = EXCLUDED.image_url,
+            subcategory_id = EXCLUDED.subcategory_id,
+            image_file_id = CASE WHEN p.image_url IS DISTINCT FROM EXCLUDED.image_url
+                                 THEN NULL ELSE p.image_file_id END
+        WHERE (p.name, p.description, p.price, p.image_url, p.subcategory_id)
+              IS DISTINCT FROM (EXCLUDED.name, EXCLUDED.description, EXCLUDED.price,
+                                EXCLUDED.image_url, EXCLUDED.subcategory_id)
+        RETURNING xmax = 0 AS inserted
+    )
+    SELECT (SELECT count(*) FROM rows),
+           (SELECT count(*) FROM new_categories),
+           (SELECT count(*) FROM new_subcategories),
+           count(*) FILTER (WHERE inserted),
+           count(*) FILTER (WHERE NOT inserted)
+    FROM upserted
+"""
+
+
+@dataclass
+class ImportResult:
+    rows: int = 0  # Строк в файле
+    inserted: int = 0
+    updated: int = 0
+    unchanged: int = 0
+    duplicates: int = 0  # Повторы sku в файле: берётся последняя строка
+    new_categories: int = 0
+    new_subcategories: int = 0
+    rejected: int = 0
+    rejects: list = field(default_factory=list)  # (номер строки, ошибка), не больше MAX_REJECTS_KEPT
+    seconds: float = 0
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.seconds if self.seconds else 0
+
+    def summary(self) -> str:
+        return (f"Строк: {self.rows}, добавлено: {self.inserted}, обновлено: {self.updated}, "
+                f"без изменений: {self.unchanged}, повторов sku: {self.duplicates}, отклонено: {self.rejected}; "
+                f"новых категорий: {self.new_categories}, подкатегорий: {self.new_subcategories}; "
+                f"{self.seconds:.1f} с, {self.rows_per_second:.0f} строк/с")
+
+
+def detect_format(file_name: str) -> str:
+    """Формат по расширению: .csv или .jsonl (.ndjson)."""
+    suffix = Path(file_name).suffix.lower()
+    if suffix == '.csv':
+        return 'csv'
+    if suffix in ('.jsonl', '.ndjson'):
+        return 'jsonl'
+    raise ValueError(f"Не удалось определить формат по расширению {suffix or '(нет)'}")
+
+
+def read_rows(binary_file, file_format: str):
+    """Построчно читает CSV или JSONL, не загружая файл в память. Отдаёт (номер строки, dict)."""
+    text = io.TextIOWrapper(binary_file, encoding='utf-8-sig', newline='')
+    if file_format == 'csv':
+        reader = csv.DictReader(text)
+        missing = set(REQUIRED) - set(reader.fieldnames or ())
+        if missing:
+            raise ValueError(f"В заголовке CSV нет колонок: {', '.join(sorted(missing))}")
+        for row in reader:
+            yield reader.line_num, row
+    elif file_format == 'jsonl':
+        for line_number, line in enumerate(text, 1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as e:
+                yield line_number, e
+                continue
+            yield line_number, row if isinstance(row, dict) else ValueError("ожидается JSON-объект")
+    else:
+        raise ValueError(f"Неизвестный формат: {file_format}")
+
+
+def clean_row(row: dict) -> tuple:
+    """Проверяет строку и приводит значения к типам таблицы; ValueError — строка отклоняется."""
+    values = {}
+    for column in COLUMNS:
+        value = row.get(column)
+        value = '' if value is None else str(value).strip()
+        if not value and column in REQUIRED:
+            raise ValueError(f"пустое поле {column}")
+        values[column] = value or None
+
+    try:
+        price = Decimal(values['price'].replace(',', '.'))
+    except InvalidOperation:
+        raise ValueError(f"цена не число: {values['price']}")
+    if not price.is_finite() or price < 0 or price > MAX_PRICE:
+        raise ValueError(f"недопустимая цена: {values['price']}")
+    values['price'] = price.quantize(Decimal('0.01'))
+
+    if values['image_url'] and not values['image_url'].startswith(('http://', 'https://')):
+        raise ValueError(f"image_url не http(s)-ссылка: {values['image_url']}")
+    return tuple(values[column] for column in COLUMNS)
+
+
+def import_catalog(binary_file, file_format: str, chunk_size: int = CHUNK_SIZE, log=None) -> ImportResult:
+    """Загружает каталог из файла: проверка пачками, COPY во временную таблицу и один upsert.
+
+    Всё выполняется в одной транзакции: при ошибке каталог не меняется.
+    После коммита бот получает уведомления и сбрасывает кэши каталога.
+    """
+    result = ImportResult()
+    started = time.monotonic()
+    rows = read_rows(binary_file, file_format)
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute("SELECT pg_advisory_xact_lock(%s)", [LOCK_KEY])
+        cursor.execute(STAGING_SQL)
+        while chunk := list(islice(rows, chunk_size)):
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            for line_number, row in chunk:
+                result.rows += 1
+                try:
+                    if isinstance(row, Exception):
+                        raise row
+                    writer.writerow((line_number, *clean_row(row)))
+                except ValueError as e:
+                    result.rejected += 1
+                    if len(result.rejects) < MAX_REJECTS_KEPT:
+                        result.rejects.append((line_number, str(e)))
+            buffer.seek(0)
+            cursor.copy_expert(COPY_SQL, buffer)
+            if log:
+                log(f"Прочитано строк: {result.rows}, отклонено: {result.rejected}")
+
+        cursor.execute(UPSERT_SQL)
+        distinct, result.new_categories, result.new_subcategories, result.inserted, result.updated = \
+            cursor.fetchone()
+        result.duplicates = result.rows - result.rejected - distinct
+        result.unchanged = distinct - result.inserted - result.updated
+
+        if result.new_categories:
+            notify_catalog_changed('categories')
+        if result.new_subcategories:
+            notify_catalog_changed('subcategories')
+        if result.inserted or result.updated:
+            notify_catalog_changed('products')
+
+    result.seconds = time.monotonic() - started
+    return result
@@ -0,0 +1,33 @@
+import csv
+
+from django.core.management.base import BaseCommand, CommandError
+
+from myapp.catalog_import import CHUNK_SIZE, detect_format, import_catalog
+
+
+class Command(BaseCommand):
+    help = "Импорт каталога из CSV или JSONL: добавляет и обновляет товары по sku, создаёт категории."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="файл с колонками sku, name, description, price, image_url, "
+                                         "category, subcategory")
+        parser.add_argument('--format', choices=('csv', 'jsonl'), help="формат файла (по умолчанию — по расширению)")
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help="строк на одну пачку COPY")
+        parser.add_argument('--rejects', help="CSV-файл, куда записать отклонённые строки")
+
+    def handle(self, *args, **options):
+        try:
+            file_format = options['format'] or detect_format(options['path'])
+            with open(options['path'], 'rb') as file:
+                result = import_catalog(file, file_format, options['chunk_size'], log=self.stdout.write)
+        except (OSError, ValueError) as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(self.style.SUCCESS(result.summary()))
+        for line_number, error in result.rejects[:20]:
+            self.stdout.write(self.style.WARNING(f"Строка {line_number}: {error}"))
+        if options['rejects'] and result.rejects:
+            with open(options['rejects'], 'w', newline='', encoding='utf-8') as file:
+                writer = csv.writer(file)
+                writer.writerow(('line', 'error'))
+                writer.writerows(result.rejects)
@@ -0,0 +1,43 @@
+import time
+
+import environ
+from django.core.management.base import BaseCommand
+
+from myapp.broadcast import CONCURRENCY, GLOBAL_RATE, run_broadcast, try_lock, unlock
+from myapp.models import Broadcasts
+
+env = environ.Env()
+
+
+class Command(BaseCommand):
+    help = "Воркер рассылок: выполняет рассылки из очереди и продолжает прерванные."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--api-url', default=env('TELEGRAM_API_URL', default='https://api.telegram.org'),
+                            help="адрес Bot API (например, локальный тестовый сервер)")
+        parser.add_argument('--rate', type=float, default=GLOBAL_RATE, help="сообщений в секунду")
+        parser.add_argument('--concurrency', type=int, default=CONCURRENCY, help="одновременных запросов")
+        parser.add_argument('--interval', type=float, default=5, help="пауза между проверками очереди, сек")
+        parser.add_argument('--once', action='store_true', help="обработать очередь и выйти")
+
+    def handle(self, *args, **options):
+        token = env('BOT_TOKEN')
+        while True:
+            broadcasts = Broadcasts.objects.filter(
+                status__in=(Broadcasts.STATUS_PENDING, Broadcasts.STATUS_RUNNING)
+            ).order_by('pk')
+            for broadcast in broadcasts:
+                # Рассылку со статусом running может прямо сейчас выполнять другой воркер
+                if not try_lock(broadcast):
+                    continue
+                try:
+                    broadcast.refresh_from_db()
+                    if broadcast.status in (Broadcasts.STATUS_PENDING, Broadcasts.STATUS_RUNNING):
+                        run_broadcast(broadcast, token, options['api_url'], options['rate'],
+                                      options['concurrency'], log=self.stdout.write)
+                finally:
+                    unlock(broadcast)
+
+            if options['once']:
+                return
+            time.sleep(options['interval'])
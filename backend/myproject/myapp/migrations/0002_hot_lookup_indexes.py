@@ -0,0 +1,33 @@
+# Generated by Django 5.1.5 on 2026-10-18 11:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='cart',
+            index=models.Index(fields=['user_id'], include=('product', 'quantity'), name='cart_user_id_covering_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='orderitems',
+            index=models.Index(fields=['order'], include=('product', 'quantity'), name='order_items_order_covering_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='orders',
+            index=models.Index(fields=['status'], name='orders_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='products',
+            index=models.Index(fields=['subcategory', 'id'], name='products_subcategory_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='subcategories',
+            index=models.Index(fields=['category', 'id'], name='subcategories_category_id_idx'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.1.5 on 2026-10-18 11:21
+
+import django.db.models.functions.datetime
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0003_broadcasts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='orders',
+            name='created_at',
+            field=models.DateTimeField(db_default=django.db.models.functions.datetime.Now()),
+        ),
+        migrations.AddIndex(
+            model_name='orders',
+            index=models.Index(fields=['created_at'], name='orders_created_at_idx'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.1.5 on 2026-10-18 11:22
+
+import django.db.models.functions.datetime
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0004_orders_created_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FsmStorage',
+            fields=[
+                ('key', models.TextField(primary_key=True, serialize=False)),
+                ('state', models.TextField(blank=True, null=True)),
+                ('data', models.JSONField(default=dict)),
+                ('updated_at', models.DateTimeField(db_default=django.db.models.functions.datetime.Now())),
+            ],
+            options={
+                'db_table': 'fsm_storage',
+                'indexes': [models.Index(fields=['updated_at'], name='fsm_storage_updated_at_idx')],
+            },
+        ),
+    ]
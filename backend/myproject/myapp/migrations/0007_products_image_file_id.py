@@ -0,0 +1,18 @@
+# Generated by Django 5.1.5 on 2026-10-18 11:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0006_products_search_vector'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='products',
+            name='image_file_id',
+            field=models.TextField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.5 on 2026-10-18 12:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0007_products_image_file_id'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='products',
+            name='sku',
+            field=models.TextField(blank=True, null=True, unique=True),
+        ),
+    ]
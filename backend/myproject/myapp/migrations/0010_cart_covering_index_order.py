@@ -0,0 +1,21 @@
+# Generated by Django 5.1.5 on 2026-10-18 12:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0009_cart_updated_at'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='cart',
+            name='cart_user_id_covering_idx',
+        ),
+        migrations.AddIndex(
+            model_name='cart',
+            index=models.Index(fields=['user_id', 'product'], include=('quantity',), name='cart_user_product_covering_idx'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.1.5 on 2026-10-18 12:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0010_cart_covering_index_order'),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='cart',
+            constraint=models.UniqueConstraint(fields=('user_id', 'product'), include=('quantity',), name='cart_user_id_product_uniq'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='cart',
+            unique_together=set(),
+        ),
+        migrations.RemoveIndex(
+            model_name='cart',
+            name='cart_user_product_covering_idx',
+        ),
+    ]
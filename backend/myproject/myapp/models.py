@@ -5,17 +5,30 @@
 #   * Make sure each ForeignKey and OneToOneField has `on_delete` set to the desired behavior
 #   * Remove `managed = False` lines if you wish to allow Django to create, modify, and delete the table
 # Feel free to rename the models, but don't rename db_table values or field names.
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVector, SearchVectorField
 from django.db import models
+from django.db.models.functions import Now
 
 
 class Cart(models.Model):
     user_id = models.BigIntegerField()
     product = models.ForeignKey('Products', models.DO_NOTHING, blank=True, null=True)
     quantity = models.IntegerField()
+    # Последнее изменение позиции: по нему фоновая задача бота удаляет брошенные корзины
+    updated_at = models.DateTimeField(db_default=Now())
 
     class Meta:
         db_table = 'cart'
-        unique_together = (('user_id', 'product'),)
+        constraints = [
+            # Уникальный индекс заодно покрывающий для get_cart: index-only scan по user_id
+            # сразу в порядке product_id, без сортировки и без второго B-дерева на те же ключи
+            models.UniqueConstraint(fields=['user_id', 'product'], include=['quantity'],
+                                    name='cart_user_id_product_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['updated_at'], name='cart_updated_at_idx'),
+        ]
 
 
 class Categories(models.Model):
@@ -24,6 +37,9 @@ class Categories(models.Model):
     class Meta:
         db_table = 'categories'
 
+    def __str__(self):
+        return self.name
+
 
 class Faq(models.Model):
     question = models.TextField(unique=True)
@@ -40,6 +56,9 @@ class OrderItems(models.Model):
 
     class Meta:
         db_table = 'order_items'
+        indexes = [
+            models.Index(fields=['order'], include=['product', 'quantity'], name='order_items_order_covering_idx'),
+        ]
 
 
 class Orders(models.Model):
@@ -49,20 +68,48 @@ class Orders(models.Model):
     phone = models.TextField()
     total_price = models.DecimalField(max_digits=10, decimal_places=2)
     status = models.TextField(blank=True, null=True)
+    # Значение по умолчанию задаёт сама БД: бот вставляет заказы напрямую через asyncpg
+    created_at = models.DateTimeField(db_default=Now())
 
     class Meta:
         db_table = 'orders'
+        indexes = [
+            models.Index(fields=['status'], name='orders_status_idx'),
+            models.Index(fields=['created_at'], name='orders_created_at_idx'),
+        ]
+
+    def __str__(self):
+        return f"Заказ #{self.order_id}"
 
 
 class Products(models.Model):
+    # Артикул поставщика: по нему импорт каталога (catalog_import.py) находит товар для обновления
+    sku = models.TextField(unique=True, blank=True, null=True)
     subcategory = models.ForeignKey('Subcategories', models.DO_NOTHING, blank=True, null=True)
     name = models.TextField()
     description = models.TextField(blank=True, null=True)
     price = models.DecimalField(max_digits=10, decimal_places=2, blank=True, null=True)
     image_url = models.TextField(blank=True, null=True)
+    # file_id фото в Telegram: бот сохраняет его после первой отправки и больше не грузит image_url
+    image_file_id = models.TextField(blank=True, null=True)
+    # Поисковый вектор (название важнее описания) считает сама БД: бот ищет товары через asyncpg
+    search_vector = models.GeneratedField(
+        expression=SearchVector('name', weight='A', config='russian')
+        + SearchVector('description', weight='B', config='russian'),
+        output_field=SearchVectorField(),
+        db_persist=True,
+    )
 
     class Meta:
         db_table = 'products'
+        indexes = [
+            # Листание товаров подкатегории по id (keyset-пагинация)
+            models.Index(fields=['subcategory', 'id'], name='products_subcategory_id_idx'),
+            GinIndex(fields=['search_vector'], name='products_search_vector_idx'),
+        ]
+
+    def __str__(self):
+        return self.name
 
 
 class Subcategories(models.Model):
@@ -71,6 +118,12 @@ class Subcategories(models.Model):
 
     class Meta:
         db_table = 'subcategories'
+        indexes = [
+            models.Index(fields=['category', 'id'], name='subcategories_category_id_idx'),
+        ]
+
+    def __str__(self):
+        return self.name
 
 
 class Users(models.Model):
@@ -81,3 +134,52 @@ class Users(models.Model):
 
     class Meta:
         db_table = 'users'
+
+
+class Broadcasts(models.Model):
+    STATUS_PENDING = 'pending'
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+    STATUS_CANCELLED = 'cancelled'
+    STATUS_CHOICES = (
+        (STATUS_PENDING, 'В очереди'),
+        (STATUS_RUNNING, 'Выполняется'),
+        (STATUS_DONE, 'Завершена'),
+        (STATUS_CANCELLED, 'Отменена'),
+    )
+
+    text = models.TextField()
+    status = models.TextField(choices=STATUS_CHOICES, default=STATUS_PENDING)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(blank=True, null=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+    # Курсор: user_id последнего обработанного получателя, с него рассылка продолжается после сбоя
+    last_user_id = models.BigIntegerField(blank=True, null=True)
+    sent_count = models.IntegerField(default=0)
+    failed_count = models.IntegerField(default=0)
+
+    class Meta:
+        db_table = 'broadcasts'
+
+
+class BroadcastFailures(models.Model):
+    broadcast = models.ForeignKey(Broadcasts, models.CASCADE, related_name='failures')
+    user_id = models.BigIntegerField()
+    error = models.TextField()
+
+    class Meta:
+        db_table = 'broadcast_failures'
+
+
+class FsmStorage(models.Model):
+    """Состояния FSM бота (aiogram), см. bot/storage.py."""
+    key = models.TextField(primary_key=True)
+    state = models.TextField(blank=True, null=True)
+    data = models.JSONField(default=dict)
+    updated_at = models.DateTimeField(db_default=Now())
+
+    class Meta:
+        db_table = 'fsm_storage'
+        indexes = [
+            models.Index(fields=['updated_at'], name='fsm_storage_updated_at_idx'),
+        ]
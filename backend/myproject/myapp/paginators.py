@@ -0,0 +1,34 @@
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+
+ESTIMATE_THRESHOLD = 10_000  # Меньшие таблицы считаются точно: это быстро
+MAX_EXACT_COUNT = 10_000  # С фильтрами строки считаются не дальше этого числа
+
+
+class EstimatedCountPaginator(Paginator):
+    """Пагинатор для больших таблиц без точного COUNT(*) на каждую страницу.
+
+    Без фильтров число строк берётся из статистики Postgres (pg_class.reltuples,
+    обновляется ANALYZE/autovacuum). С фильтрами COUNT ограничен MAX_EXACT_COUNT
+    строками: дальних страниц у отфильтрованного списка не будет, зато
+    подсчёт не читает всю таблицу.
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.has_filters():
+            estimate = self.estimated_count(queryset)
+            if estimate >= ESTIMATE_THRESHOLD:
+                return estimate
+        return queryset.order_by()[:MAX_EXACT_COUNT].count()
+
+    @staticmethod
+    def estimated_count(queryset) -> int:
+        """Оценка числа строк таблицы; -1, если таблица ещё не анализировалась."""
+        with connections[queryset.db].cursor() as cursor:
+            cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass",
+                           [queryset.model._meta.db_table])
+            row = cursor.fetchone()
+        return row[0] if row else -1
@@ -0,0 +1,50 @@
+from django.db import connection
+from django.db.models.signals import post_delete, post_save, pre_save
+
+from .models import Categories, Faq, Products, Subcategories
+
+# Канал LISTEN/NOTIFY, который слушает бот для сброса кэша каталога
+CATALOG_CHANNEL = "catalog_changed"
+
+
+def notify_catalog_changed(table: str):
+    """Сообщает боту об изменении таблицы каталога.
+
+    NOTIFY доставляется только после коммита транзакции,
+    поэтому бот не увидит незакоммиченных данных.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT pg_notify(%s, %s)", [CATALOG_CHANNEL, table])
+
+
+def catalog_changed(sender, **kwargs):
+    notify_catalog_changed(sender._meta.db_table)
+
+
+def reset_image_file_id(sender, instance, **kwargs):
+    """Сбрасывает file_id при смене картинки: бот загрузит новую по image_url."""
+    if instance.pk is None or instance.image_file_id is None:
+        return
+    old_url = Products.objects.filter(pk=instance.pk).values_list('image_url', flat=True).first()
+    if old_url != instance.image_url:
+        instance.image_file_id = None
+
+
+pre_save.connect(reset_image_file_id, sender=Products, dispatch_uid="products_reset_image_file_id")
+
+for model in (Categories, Subcategories, Products):
+    post_save.connect(catalog_changed, sender=model, dispatch_uid=f"catalog_save_{model.__name__}")
+    post_delete.connect(catalog_changed, sender=model, dispatch_uid=f"catalog_delete_{model.__name__}")
+
+
+# Канал, по которому бот обновляет индекс FAQ (payload — id вопроса)
+FAQ_CHANNEL = "faq_changed"
+
+
+def faq_changed(sender, instance, **kwargs):
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT pg_notify(%s, %s)", [FAQ_CHANNEL, str(instance.pk)])
+
+
+post_save.connect(faq_changed, sender=Faq, dispatch_uid="faq_save")
+post_delete.connect(faq_changed, sender=Faq, dispatch_uid="faq_delete")
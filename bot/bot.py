@@ -1,22 +1,55 @@
 import asyncio
 from aiogram import Bot, Dispatcher
-from config import BOT_TOKEN
+from config import (BOT_TOKEN, BOT_MODE, SUBSCRIPTION_GATE, WEBAPP_HOST, METRICS_PORT, SCHEDULER_ENABLED,
+                    RATE_LIMIT_ENABLED)
 from handlers import router
-from logger import logger
+from logger import logger, setup_logging, LoggingMiddleware
+from metrics import MetricsMiddleware, RequestMetricsMiddleware, run_metrics_server
+from ratelimit import RateLimitMiddleware
 from database import Database
+from storage import PostgresStorage
+from scheduler import Scheduler, setup_jobs
+from faq_index import setup_faq_index
+from subscription import SubscriptionMiddleware
+from webhook import run_webhook
 
 async def main():
+    setup_logging()
     bot = Bot(token=BOT_TOKEN)
-    dp = Dispatcher()
-    dp.include_router(router)
+    if RATE_LIMIT_ENABLED:
+        # Первым: ожидание очереди и повторы после 429 не входят во время запросов в метриках
+        bot.session.middleware(RateLimitMiddleware())
+    bot.session.middleware(RequestMetricsMiddleware())
     db = Database()
     await db.connect()
+    await setup_faq_index(db)
+    storage = PostgresStorage(db)
+    await storage.delete_expired()
+    dp = Dispatcher(storage=storage)
+    for observer in (dp.message, dp.callback_query, dp.inline_query, dp.pre_checkout_query, dp.chat_member):
+        observer.middleware(LoggingMiddleware())
+        observer.middleware(MetricsMiddleware())
+    if SUBSCRIPTION_GATE:
+        dp.message.outer_middleware(SubscriptionMiddleware())
+        dp.callback_query.outer_middleware(SubscriptionMiddleware())
+    dp.include_router(router)
+    scheduler = Scheduler(db)
+    if SCHEDULER_ENABLED:
+        setup_jobs(scheduler, storage)
+        scheduler.start()
     try:
-        await dp.start_polling(bot)
+        if BOT_MODE == "webhook":
+            await run_webhook(dp, bot)
+        else:
+            if METRICS_PORT:
+                await run_metrics_server(WEBAPP_HOST, METRICS_PORT)
+                logger.info(f"📈 Метрики доступны на {WEBAPP_HOST}:{METRICS_PORT}/metrics")
+            await dp.start_polling(bot)
         logger.info("✅ Бот запущен!")  # Лог при старте
     except Exception as e:
         logger.error(f"❌ Ошибка в работе бота: {e}")
     finally:
+        await scheduler.stop()
         await db.close()
 if __name__ == "__main__":
     asyncio.run(main())
\ No newline at end of file
@@ -0,0 +1,199 @@
+import dataclasses
+import inspect
+from typing import ClassVar
+
+from aiogram.dispatcher.event.bases import UNHANDLED
+from aiogram.types import CallbackQuery
+
+from logger import handler_var
+
+# Формат callback_data: "<версия><действие>:<поле>:<поле>...", числа — в base36.
+# Новые поля добавляются только в конец и с значением по умолчанию: в кнопках,
+# отправленных раньше, их нет, и при разборе подставляется значение по умолчанию.
+# Лишние поля (кнопка от более новой версии бота) отбрасываются.
+VERSION = "1"
+SEPARATOR = ":"
+MAX_LENGTH = 64  # Ограничение Telegram на callback_data, в байтах
+
+DIGITS = "0123456789abcdefghijklmnopqrstuvwxyz"
+
+ACTIONS = {}  # действие -> класс данных кнопки
+LEGACY_ACTIONS = {}  # префикс старого формата ("product_page") -> класс данных кнопки
+
+
+def to_base36(value: int) -> str:
+    if value < 0:
+        return "-" + to_base36(-value)
+    digits = ""
+    while True:
+        value, rest = divmod(value, 36)
+        digits = DIGITS[rest] + digits
+        if not value:
+            return digits
+
+
+@dataclasses.dataclass(frozen=True)
+class CallbackData:
+    """Данные inline-кнопки. Подклассы объявляются через @callback_data("код")."""
+    action: ClassVar[str]
+    _fields: ClassVar[tuple]
+
+    def pack(self) -> str:
+        parts = [VERSION + self.action]
+        for field in self._fields:
+            value = getattr(self, field.name)
+            parts.append(to_base36(value) if field.type is int else value)
+        data = SEPARATOR.join(parts)
+        if len(data.encode()) > MAX_LENGTH:
+            raise ValueError(f"callback_data длиннее {MAX_LENGTH} байт: {data}")
+        return data
+
+    @classmethod
+    def from_parts(cls, parts: list[str], base: int = 36) -> "CallbackData":
+        return cls(*(part if field.type is str else int(part, base) for field, part in zip(cls._fields, parts)))
+
+
+def callback_data(action: str, legacy: str = None):
+    """Регистрирует класс данных кнопки под коротким кодом действия.
+
+    legacy — префикс кнопок старого формата ("product_page_12_345"),
+    которые ещё остались в чатах пользователей.
+    """
+    def decorator(cls):
+        cls = dataclasses.dataclass(frozen=True)(cls)
+        cls.action = action
+        cls._fields = dataclasses.fields(cls)
+        if SEPARATOR in action or any(field.type not in (int, str) for field in cls._fields):
+            raise TypeError(f"Неподдерживаемая схема кнопки {cls.__name__}")
+        ACTIONS[action] = cls
+        if legacy:
+            LEGACY_ACTIONS[legacy] = cls
+        return cls
+    return decorator
+
+
+def unpack(data: str | None) -> CallbackData | None:
+    """Разбирает callback_data в объект данных кнопки. None — кнопка неизвестна или повреждена."""
+    if not data:
+        return None
+    try:
+        if data[0] == VERSION:
+            action, *parts = data[1:].split(SEPARATOR)
+            cls = ACTIONS.get(action)
+            return cls.from_parts(parts) if cls else None
+        # Старый формат: "<префикс>_<число>_<число>", числа десятичные
+        prefix = data.rstrip("0123456789_")
+        cls = LEGACY_ACTIONS.get(prefix)
+        return cls.from_parts(data[len(prefix) + 1:].split("_"), base=10) if cls else None
+    except (ValueError, TypeError):
+        return None
+
+
+@callback_data("s", legacy="sub_check")
+class SubCheck(CallbackData):
+    pass
+
+
+@callback_data("cp", legacy="page")
+class CategoriesPage(CallbackData):
+    page: int = 0
+
+
+@callback_data("c", legacy="category")
+class Category(CallbackData):
+    category_id: int
+
+
+@callback_data("sp", legacy="subcat_page")
+class SubcategoriesPage(CallbackData):
+    category_id: int
+    page: int = 0
+
+
+@callback_data("sc", legacy="subcategory")
+class Subcategory(CallbackData):
+    subcategory_id: int
+
+
+@callback_data("pp")
+class ProductPage(CallbackData):
+    subcategory_id: int
+    product_id: int
+
+
+@callback_data("pi", legacy="product_page")
+class ProductIndex(CallbackData):
+    """Старые кнопки листания ("product_page_12_3"): номер товара в подкатегории, а не его ID.
+
+    Новые кнопки так не упаковываются, класс нужен только для разбора старых.
+    """
+    subcategory_id: int
+    index: int
+
+
+@callback_data("ac", legacy="add_to_cart")
+class AddToCart(CallbackData):
+    product_id: int
+
+
+@callback_data("cc", legacy="confirm_cart")
+class ConfirmCart(CallbackData):
+    pass
+
+
+@callback_data("cx", legacy="cancel_cart")
+class CancelCart(CallbackData):
+    pass
+
+
+@callback_data("rm", legacy="remove")
+class RemoveFromCart(CallbackData):
+    product_id: int
+
+
+@callback_data("cl", legacy="clear_cart")
+class ClearCart(CallbackData):
+    pass
+
+
+@callback_data("co", legacy="checkout")
+class Checkout(CallbackData):
+    pass
+
+
+@callback_data("fa", legacy="faq")
+class FaqAnswer(CallbackData):
+    faq_id: int
+
+
+class CallbackDispatcher:
+    """Маршрутизация нажатий по типу данных кнопки через одну таблицу.
+
+    Вместо цепочки фильтров c.data.startswith(...), которые aiogram проверяет
+    по очереди, в роутере регистрируется один обработчик: он разбирает
+    callback_data один раз и находит обработчик в словаре.
+    """
+
+    def __init__(self):
+        self.handlers = {}  # класс данных кнопки -> (обработчик, имена его аргументов или None — все)
+
+    def register(self, data_type: type[CallbackData]):
+        """Декоратор: обработчик handler(callback, data, **зависимости) для кнопок data_type."""
+        def decorator(handler):
+            parameters = inspect.signature(handler).parameters.values()
+            accepts_all = any(parameter.kind is parameter.VAR_KEYWORD for parameter in parameters)
+            names = None if accepts_all else frozenset(parameter.name for parameter in parameters)
+            self.handlers[data_type] = (handler, names)
+            return handler
+        return decorator
+
+    async def dispatch(self, callback: CallbackQuery, **kwargs):
+        data = unpack(callback.data)
+        entry = self.handlers.get(type(data))
+        if entry is None:
+            return UNHANDLED
+        handler, names = entry
+        handler_var.set(handler.__name__)  # Для логов: настоящий обработчик, а не dispatch
+        if names is not None:
+            kwargs = {name: value for name, value in kwargs.items() if name in names}
+        return await handler(callback, data, **kwargs)
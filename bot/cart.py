@@ -0,0 +1,60 @@
+from dataclasses import dataclass
+from decimal import Decimal
+
+from database import Database
+from pricing import format_kopecks
+
+
+@dataclass(frozen=True)
+class CartLine:
+    product_id: int
+    name: str
+    price: Decimal
+    quantity: int
+    total_kopecks: int
+
+
+@dataclass(frozen=True)
+class CartSnapshot:
+    """Содержимое корзины на момент запроса: позиции и итог в копейках."""
+    user_id: int
+    lines: tuple[CartLine, ...]
+    total_kopecks: int
+
+    @classmethod
+    def from_rows(cls, user_id: int, rows) -> "CartSnapshot":
+        lines = tuple(CartLine(row["product_id"], row["name"], row["price"], row["quantity"],
+                               row["total_kopecks"]) for row in rows)
+        return cls(user_id, lines, sum(line.total_kopecks for line in lines))
+
+    def __bool__(self):
+        return bool(self.lines)
+
+
+class CartService:
+    """Корзина пользователя: каждое действие — один запрос к БД, результат — снимок корзины."""
+
+    def __init__(self, db: Database = None):
+        self.db = db or Database()
+
+    async def snapshot(self, user_id: int) -> CartSnapshot:
+        return CartSnapshot.from_rows(user_id, await self.db.get_cart(user_id))
+
+    async def add(self, user_id: int, product_id: int, quantity: int) -> CartSnapshot:
+        return CartSnapshot.from_rows(user_id, await self.db.add_to_cart(user_id, product_id, quantity))
+
+    async def remove(self, user_id: int, product_id: int) -> CartSnapshot:
+        return CartSnapshot.from_rows(user_id, await self.db.remove_from_cart(user_id, product_id))
+
+    async def clear(self, user_id: int) -> CartSnapshot:
+        await self.db.clear_cart(user_id)
+        return CartSnapshot(user_id, (), 0)
+
+
+def render_cart(snapshot: CartSnapshot, title: str = "🛒 *Ваша корзина:*") -> str:
+    """Текст корзины для сообщения (Markdown)."""
+    text = f"{title}\n"
+    for line in snapshot.lines:
+        text += f"🔹 {line.name} - {line.quantity} шт. *${format_kopecks(line.total_kopecks)}*\n"
+    text += f"\n💰 *Итого: ${format_kopecks(snapshot.total_kopecks)}*"
+    return text
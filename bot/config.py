@@ -10,4 +10,101 @@ DB_USER=os.getenv("DB_USER")
 DB_PASSWORD=os.getenv("DB_PASSWORD")
 DB_HOST=os.getenv("DB_HOST")
 DB_PORT=os.getenv("DB_PORT")
-YOOKASSA_PROVIDER_TOKEN=os.getenv("YOOKASSA_PROVIDER_TOKEN")
\ No newline at end of file
+YOOKASSA_PROVIDER_TOKEN=os.getenv("YOOKASSA_PROVIDER_TOKEN")
+# Кэш каталога: время жизни записей (сек) и максимальное число записей
+CATALOG_CACHE_TTL = int(os.getenv("CATALOG_CACHE_TTL", 300))
+CATALOG_CACHE_SIZE = int(os.getenv("CATALOG_CACHE_SIZE", 1024))
+
+# Хранилище FSM: через сколько секунд бездействия сессия считается брошенной,
+# время жизни и размер кэша чтений в памяти процесса (0 — без кэша)
+FSM_STATE_TTL = int(os.getenv("FSM_STATE_TTL", 2 * 24 * 60 * 60))
+FSM_CACHE_TTL = float(os.getenv("FSM_CACHE_TTL", 5))
+FSM_CACHE_SIZE = int(os.getenv("FSM_CACHE_SIZE", 10000))
+
+# Режим получения обновлений: polling или webhook
+BOT_MODE = os.getenv("BOT_MODE", "polling")
+WEBHOOK_URL = os.getenv("WEBHOOK_URL")  # Публичный адрес бота; без него webhook не регистрируется
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/webhook")
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET")
+WEBAPP_HOST = os.getenv("WEBAPP_HOST", "0.0.0.0")
+WEBAPP_PORT = int(os.getenv("WEBAPP_PORT", 8080))
+WEBHOOK_MAX_CONCURRENCY = int(os.getenv("WEBHOOK_MAX_CONCURRENCY", 100))
+SHUTDOWN_TIMEOUT = float(os.getenv("SHUTDOWN_TIMEOUT", 30))
+
+# Кэш проверки подписки на канал (сек): подписан / не подписан
+SUBSCRIPTION_POSITIVE_TTL = float(os.getenv("SUBSCRIPTION_POSITIVE_TTL", 600))
+SUBSCRIPTION_NEGATIVE_TTL = float(os.getenv("SUBSCRIPTION_NEGATIVE_TTL", 30))
+# Проверять подписку перед каждым обработчиком, а не только на /start
+SUBSCRIPTION_GATE = os.getenv("SUBSCRIPTION_GATE", "false").lower() in ("1", "true", "yes")
+
+# Inline-поиск товаров: результатов на страницу (не больше 50) и сколько секунд Telegram кэширует ответ
+INLINE_PAGE_SIZE = int(os.getenv("INLINE_PAGE_SIZE", 20))
+INLINE_CACHE_TIME = int(os.getenv("INLINE_CACHE_TIME", 300))
+
+# Telegram ID администраторов (через запятую): им доступны служебные команды
+ADMIN_IDS = {int(user_id) for user_id in os.getenv("ADMIN_IDS", "").split(",") if user_id.strip()}
+# Прогрев фото товаров (/warmup_images): сколько фото загружать одновременно
+IMAGE_WARMUP_CONCURRENCY = int(os.getenv("IMAGE_WARMUP_CONCURRENCY", 4))
+
+# Логирование: уровень, файл (JSON, если LOG_JSON), ротация по размеру или по времени
+# (LOG_ROTATE_WHEN: "midnight", "H" и т.п. — см. TimedRotatingFileHandler)
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FILE = os.getenv("LOG_FILE", "bot.log")
+LOG_JSON = os.getenv("LOG_JSON", "true").lower() in ("1", "true", "yes")
+LOG_MAX_BYTES = int(os.getenv("LOG_MAX_BYTES", 10 * 1024 * 1024))
+LOG_BACKUP_COUNT = int(os.getenv("LOG_BACKUP_COUNT", 5))
+LOG_ROTATE_WHEN = os.getenv("LOG_ROTATE_WHEN", "")
+# Доля записей частых событий (листание каталога и т.п.), которые попадают в лог, по уровням
+LOG_SAMPLE_RATES = os.getenv("LOG_SAMPLE_RATES", "DEBUG=0.01,INFO=0.1")
+
+# Метрики Prometheus (GET /metrics): в режиме webhook — на сервере webhook, в режиме polling —
+# на отдельном порту METRICS_PORT (0 — не запускать)
+METRICS_PORT = int(os.getenv("METRICS_PORT", 0))
+# Запросы к БД дольше стольких миллисекунд пишутся в лог (0 — не писать)
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", 200))
+
+# Пул соединений asyncpg
+DB_POOL_MIN_SIZE = int(os.getenv("DB_POOL_MIN_SIZE", 2))
+DB_POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", 10))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", 10))  # Ожидание свободного соединения, сек
+DB_COMMAND_TIMEOUT = float(os.getenv("DB_COMMAND_TIMEOUT", 30))  # Предел выполнения запроса, сек
+DB_MAX_QUERIES = int(os.getenv("DB_MAX_QUERIES", 50000))  # После стольких запросов соединение пересоздаётся
+DB_MAX_INACTIVE_LIFETIME = float(os.getenv("DB_MAX_INACTIVE_LIFETIME", 300))  # Простаивающее соединение закрывается, сек
+# Кэш подготовленных запросов на соединение (asyncpg готовит запрос при первом выполнении);
+# 0 — для pgbouncer в режиме transaction
+DB_STATEMENT_CACHE_SIZE = int(os.getenv("DB_STATEMENT_CACHE_SIZE", 1024))
+# Повторы при потере соединения: попыток подключения при старте, повторов чтения,
+# начальная пауза (сек, дальше удваивается)
+DB_CONNECT_RETRIES = int(os.getenv("DB_CONNECT_RETRIES", 5))
+DB_QUERY_RETRIES = int(os.getenv("DB_QUERY_RETRIES", 2))
+DB_RETRY_DELAY = float(os.getenv("DB_RETRY_DELAY", 0.5))
+# Реплика для чтения каталога (пусто — всё читается с основного сервера); логин и пароль те же
+DB_REPLICA_HOST = os.getenv("DB_REPLICA_HOST")
+DB_REPLICA_PORT = os.getenv("DB_REPLICA_PORT", DB_PORT)
+
+# Фоновые задачи (scheduler.py) и случайная добавка к паузе перед каждым запуском, сек
+SCHEDULER_ENABLED = os.getenv("SCHEDULER_ENABLED", "true").lower() in ("1", "true", "yes")
+SCHEDULER_JITTER = float(os.getenv("SCHEDULER_JITTER", 30))
+# Сколько строк удалять или обновлять одним запросом в задачах обслуживания
+MAINTENANCE_BATCH_SIZE = int(os.getenv("MAINTENANCE_BATCH_SIZE", 1000))
+# Корзины, которые не менялись дольше CART_TTL (сек), удаляются раз в CART_CLEANUP_INTERVAL сек
+CART_TTL = int(os.getenv("CART_TTL", 7 * 24 * 60 * 60))
+CART_CLEANUP_INTERVAL = float(os.getenv("CART_CLEANUP_INTERVAL", 60 * 60))
+# Заказы, не оплаченные за ORDER_PAYMENT_TTL (сек), получают статус expired; проверка раз в ORDER_EXPIRY_INTERVAL
+ORDER_PAYMENT_TTL = int(os.getenv("ORDER_PAYMENT_TTL", 24 * 60 * 60))
+ORDER_EXPIRY_INTERVAL = float(os.getenv("ORDER_EXPIRY_INTERVAL", 10 * 60))
+# Прогрев кэша каталога в каждом процессе: чаще, чем истекают записи кэша (0 — не прогревать)
+CATALOG_WARMUP_INTERVAL = float(os.getenv("CATALOG_WARMUP_INTERVAL", CATALOG_CACHE_TTL / 2))
+# Удаление брошенных FSM-сессий по расписанию cron: "минута час день месяц день_недели"
+FSM_CLEANUP_CRON = os.getenv("FSM_CLEANUP_CRON", "30 4 * * *")
+
+# Лимиты исходящих запросов к Bot API (ratelimit.py): сообщений в секунду на весь бот,
+# в секунду в личный чат и в минуту в группу, запас на короткий всплеск в одном чате
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() in ("1", "true", "yes")
+RATE_LIMIT_GLOBAL_PER_SECOND = float(os.getenv("RATE_LIMIT_GLOBAL_PER_SECOND", 30))
+RATE_LIMIT_PRIVATE_PER_SECOND = float(os.getenv("RATE_LIMIT_PRIVATE_PER_SECOND", 1))
+RATE_LIMIT_GROUP_PER_MINUTE = float(os.getenv("RATE_LIMIT_GROUP_PER_MINUTE", 20))
+RATE_LIMIT_CHAT_BURST = int(os.getenv("RATE_LIMIT_CHAT_BURST", 3))
+# Повторы после ответа 429 (TelegramRetryAfter): не больше стольких и если ждать не дольше RATE_LIMIT_MAX_WAIT сек
+RATE_LIMIT_MAX_RETRIES = int(os.getenv("RATE_LIMIT_MAX_RETRIES", 3))
+RATE_LIMIT_MAX_WAIT = float(os.getenv("RATE_LIMIT_MAX_WAIT", 60))
@@ -1,7 +1,138 @@
+import asyncio
+import gzip
+import os
+import re
+import tempfile
+import time
+from collections import OrderedDict
+from datetime import timedelta
+from functools import lru_cache
+
 import asyncpg
-from config import DB_NAME, DB_USER, DB_PASSWORD, DB_HOST, DB_PORT
+from config import (DB_NAME, DB_USER, DB_PASSWORD, DB_HOST, DB_PORT, CATALOG_CACHE_TTL, CATALOG_CACHE_SIZE,
+                    SLOW_QUERY_MS, DB_POOL_MIN_SIZE, DB_POOL_MAX_SIZE, DB_POOL_TIMEOUT, DB_COMMAND_TIMEOUT,
+                    DB_MAX_QUERIES, DB_MAX_INACTIVE_LIFETIME, DB_STATEMENT_CACHE_SIZE, DB_CONNECT_RETRIES,
+                    DB_QUERY_RETRIES, DB_RETRY_DELAY, DB_REPLICA_HOST, DB_REPLICA_PORT)
 from logger import logger
-import pandas as pd
+from metrics import DB_QUERY_DURATION, DB_POOL_WAIT, DB_ROWS, count_db_query
+
+# Канал LISTEN/NOTIFY, в который Django-админка сообщает об изменении каталога
+CATALOG_CHANNEL = "catalog_changed"
+
+# Какие записи кэша зависят от какой таблицы
+CATALOG_NAMESPACES = {
+    "categories": ("categories", "categories_keyboard"),
+    "subcategories": ("subcategories", "subcategories_keyboard"),
+    "products": ("products", "product_file_ids"),
+}
+
+# Слова поискового запроса: всё прочее отбрасывается, чтобы to_tsquery не получил спецсимволы
+SEARCH_WORD = re.compile(r"\w+")
+SEARCH_MAX_WORDS = 8
+
+_MISSING = object()
+
+# Ошибки, после которых соединение потеряно, но запрос можно повторить на другом
+CONNECTION_ERRORS = (OSError, asyncpg.ConnectionDoesNotExistError, asyncpg.PostgresConnectionError,
+                     asyncpg.CannotConnectNowError)
+RETRY_MAX_DELAY = 30
+# Запрос только читает: начинается с SELECT (после комментариев). Через fetch идут и записи
+# (INSERT ... RETURNING, WITH ... INSERT), их повторять нельзя: первая попытка могла успеть закоммититься
+READ_QUERY = re.compile(r"\s*(--[^\n]*\n\s*)*SELECT\b", re.IGNORECASE)
+
+
+@lru_cache(maxsize=1024)
+def is_read_query(query: str) -> bool:
+    """Можно ли повторить запрос на новом соединении после обрыва."""
+    return bool(READ_QUERY.match(query))
+
+
+def retry_delay(attempt: int) -> float:
+    """Пауза перед повтором: удваивается с каждой попыткой."""
+    return min(DB_RETRY_DELAY * 2 ** attempt, RETRY_MAX_DELAY)
+
+
+PRODUCT_CARD_QUERY = """
+    SELECT p.id, p.name, p.description, p.price, p.image_url, p.image_file_id,
+           (SELECT id FROM products
+            WHERE subcategory_id = $1 AND id < p.id
+            ORDER BY id DESC LIMIT 1) AS prev_id,
+           (SELECT id FROM products
+            WHERE subcategory_id = $1 AND id > p.id
+            ORDER BY id LIMIT 1) AS next_id
+    FROM products p
+    WHERE p.subcategory_id = $1 AND p.id >= $2
+    ORDER BY p.id
+    LIMIT 1
+"""
+
+CART_QUERY = """
+    SELECT c.product_id, p.name, p.price, c.quantity,
+           round(p.price * c.quantity * 100)::bigint AS total_kopecks
+    FROM cart c
+    JOIN products p ON c.product_id = p.id
+    WHERE c.user_id = $1
+    ORDER BY c.product_id
+"""
+
+
+def to_prefix_tsquery(text: str) -> str | None:
+    """Превращает ввод пользователя в запрос для to_tsquery.
+
+    Все слова обязательны, последнее ищется по префиксу: в inline-режиме
+    пользователь ещё печатает его.
+    """
+    words = SEARCH_WORD.findall(text.lower())[:SEARCH_MAX_WORDS]
+    if not words:
+        return None
+    return " & ".join(words[:-1] + [f"{words[-1]}:*"])
+
+
+class TTLCache:
+    """LRU-кэш с ограниченным размером и временем жизни записей."""
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+
+    def get(self, key, default=None):
+        """Возвращает значение по ключу, если оно есть и не устарело."""
+        item = self._data.get(key, _MISSING)
+        if item is _MISSING:
+            return default
+        expires_at, value = item
+        if expires_at < time.monotonic():
+            del self._data[key]
+            return default
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key, value, ttl: float = None):
+        """Сохраняет значение, вытесняя самые старые записи при переполнении."""
+        self._data[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def invalidate(self, namespace: str):
+        """Удаляет все записи, ключ которых начинается с namespace."""
+        for key in [key for key in self._data if key[0] == namespace]:
+            del self._data[key]
+
+    def pop(self, key, default=None):
+        """Удаляет запись и возвращает её значение."""
+        item = self._data.pop(key, _MISSING)
+        return default if item is _MISSING else item[1]
+
+    def clear(self):
+        """Полностью очищает кэш."""
+        self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
 class Database:
     """Класс для работы с БД"""
 
@@ -17,98 +148,451 @@ class Database:
         """Инициализация подключения."""
         if not hasattr(self, "pool"):
             self.pool = None
+            self.replica_pool = None  # Чтение каталога; None — читаем с основного сервера
+            self.listener = None
+            self.listeners = []  # (канал, callback): восстанавливаются после переподключения
+            self.catalog_cache = TTLCache(maxsize=CATALOG_CACHE_SIZE, ttl=CATALOG_CACHE_TTL)
+            self.background_tasks = set()
 
     async def connect(self):
-        """Подключение к БД."""
-        if not self.pool:
+        """Подключение к БД: пул основного сервера и, если задана, реплики для чтения."""
+        if self.pool:
+            return
+        try:
+            self.pool = await self._create_pool(DB_HOST, DB_PORT)
+        except Exception as e:
+            logger.error(f"❌ Ошибка подключения к БД: {e}")
+            raise
+        logger.info("✅ Подключено к базе данных.")
+        if DB_REPLICA_HOST:
             try:
-                self.pool = await asyncpg.create_pool(
-                    database=DB_NAME, user=DB_USER, password=DB_PASSWORD,
-                    host=DB_HOST, port=DB_PORT
-                )
-                logger.info("✅ Подключено к базе данных.")
+                self.replica_pool = await self._create_pool(DB_REPLICA_HOST, DB_REPLICA_PORT)
+                logger.info(f"✅ Каталог читается с реплики {DB_REPLICA_HOST}.")
             except Exception as e:
-                logger.error(f"❌ Ошибка подключения к БД: {e}")
+                logger.error(f"❌ Реплика {DB_REPLICA_HOST} недоступна, каталог читается с основного сервера: {e}")
+        await self.connect_listener()
+        await self.listen(CATALOG_CHANNEL, self._on_catalog_changed)
 
-    async def execute(self, query: str, *args):
+    async def _create_pool(self, host: str, port) -> asyncpg.Pool:
+        """Создаёт пул с настройками из config, повторяя попытки, пока сервер недоступен."""
+        for attempt in range(DB_CONNECT_RETRIES + 1):
+            try:
+                return await asyncpg.create_pool(
+                    database=DB_NAME, user=DB_USER, password=DB_PASSWORD, host=host, port=port,
+                    min_size=DB_POOL_MIN_SIZE, max_size=DB_POOL_MAX_SIZE,
+                    max_queries=DB_MAX_QUERIES, max_inactive_connection_lifetime=DB_MAX_INACTIVE_LIFETIME,
+                    command_timeout=DB_COMMAND_TIMEOUT, statement_cache_size=DB_STATEMENT_CACHE_SIZE,
+                )
+            except CONNECTION_ERRORS as e:
+                if attempt == DB_CONNECT_RETRIES:
+                    raise
+                delay = retry_delay(attempt)
+                logger.warning(f"⏳ БД {host}:{port} недоступна ({e}), повтор через {delay} с.")
+                await asyncio.sleep(delay)
+
+    async def connect_listener(self):
+        """Открывает отдельное соединение для LISTEN.
+
+        Соединения пула сбрасываются при возврате и теряют подписки.
+        """
+        try:
+            self.listener = await asyncpg.connect(
+                database=DB_NAME, user=DB_USER, password=DB_PASSWORD,
+                host=DB_HOST, port=DB_PORT
+            )
+        except Exception as e:
+            # Без уведомлений кэши всё равно обновятся по TTL
+            self.listener = None
+            logger.error(f"❌ Не удалось открыть соединение для LISTEN: {e}")
+            return
+        self.listener.add_termination_listener(self._on_listener_lost)
+
+    async def listen(self, channel: str, callback):
+        """Подписывает callback(connection, pid, channel, payload) на канал NOTIFY."""
+        self.listeners.append((channel, callback))
+        if not self.listener:
+            logger.warning(f"⚠️ Нет соединения для LISTEN, подписка на {channel} пропущена.")
+            return
+        await self.listener.add_listener(channel, callback)
+        logger.info(f"👂 Подписка на {channel} оформлена.")
+
+    def _on_listener_lost(self, connection):
+        """Соединение LISTEN оборвалось: переподключаемся в фоне."""
+        if self.listener is not connection:
+            return  # Закрыли сами в close()
+        self.listener = None
+        logger.warning("⚠️ Соединение для LISTEN потеряно, переподключаемся.")
+        task = asyncio.create_task(self._reconnect_listener())
+        self.background_tasks.add(task)
+        task.add_done_callback(self.background_tasks.discard)
+
+    async def _reconnect_listener(self):
+        attempt = 0
+        while self.pool and not self.listener:
+            await asyncio.sleep(retry_delay(attempt))
+            attempt += 1
+            await self.connect_listener()
+        if not self.listener:
+            return
+        for channel, callback in self.listeners:
+            await self.listener.add_listener(channel, callback)
+        # Пока соединения не было, уведомления терялись
+        self.catalog_cache.clear()
+        logger.info(f"👂 Соединение для LISTEN восстановлено, подписок: {len(self.listeners)}.")
+
+    def _on_catalog_changed(self, connection, pid, channel, payload):
+        """Сбрасывает кэш каталога по уведомлению из Postgres."""
+        namespaces = CATALOG_NAMESPACES.get(payload)
+        if namespaces is None:
+            self.catalog_cache.clear()
+        else:
+            for namespace in namespaces:
+                self.catalog_cache.invalidate(namespace)
+        logger.info(f"♻️ Кэш каталога сброшен: {payload or 'всё'}")
+
+    async def _cached(self, key: tuple, loader):
+        """Возвращает значение из кэша каталога или загружает его через loader."""
+        value = self.catalog_cache.get(key, _MISSING)
+        if value is _MISSING:
+            value = await loader()
+            self.catalog_cache.set(key, value)
+        return value
+
+    async def _run(self, method: str, query: str, args, replica: bool = False, statement: str = "unknown"):
+        """Выполняет запрос на соединении из пула и записывает метрики.
+
+        statement — имя запроса в метриках и логах (обычно имя вызывающего
+        метода: get_cart, PostgresStorage.set_state...): у Prometheus не должно
+        быть меток с текстом SQL.
+        """
+        pool = self.replica_pool if replica and self.replica_pool else self.pool
+        retries = DB_QUERY_RETRIES if is_read_query(query) else 0
+        for attempt in range(retries + 1):
+            started = time.perf_counter()
+            try:
+                async with pool.acquire(timeout=DB_POOL_TIMEOUT) as conn:
+                    acquired = time.perf_counter()
+                    result = await getattr(conn, method)(query, *args)
+                    finished = time.perf_counter()
+                break
+            except CONNECTION_ERRORS as e:
+                if attempt == retries:
+                    raise
+                delay = retry_delay(attempt)
+                logger.warning(f"🔁 Соединение с БД потеряно ({e}), повтор {statement} через {delay} с.")
+                await asyncio.sleep(delay)
+
+        if method == "fetch":
+            rows = len(result)
+        elif method == "execute":
+            rows = int(result.rsplit(" ", 1)[-1]) if result[-1:].isdigit() else 0  # "UPDATE 3"
+        else:
+            rows = int(result is not None)
+        pool_wait, duration = acquired - started, finished - acquired
+        count_db_query()
+        DB_POOL_WAIT.observe(pool_wait, statement)
+        DB_QUERY_DURATION.observe(duration, statement)
+        DB_ROWS.observe(rows, statement)
+        if SLOW_QUERY_MS and duration * 1000 >= SLOW_QUERY_MS:
+            logger.warning(f"🐢 Медленный запрос {statement}: {duration * 1000:.1f} мс, строк: {rows}",
+                           extra={"statement": statement, "duration_ms": round(duration * 1000, 1),
+                                  "pool_wait_ms": round(pool_wait * 1000, 1), "rows": rows,
+                                  "query": " ".join(query.split())})
+        return result
+
+    async def execute(self, query: str, *args, statement: str = "unknown"):
         """Выполняет SQL-запрос (INSERT, UPDATE, DELETE)."""
-        async with self.pool.acquire() as conn:
-            return await conn.execute(query, *args)
+        return await self._run("execute", query, args, statement=statement)
 
-    async def fetch(self, query: str, *args):
-        """Выполняет SQL-запрос (SELECT) и возвращает список строк."""
-        async with self.pool.acquire() as conn:
-            return await conn.fetch(query, *args)
+    async def fetch(self, query: str, *args, replica: bool = False, statement: str = "unknown"):
+        """Выполняет SQL-запрос (SELECT) и возвращает список строк.
 
-    async def fetchrow(self, query: str, *args):
+        replica=True — запрос можно выполнить на реплике (данные каталога,
+        допустимо небольшое отставание). statement — имя запроса в метриках.
+        """
+        return await self._run("fetch", query, args, replica, statement)
+
+    async def fetchrow(self, query: str, *args, replica: bool = False, statement: str = "unknown"):
         """Выполняет SQL-запрос (SELECT) и возвращает одну строку."""
-        async with self.pool.acquire() as conn:
-            return await conn.fetchrow(query, *args)
+        return await self._run("fetchrow", query, args, replica, statement)
+
+    async def fetchval(self, query: str, *args, replica: bool = False, statement: str = "unknown"):
+        """Выполняет SQL-запрос и возвращает одно значение."""
+        return await self._run("fetchval", query, args, replica, statement)
 
     async def close(self):
         """Закрывает соединение с БД."""
+        if self.listener:
+            listener, self.listener = self.listener, None
+            await listener.close()
+        if self.replica_pool:
+            await self.replica_pool.close()
+            self.replica_pool = None
         if self.pool:
-            await self.pool.close()
+            pool, self.pool = self.pool, None
+            await pool.close()
             logger.info("🔌 Соединение с БД закрыто.")
 
     async def get_categories(self):
         """Получает список всех категорий."""
-        return await self.fetch("SELECT id, name FROM categories")
+        return await self._cached(("categories",), lambda: self.fetch("SELECT id, name FROM categories", replica=True,
+                                                                       statement="get_categories"))
+
+    async def get_categories_page(self, page: int, per_page: int):
+        """Получает страницу категорий и признак наличия следующей страницы."""
+        rows = await self._cached(
+            ("categories", page, per_page),
+            lambda: self.fetch("SELECT id, name FROM categories ORDER BY id LIMIT $1 OFFSET $2",
+                               per_page + 1, page * per_page, replica=True, statement="get_categories_page"))
+        return rows[:per_page], len(rows) > per_page
 
     async def get_products_by_category(self, category_id: int):
         """Получает все товары по ID категории."""
-        return await self.fetch("SELECT id, name, price FROM products WHERE category_id = $1", category_id)
+        return await self.fetch("""
+            SELECT p.id, p.name, p.price
+            FROM products p
+            JOIN subcategories s ON p.subcategory_id = s.id
+            WHERE s.category_id = $1
+        """, category_id, replica=True, statement="get_products_by_category")
 
     async def get_subcategories(self, category_id: int):
         """Получает список подкатегорий по ID категории."""
-        return await self.fetch("SELECT id, name FROM subcategories WHERE category_id = $1", category_id)
+        return await self._cached(
+            ("subcategories", category_id),
+            lambda: self.fetch("SELECT id, name FROM subcategories WHERE category_id = $1", category_id,
+                               replica=True, statement="get_subcategories"))
+
+    async def get_subcategories_page(self, category_id: int, page: int, per_page: int):
+        """Получает страницу подкатегорий и признак наличия следующей страницы."""
+        rows = await self._cached(
+            ("subcategories", category_id, page, per_page),
+            lambda: self.fetch("""
+                SELECT id, name FROM subcategories
+                WHERE category_id = $1
+                ORDER BY id
+                LIMIT $2 OFFSET $3
+            """, category_id, per_page + 1, page * per_page, replica=True, statement="get_subcategories_page"))
+        return rows[:per_page], len(rows) > per_page
+
+    async def get_product_card(self, subcategory_id: int, product_id: int = 0):
+        """Получает товар подкатегории с ID не меньше product_id и ID соседних товаров.
+
+        Листание идёт по ключу (id), поэтому стоимость запроса не зависит
+        от позиции товара в подкатегории.
+        """
+        return await self._cached(
+            ("products", subcategory_id, product_id),
+            lambda: self.fetchrow(PRODUCT_CARD_QUERY, subcategory_id, product_id, replica=True,
+                                  statement="get_product_card"))
+
+    async def get_product_id_at(self, subcategory_id: int, index: int) -> int | None:
+        """ID товара подкатегории по его номеру (с нуля) в порядке ID — для старых кнопок листания."""
+        return await self.fetchval(
+            "SELECT id FROM products WHERE subcategory_id = $1 ORDER BY id OFFSET $2 LIMIT 1",
+            subcategory_id, max(index, 0), replica=True, statement="get_product_id_at")
+
+    async def warm_up_catalog(self, categories_per_page: int, subcategories_per_page: int) -> int:
+        """Заново загружает в кэш списки категорий, подкатегорий и первые товары подкатегорий.
+
+        Записи кладутся под теми же ключами, что и у get_categories_page,
+        get_subcategories_page и get_product_card, поэтому первые экраны каталога
+        отдаются из памяти. Прогрев занимает не больше половины кэша, чтобы
+        не вытеснять записи, которые пользователи читают на самом деле.
+        Возвращает число записей кэша.
+        """
+        limit = self.catalog_cache.maxsize // 2
+
+        def cache_pages(key: tuple, rows, per_page: int) -> int:
+            pages = max(1, min(-(-len(rows) // per_page), limit - entries))
+            for page in range(pages):
+                self.catalog_cache.set(key + (page, per_page), rows[page * per_page:(page + 1) * per_page + 1])
+            return pages
+
+        categories = await self.fetch("SELECT id, name FROM categories ORDER BY id", replica=True,
+                                      statement="warm_up_catalog")
+        self.catalog_cache.set(("categories",), categories)
+        entries = 1
+        entries += cache_pages(("categories",), categories, categories_per_page)
+        for category in categories:
+            if entries >= limit:
+                break
+            subcategories = await self.fetch("SELECT id, name FROM subcategories WHERE category_id = $1 ORDER BY id",
+                                             category["id"], replica=True, statement="warm_up_catalog")
+            self.catalog_cache.set(("subcategories", category["id"]), subcategories)
+            entries += 1
+            entries += cache_pages(("subcategories", category["id"]), subcategories, subcategories_per_page)
+            for subcategory in subcategories[:max(0, limit - entries)]:
+                product = await self.fetchrow(PRODUCT_CARD_QUERY, subcategory["id"], 0, replica=True,
+                                              statement="warm_up_catalog")
+                self.catalog_cache.set(("products", subcategory["id"], 0), product)
+                entries += 1
+        return entries
+
+    async def search_products(self, query: str, limit: int, offset: int = 0):
+        """Полнотекстовый поиск товаров по названию и описанию.
+
+        Возвращает страницу товаров, отсортированных по релевантности,
+        и признак наличия следующей страницы.
+
+        По слишком общему запросу («т», «товар») совпадает почти весь каталог,
+        и ранжирование всех строк заняло бы сотни миллисекунд, поэтому
+        ранжируются не больше 1000 совпадений. Лимит записан в запросе
+        константой: с параметром планировщик выбирает Seq Scan.
+        """
+        tsquery = to_prefix_tsquery(query)
+        if tsquery is None:
+            return [], False
+        rows = await self.fetch("""
+            SELECT id, name, description, price, image_url, image_file_id
+            FROM (
+                SELECT p.id, p.name, p.description, p.price, p.image_url, p.image_file_id,
+                       ts_rank(p.search_vector, q) AS rank
+                FROM products p, to_tsquery('russian', $1) q
+                WHERE p.search_vector @@ q
+                LIMIT 1000
+            ) matches
+            ORDER BY rank DESC, id
+            LIMIT $2 OFFSET $3
+        """, tsquery, limit + 1, offset, replica=True, statement="search_products")
+        return rows[:limit], len(rows) > limit
+
+    def prefetch_product_cards(self, subcategory_id: int, *product_ids):
+        """Загружает в кэш карточки соседних товаров в фоне, чтобы следующее листание не ждало БД."""
+        product_ids = [product_id for product_id in product_ids if product_id is not None
+                       and self.catalog_cache.get(("products", subcategory_id, product_id), _MISSING) is _MISSING]
+        if not product_ids:
+            return
+        task = asyncio.create_task(self._prefetch_product_cards(subcategory_id, product_ids))
+        self.background_tasks.add(task)
+        task.add_done_callback(self.background_tasks.discard)
+
+    async def _prefetch_product_cards(self, subcategory_id: int, product_ids):
+        try:
+            await asyncio.gather(*(self.get_product_card(subcategory_id, product_id) for product_id in product_ids))
+        except Exception as e:
+            logger.warning(f"⚠️ Не удалось заранее загрузить товары {product_ids}: {e}")
+
+    def get_product_file_id(self, product):
+        """Возвращает file_id фото товара: сохранённый ботом свежее, чем строка из кэша каталога."""
+        return self.catalog_cache.get(("product_file_ids", product["id"]), product["image_file_id"])
+
+    async def set_product_file_id(self, product_id: int, file_id: str | None):
+        """Сохраняет file_id фото товара (None — file_id устарел, грузить по image_url)."""
+        await self.execute("UPDATE products SET image_file_id = $2 WHERE id = $1", product_id, file_id,
+                           statement="set_product_file_id")
+        self.catalog_cache.set(("product_file_ids", product_id), file_id)
+
+    async def get_products_without_file_id(self, after_id: int, limit: int):
+        """Получает пачку товаров с картинкой, но без file_id (по id больше after_id)."""
+        return await self.fetch("""
+            SELECT id, image_url FROM products
+            WHERE id > $1 AND image_file_id IS NULL AND image_url IS NOT NULL
+            ORDER BY id
+            LIMIT $2
+        """, after_id, limit, statement="get_products_without_file_id")
 
     async def get_product_by_subcategory(self, subcategory_id: int):
         """Получает один товар из подкатегории."""
-        return await self.fetchrow("SELECT * FROM products WHERE subcategory_id = $1 LIMIT 1", subcategory_id)
+        return await self.fetchrow("SELECT * FROM products WHERE subcategory_id = $1 LIMIT 1", subcategory_id,
+                                   replica=True, statement="get_product_by_subcategory")
 
     async def get_products_by_subcategory(self, subcategory_id: int):
         """Получает список товаров по ID подкатегории."""
-        return await self.fetch(
-            "SELECT id, name, description, price, image_url FROM products WHERE subcategory_id = $1",
-            subcategory_id)
+        return await self._cached(
+            ("products", subcategory_id),
+            lambda: self.fetch(
+                "SELECT id, name, description, price, image_url FROM products WHERE subcategory_id = $1",
+                subcategory_id, replica=True, statement="get_products_by_subcategory"))
 
     async def add_to_cart(self, user_id: int, product_id: int, quantity: int):
-        """Добавляет товар в корзину или обновляет количество, если товар уже есть."""
-        await self.execute("""
-            INSERT INTO cart (user_id, product_id, quantity)
-            VALUES ($1, $2, $3)
-            ON CONFLICT (user_id, product_id) DO UPDATE
-            SET quantity = cart.quantity + EXCLUDED.quantity;
-        """, user_id, product_id, quantity)
+        """Добавляет товар в корзину или обновляет количество, если товар уже есть.
+
+        Возвращает обновлённое содержимое корзины (как get_cart) тем же запросом.
+        """
+        cart = await self.fetch("""
+            WITH upserted AS (
+                INSERT INTO cart (user_id, product_id, quantity)
+                VALUES ($1, $2, $3)
+                ON CONFLICT (user_id, product_id) DO UPDATE
+                SET quantity = cart.quantity + EXCLUDED.quantity, updated_at = now()
+                RETURNING product_id, quantity
+            ), lines AS (
+                SELECT product_id, quantity FROM cart WHERE user_id = $1 AND product_id <> $2
+                UNION ALL
+                SELECT product_id, quantity FROM upserted
+            )
+            SELECT l.product_id, p.name, p.price, l.quantity,
+                   round(p.price * l.quantity * 100)::bigint AS total_kopecks
+            FROM lines l
+            JOIN products p ON l.product_id = p.id
+            ORDER BY l.product_id
+        """, user_id, product_id, quantity, statement="add_to_cart")
 
         logger.info(f"✅ {user_id} добавил {quantity} шт. товара {product_id} в корзину.")
+        return cart
 
     async def get_cart(self, user_id: int):
-        """Получает содержимое корзины пользователя."""
-        return await self.fetch("""
-            SELECT c.product_id, p.name, p.price, c.quantity 
-            FROM cart c
-            JOIN products p ON c.product_id = p.id
-            WHERE c.user_id = $1
-        """, user_id)
+        """Получает содержимое корзины пользователя с суммой по каждой позиции в копейках."""
+        return await self.fetch(CART_QUERY, user_id, statement="get_cart")
 
     async def remove_from_cart(self, user_id: int, product_id: int):
-        """Удаляет товар из корзины пользователя."""
-        await self.execute("DELETE FROM cart WHERE user_id = $1 AND product_id = $2", user_id, product_id)
+        """Удаляет товар из корзины пользователя и возвращает оставшееся содержимое корзины."""
+        cart = await self.fetch("""
+            WITH removed AS (
+                DELETE FROM cart WHERE user_id = $1 AND product_id = $2
+                RETURNING product_id
+            )
+            SELECT c.product_id, p.name, p.price, c.quantity,
+                   round(p.price * c.quantity * 100)::bigint AS total_kopecks
+            FROM cart c
+            JOIN products p ON c.product_id = p.id
+            WHERE c.user_id = $1 AND c.product_id NOT IN (SELECT product_id FROM removed)
+            ORDER BY c.product_id
+        """, user_id, product_id, statement="remove_from_cart")
         logger.info(f"🗑 User {user_id} удалил товар ID {product_id} из корзины.")
+        return cart
 
     async def clear_cart(self, user_id: int):
         """Очищает корзину пользователя."""
-        await self.execute("DELETE FROM cart WHERE user_id = $1", user_id)
+        await self.execute("DELETE FROM cart WHERE user_id = $1", user_id, statement="clear_cart")
         logger.info(f"🗑 User {user_id} очистил корзину.")
 
+    async def delete_abandoned_carts(self, ttl: timedelta, batch_size: int) -> int:
+        """Удаляет корзины, в которых ничего не менялось дольше ttl, пачками.
+
+        Корзина удаляется целиком: позиция остаётся, пока у пользователя есть хотя бы одна свежая.
+        Пачку задают batch_size самых старых позиций (диапазон по cart_updated_at_idx),
+        затем удаляются корзины их владельцев. Возвращает число удалённых строк.
+        """
+        deleted = 0
+        while True:
+            user_ids = await self.fetchval("""
+                SELECT array_agg(DISTINCT stale.user_id) FROM (
+                    SELECT c.user_id FROM cart c
+                    WHERE c.updated_at < now() - $1::interval
+                      AND NOT EXISTS (SELECT 1 FROM cart f
+                                      WHERE f.user_id = c.user_id AND f.updated_at >= now() - $1::interval)
+                    ORDER BY c.updated_at
+                    LIMIT $2
+                ) stale
+            """, ttl, batch_size, statement="delete_abandoned_carts")
+            if not user_ids:
+                return deleted
+            # Свежесть проверяется ещё раз: пользователь мог положить товар между запросами
+            result = await self.execute("""
+                DELETE FROM cart c
+                WHERE c.user_id = ANY($1::bigint[])
+                  AND NOT EXISTS (SELECT 1 FROM cart f
+                                  WHERE f.user_id = c.user_id AND f.updated_at >= now() - $2::interval)
+            """, user_ids, ttl, statement="delete_abandoned_carts")
+            deleted += int(result.split()[-1])
+
     async def create_order(self, user_id: int, address: str, phone: str, total_price: float) -> int:
         """Создаёт новый заказ и возвращает его ID."""
         order_id = await self.fetchrow("""
             INSERT INTO orders (user_id, address, phone, total_price)
             VALUES ($1, $2, $3, $4) RETURNING order_id;
-        """, user_id, address, phone, total_price)
+        """, user_id, address, phone, total_price, statement="create_order")
         return order_id["order_id"]
 
     async def add_order_item(self, order_id: int, product_id: int, quantity: int):
@@ -116,7 +600,62 @@ class Database:
         await self.execute("""
             INSERT INTO order_items (order_id, product_id, quantity)
             VALUES ($1, $2, $3);
-        """, order_id, product_id, quantity)
+        """, order_id, product_id, quantity, statement="add_order_item")
+
+    async def place_order(self, user_id: int, address: str, phone: str, min_total_kopecks: int = 0):
+        """Оформляет заказ из корзины пользователя одним запросом.
+
+        Читает корзину, считает суммы позиций и итог в копейках, создаёт заказ
+        и переносит в него все позиции в одном SQL-выражении, то есть атомарно
+        и за один round trip. orders.total_price — тот же итог в рублях.
+        Возвращает (order_id, строки позиций с total_kopecks и order_total_kopecks).
+        Если корзина пуста или итог меньше min_total_kopecks, заказ не создаётся
+        и order_id равен None.
+        """
+        rows = await self.fetch("""
+            WITH lines AS (
+                SELECT c.product_id, p.name, c.quantity,
+                       round(p.price * c.quantity * 100)::bigint AS total_kopecks
+                FROM cart c
+                JOIN products p ON c.product_id = p.id
+                WHERE c.user_id = $1
+            ), totals AS (
+                SELECT COUNT(*) AS line_count, SUM(total_kopecks)::bigint AS total_kopecks FROM lines
+            ), new_order AS (
+                INSERT INTO orders (user_id, address, phone, total_price)
+                SELECT $1, $2, $3, total_kopecks / 100.0 FROM totals
+                WHERE line_count > 0 AND total_kopecks >= $4
+                RETURNING order_id
+            ), items AS (
+                INSERT INTO order_items (order_id, product_id, quantity)
+                SELECT o.order_id, l.product_id, l.quantity
+                FROM new_order o CROSS JOIN lines l
+            )
+            SELECT (SELECT order_id FROM new_order) AS order_id, t.total_kopecks AS order_total_kopecks, l.*
+            FROM lines l CROSS JOIN totals t
+            ORDER BY l.product_id
+        """, user_id, address, phone, min_total_kopecks, statement="place_order")
+        order_id = rows[0]["order_id"] if rows else None
+        return order_id, rows
+
+    async def expire_unpaid_orders(self, ttl: timedelta, batch_size: int) -> int:
+        """Помечает статусом expired заказы, не оплаченные (status IS NULL) за ttl. Возвращает их число."""
+        expired = 0
+        while True:
+            result = await self.execute("""
+                UPDATE orders SET status = 'expired'
+                WHERE order_id IN (
+                    SELECT order_id FROM orders
+                    WHERE status IS NULL AND created_at < now() - $1::interval
+                    ORDER BY order_id
+                    LIMIT $2
+                    FOR UPDATE SKIP LOCKED
+                )
+            """, ttl, batch_size, statement="expire_unpaid_orders")
+            batch = int(result.split()[-1])
+            expired += batch
+            if batch < batch_size:
+                return expired
 
     async def get_order_items(self, order_id: int):
         """Получает список товаров в заказе."""
@@ -125,40 +664,56 @@ class Database:
             FROM order_items oi
             JOIN products p ON oi.product_id = p.id
             WHERE oi.order_id = $1
-        """, order_id)
+        """, order_id, statement="get_order_items")
 
 
 
     async def get_all_orders(self):
         """Получает список всех заказов из БД."""
         return await self.fetch("""
+            -- plan: full scan
             SELECT o.order_id, o.user_id, o.address, o.phone, o.total_price, o.status, oi.product_id, p.name, oi.quantity
             FROM orders o
             JOIN order_items oi ON o.order_id = oi.order_id
             JOIN products p ON oi.product_id = p.id
             ORDER BY o.order_id DESC
-        """)
-
-    async def generate_orders_csv(self) -> str:
-        """Создаёт CSV-файл со всеми заказами и возвращает путь к нему."""
-        orders = await self.get_all_orders()
-
-        if not orders:
+        """, statement="get_all_orders")
+
+    async def export_orders_csv(self, status: str = None, date_from=None, date_to=None,
+                                compress: bool = False) -> str | None:
+        """Потоково выгружает заказы в CSV во временный файл и возвращает путь к нему.
+
+        Строки идут из COPY ... TO STDOUT частями прямо в файл, поэтому память
+        не растёт с историей заказов. Если заказов нет, возвращает None.
+        """
+        fd, file_path = tempfile.mkstemp(prefix="orders_", suffix=".csv.gz" if compress else ".csv")
+        try:
+            with os.fdopen(fd, "wb") as raw_file:
+                output = gzip.GzipFile(fileobj=raw_file, mode="wb") if compress else raw_file
+                with output:
+                    output.write("\ufeff".encode("utf-8"))  # BOM, чтобы Excel открыл UTF-8
+                    async with self.pool.acquire() as conn:
+                        result = await conn.copy_from_query("""
+                            -- plan: full scan
+                            SELECT o.order_id AS "Order ID", o.user_id AS "User ID", o.address AS "Address",
+                                   o.phone AS "Phone", o.total_price AS "Total Price (RUB)", o.status AS "Status",
+                                   o.created_at AS "Created At", oi.product_id AS "Product ID",
+                                   p.name AS "Product Name", oi.quantity AS "Quantity"
+                            FROM orders o
+                            JOIN order_items oi ON o.order_id = oi.order_id
+                            JOIN products p ON oi.product_id = p.id
+                            WHERE ($1::text IS NULL OR o.status = $1)
+                              AND ($2::timestamptz IS NULL OR o.created_at >= $2)
+                              AND ($3::timestamptz IS NULL OR o.created_at < $3)
+                            ORDER BY o.order_id DESC
+                        """, status, date_from, date_to, output=output, format="csv", header=True)
+        except BaseException:
+            os.remove(file_path)
+            raise
+
+        if result == "COPY 0":
+            os.remove(file_path)
             return None  # Если заказов нет
-
-        # Конвертируем данные в DataFrame
-        df = pd.DataFrame(orders)
-
-        # Переименовываем столбцы для читаемости
-        df.columns = ["Order ID", "User ID", "Address", "Phone", "Total Price (RUB)", "Status", "Product ID",
-                      "Product Name", "Quantity"]
-
-        # Создаём путь к файлу
-        file_path = "orders.csv"
-
-        # Сохраняем CSV
-        df.to_csv(file_path, index=False, encoding="utf-8-sig")
-
         return file_path
 
     async def add_user(self, user_id: int, username: str, full_name: str):
@@ -167,24 +722,38 @@ class Database:
             INSERT INTO users (user_id, username, full_name)
             VALUES ($1, $2, $3)
             ON CONFLICT (user_id) DO NOTHING;
-        """, user_id, username, full_name)
+        """, user_id, username, full_name, statement="add_user")
 
         logger.info(f"👤 Новый пользователь: {user_id} - {full_name} (@{username})")
 
-    async def add_faq(self, question: str, answer: str):
-        """Добавляет новый вопрос-ответ в FAQ, если его нет."""
-        await self.execute("""
-            INSERT INTO faq (question, answer)
-            VALUES ($1, $2)
-            ON CONFLICT (question) DO UPDATE SET answer = EXCLUDED.answer;
-        """, question, answer)
+    async def add_faq(self, question: str, answer: str) -> int:
+        """Добавляет новый вопрос-ответ в FAQ (или обновляет ответ) и возвращает его ID.
+
+        Другие процессы бота узнают об изменении через NOTIFY faq_changed.
+        """
+        faq_id = await self.fetchval("""
+            WITH upserted AS (
+                INSERT INTO faq (question, answer)
+                VALUES ($1, $2)
+                ON CONFLICT (question) DO UPDATE SET answer = EXCLUDED.answer
+                RETURNING id
+            )
+            SELECT id FROM upserted, pg_notify('faq_changed', id::text)
+        """, question, answer, statement="add_faq")
 
         logger.info(f"📌 Добавлен FAQ: {question}")
+        return faq_id
 
     async def get_faq(self):
         """Получает список всех вопросов и ответов."""
-        return await self.fetch("SELECT id, question, answer FROM faq")
+        return await self.fetch("SELECT id, question, answer FROM faq", statement="get_faq")
+
+    async def get_faq_by_id(self, faq_id: int):
+        """Получает вопрос и ответ по ID."""
+        return await self.fetchrow("SELECT id, question, answer FROM faq WHERE id = $1", faq_id,
+                                   statement="get_faq_by_id")
 
     async def get_faq_by_question(self, question: str):
         """Ищет ответ на вопрос в БД."""
-        return await self.fetchrow("SELECT answer FROM faq WHERE question = $1", question)
\ No newline at end of file
+        return await self.fetchrow("SELECT answer FROM faq WHERE question = $1", question,
+                                   statement="get_faq_by_question")
\ No newline at end of file
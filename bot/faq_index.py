@@ -0,0 +1,174 @@
+import math
+import re
+from collections import Counter
+
+from database import Database
+from logger import logger
+
+# Канал LISTEN/NOTIFY: payload — id изменённого вопроса
+FAQ_CHANNEL = "faq_changed"
+
+NON_WORD = re.compile(r"[^\w]+")
+
+
+def normalize(text: str) -> str:
+    """Приводит вопрос к каноническому виду: нижний регистр, ё -> е, без пунктуации."""
+    return " ".join(NON_WORD.sub(" ", text.lower().replace("ё", "е")).split())
+
+
+def trigrams(text: str) -> set[str]:
+    """Триграммы слов нормализованного текста (как в pg_trgm: слово дополняется пробелами)."""
+    grams = set()
+    for word in text.split():
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+class FaqIndex:
+    """Индекс FAQ в памяти: точное совпадение и нечёткий поиск.
+
+    Вопросы разбиваются на слова, по словам строится инвертированный индекс.
+    Похожесть — взвешенный по IDF коэффициент Жаккара: частые слова («как»,
+    «где») почти ничего не весят. Кандидаты берутся только по самым редким
+    словам запроса (prefix filtering): вопрос без них не наберёт порог,
+    поэтому поиск не перебирает все вопросы. Слова с опечатками заменяются
+    на ближайшее слово словаря по триграммам.
+    """
+
+    def __init__(self, threshold: float = 0.6, typo_threshold: float = 0.5):
+        self.threshold = threshold
+        self.typo_threshold = typo_threshold
+        self.entries = {}  # id -> (question, answer)
+        self.exact = {}  # нормализованный вопрос -> id
+        self.words = {}  # id -> слова вопроса
+        self.postings = {}  # слово -> set(id)
+        self.vocabulary = {}  # триграмма -> set(слово), для исправления опечаток
+        self.gram_counts = {}  # слово -> число его триграмм
+
+    def load(self, rows):
+        """Перестраивает индекс по строкам (id, question, answer)."""
+        self.entries.clear()
+        self.exact.clear()
+        self.words.clear()
+        self.postings.clear()
+        self.vocabulary.clear()
+        self.gram_counts.clear()
+        for row in rows:
+            self.add(row["id"], row["question"], row["answer"])
+
+    def add(self, faq_id: int, question: str, answer: str):
+        """Добавляет или заменяет вопрос."""
+        self.remove(faq_id)
+        normalized = normalize(question)
+        words = set(normalized.split())
+        self.entries[faq_id] = (question, answer)
+        self.exact[normalized] = faq_id
+        self.words[faq_id] = words
+        for word in words:
+            if word not in self.postings:
+                self.postings[word] = set()
+                grams = trigrams(word)
+                self.gram_counts[word] = len(grams)
+                for gram in grams:
+                    self.vocabulary.setdefault(gram, set()).add(word)
+            self.postings[word].add(faq_id)
+
+    def remove(self, faq_id: int):
+        """Удаляет вопрос из индекса, если он там есть."""
+        entry = self.entries.pop(faq_id, None)
+        if entry is None:
+            return
+        normalized = normalize(entry[0])
+        if self.exact.get(normalized) == faq_id:
+            del self.exact[normalized]
+        for word in self.words.pop(faq_id):
+            ids = self.postings[word]
+            ids.discard(faq_id)
+            if not ids:
+                del self.postings[word]
+                del self.gram_counts[word]
+                for gram in trigrams(word):
+                    self.vocabulary[gram].discard(word)
+                    if not self.vocabulary[gram]:
+                        del self.vocabulary[gram]
+
+    def get(self, faq_id: int):
+        """Возвращает (question, answer) по id или None."""
+        return self.entries.get(faq_id)
+
+    def search(self, text: str):
+        """Ищет самый похожий вопрос. Возвращает (id, score) или None."""
+        normalized = normalize(text)
+        faq_id = self.exact.get(normalized)
+        if faq_id is not None:
+            return faq_id, 1.0
+
+        words = {self._correct(word) for word in normalized.split()}
+        if not words:
+            return None
+        weights = {word: self._idf(word) for word in words}
+        total = sum(weights.values())
+        needed = self.threshold * total
+
+        # Вопрос с похожестью >= threshold делит с запросом слова весом не меньше needed,
+        # значит содержит хотя бы одно из самых редких слов, пока остаток весит >= needed
+        candidates = set()
+        rest = total
+        for word in sorted(words, key=weights.get, reverse=True):
+            if rest < needed:
+                break
+            candidates.update(self.postings.get(word, ()))
+            rest -= weights[word]
+
+        best_id, best_score = None, 0.0
+        for candidate in candidates:
+            other = self.words[candidate]
+            common = sum(weights[word] for word in words & other)
+            score = common / (total + sum(self._idf(word) for word in other - words))
+            if score > best_score:
+                best_id, best_score = candidate, score
+        if best_score < self.threshold:
+            return None
+        return best_id, best_score
+
+    def _idf(self, word: str) -> float:
+        """Вес слова: чем в большем числе вопросов оно встречается, тем он меньше."""
+        return math.log((len(self.entries) + 1) / (len(self.postings.get(word, ())) + 1)) + 1
+
+    def _correct(self, word: str) -> str:
+        """Заменяет незнакомое слово на самое похожее слово словаря (по триграммам)."""
+        if word in self.postings:
+            return word
+        grams = trigrams(word)
+        overlaps = Counter()
+        for gram in grams:
+            overlaps.update(self.vocabulary.get(gram, ()))
+        best, best_score = word, self.typo_threshold
+        for candidate, common in overlaps.items():
+            score = common / (len(grams) + self.gram_counts[candidate] - common)
+            if score >= best_score:
+                best, best_score = candidate, score
+        return best
+
+    def __len__(self):
+        return len(self.entries)
+
+
+faq_index = FaqIndex()
+
+
+async def setup_faq_index(db: Database):
+    """Загружает FAQ в индекс и подписывается на изменения вопросов."""
+    faq_index.load(await db.get_faq())
+    logger.info(f"📚 FAQ загружен в индекс: {len(faq_index)} вопросов.")
+
+    async def on_faq_changed(connection, pid, channel, payload):
+        faq_id = int(payload)
+        row = await db.get_faq_by_id(faq_id)
+        if row:
+            faq_index.add(row["id"], row["question"], row["answer"])
+        else:
+            faq_index.remove(faq_id)
+
+    await db.listen(FAQ_CHANNEL, on_faq_changed)
@@ -1,7 +1,8 @@
 import os
+from datetime import datetime, timezone
 
 from aiogram import Router, types
-from aiogram.filters import Command
+from aiogram.filters import Command, CommandObject
 from aiogram.client.session.aiohttp import AiohttpSession
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 from aiogram.types import Message, LabeledPrice, PreCheckoutQuery, ContentType
@@ -9,14 +10,25 @@ from aiogram import F
 
 from aiogram import Bot, types
 import re
-from config import CHANNEL, YOOKASSA_PROVIDER_TOKEN
+from config import CHANNEL, YOOKASSA_PROVIDER_TOKEN, INLINE_PAGE_SIZE, INLINE_CACHE_TIME, ADMIN_IDS
 from keyboards import subscribe_keyboard, main_keyboard, categories_keyboard, subcategories_keyboard, \
     product_navigation_keyboard, confirm_keyboard, cart_keyboard
-from logger import logger
+from logger import logger, SAMPLED
 from database import Database
+from cart import CartService, render_cart
+from pricing import MIN_ORDER_KOPECKS, OrderTotals, format_kopecks
+from faq_index import faq_index
+from media import send_product_photo, edit_product_photo, warm_up_product_photos
+from callbacks import (CallbackDispatcher, SubCheck, CategoriesPage, Category, SubcategoriesPage, Subcategory,
+                       ProductPage, ProductIndex, AddToCart, ConfirmCart, CancelCart, RemoveFromCart, ClearCart,
+                       Checkout, FaqAnswer)
+from subscription import subscription_checker
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 router = Router()
+# Все нажатия inline-кнопок идут через одну таблицу обработчиков (см. callbacks.py)
+callbacks = CallbackDispatcher()
+router.callback_query.register(callbacks.dispatch)
 
 class OrderState(StatesGroup):
     waiting_for_address = State()
@@ -31,17 +43,21 @@ class FAQState(StatesGroup):
     waiting_for_answer = State()
 
 
-async def check_subscription(user_id: int, bot):
-    """Проверяем подписан ли на канал"""
-    try:
-        chat_member = await bot.get_chat_member(chat_id=CHANNEL, user_id=user_id)
-        is_subscribed = chat_member.status in ["member", "administrator", "creator"]
+async def check_subscription(user_id: int, bot, refresh: bool = False):
+    """Проверяем подписан ли на канал (с кэшем, см. subscription.py)"""
+    return await subscription_checker.is_subscribed(user_id, bot, refresh=refresh)
 
-        logger.info(f"👤 Проверка подписки: User {user_id} {'ПОДПИСАН' if is_subscribed else 'НЕ подписан'}")
-        return is_subscribed
-    except Exception as e:
-        logger.error(f"❌ Ошибка при проверке подписки у User {user_id}: {e}")
-        return False  # На случай ошибки считаем, что не подписан
+
+@router.chat_member()
+async def channel_member_updated(event: types.ChatMemberUpdated):
+    """Обновляет кэш подписки, когда кто-то подписывается на канал или отписывается.
+
+    Telegram присылает такие обновления, только если бот — администратор канала.
+    """
+    if str(event.chat.id) != CHANNEL and f"@{event.chat.username}" != CHANNEL:
+        return
+    member = event.new_chat_member
+    subscription_checker.update(member.user.id, member.status, getattr(member, "is_member", False))
 
 
 @router.message(Command("start"))
@@ -62,10 +78,10 @@ async def start_handler(message: types.Message, bot):
     logger.info(f"✅ {user_id} подписан")
     await message.answer("Выберите действие:", reply_markup=await main_keyboard())
 
-@router.callback_query(lambda c: c.data == "sub_check")
-async def check_subscription_callback(callback: types.CallbackQuery, bot):
+@callbacks.register(SubCheck)
+async def check_subscription_callback(callback: types.CallbackQuery, data: SubCheck, bot):
     user_id = callback.from_user.id
-    if await check_subscription(user_id, bot):
+    if await check_subscription(user_id, bot, refresh=True):
         logger.info(f"✅ {user_id} подписалс")
         await callback.message.answer("Выберите действие:", reply_markup=await main_keyboard())
     else:
@@ -77,107 +93,117 @@ async def catalog_handler(message: types.Message):
     logger.info(f"📦 {message.from_user.id} открыл каталог.")
     await message.answer("📦 Выберите категорию:", reply_markup=await categories_keyboard(page=0))
 
-@router.callback_query(lambda c: c.data.startswith("page_"))
-async def pagination_callback(callback: types.CallbackQuery):
+@callbacks.register(CategoriesPage)
+async def pagination_callback(callback: types.CallbackQuery, data: CategoriesPage):
     """Обрабатывает кнопки пагинации."""
-    page = int(callback.data.split("_")[1])
-    logger.info(f"📄 {callback.from_user.id} переключил страницу на {page}.")
+    page = data.page
+    logger.info(f"📄 {callback.from_user.id} переключил страницу на {page}.", extra=SAMPLED)
     keyboard = await categories_keyboard(page)
     await callback.message.edit_text("📦 Выберите категорию:", reply_markup=keyboard)
 
-@router.callback_query(lambda c: c.data.startswith("category_"))
-async def category_callback(callback: types.CallbackQuery):
+@callbacks.register(Category)
+async def category_callback(callback: types.CallbackQuery, data: Category):
     """Обрабатывает выбор категории и показывает подкатегории."""
-    category_id = int(callback.data.split("_")[1])
+    category_id = data.category_id
     logger.info(f"✅ {callback.from_user.id} выбрал категорию ID {category_id}.")
     keyboard = await subcategories_keyboard(category_id, page=0)
     await callback.message.edit_text("🔍 Выберите подкатегорию:", reply_markup=keyboard)
 
 
-@router.callback_query(lambda c: c.data.startswith("subcat_page_"))
-async def subcategory_pagination_callback(callback: types.CallbackQuery):
+@callbacks.register(SubcategoriesPage)
+async def subcategory_pagination_callback(callback: types.CallbackQuery, data: SubcategoriesPage):
     """Обрабатывает кнопки пагинации подкатегорий."""
-    try:
-        data_parts = callback.data.split("_")
-        category_id = int(data_parts[2])  # ID категории
-        page = int(data_parts[3])  # Номер страницы
-
-        logger.info(f"📄 {callback.from_user.id} листает подкатегории категории {category_id}, страница {page}.")
-        keyboard = await subcategories_keyboard(category_id, page)
-        await callback.message.edit_text("🔍 Выберите подкатегорию:", reply_markup=keyboard)
-
-    except ValueError as e:
-        logger.error(f"❌ Ошибка обработки пагинации подкатегорий: {e}")
-        await callback.answer("❌ Ошибка загрузки подкатегорий.")
+    category_id, page = data.category_id, data.page
+    logger.info(f"📄 {callback.from_user.id} листает подкатегории категории {category_id}, страница {page}.", extra=SAMPLED)
+    keyboard = await subcategories_keyboard(category_id, page)
+    await callback.message.edit_text("🔍 Выберите подкатегорию:", reply_markup=keyboard)
 
 
-@router.callback_query(lambda c: c.data.startswith("subcategory_"))
-async def subcategory_callback(callback: types.CallbackQuery):
+@callbacks.register(Subcategory)
+async def subcategory_callback(callback: types.CallbackQuery, data: Subcategory):
     """Обрабатывает выбор подкатегории и показывает первый товар."""
-    subcategory_id = int(callback.data.split("_")[1])
+    subcategory_id = data.subcategory_id
     db = Database()
-    products = await db.get_products_by_subcategory(subcategory_id)
+    product = await db.get_product_card(subcategory_id)  # Первый товар подкатегории
 
-    if products:
-        product = products[0]  # Берём первый товар
-        total_products = len(products)
+    if product:
         logger.info(f"🛍 User {callback.from_user.id} смотрит товар {product['name']} (ID {product['id']}).")
 
         text = f"🛍 *{product['name']}*\n💰 Цена: ${product['price']}\n📜 {product['description']}"
-        keyboard = await product_navigation_keyboard(subcategory_id, 0, total_products, product['id'])
+        keyboard = await product_navigation_keyboard(subcategory_id, product['id'], product['prev_id'],
+                                                     product['next_id'])
 
         await callback.message.delete()
-        await callback.message.answer_photo(photo=product['image_url'], caption=text, reply_markup=keyboard,
-                                            parse_mode="Markdown")
+        await send_product_photo(callback.message, product, caption=text, reply_markup=keyboard,
+                                 parse_mode="Markdown")
+        db.prefetch_product_cards(subcategory_id, product['next_id'])
     else:
         await callback.answer("❌ В этой подкатегории пока нет товаров.")
 
 
-@router.callback_query(lambda c: c.data.startswith("product_page_"))
-async def product_pagination_callback(callback: types.CallbackQuery):
+@callbacks.register(ProductPage)
+async def product_pagination_callback(callback: types.CallbackQuery, data: ProductPage):
     """Обрабатывает кнопки пагинации товаров (по одному)."""
-    try:
-        data_parts = callback.data.split("_")
-        subcategory_id = int(data_parts[2])  # ID подкатегории
-        product_index = int(data_parts[3])  # Индекс товара
+    subcategory_id = data.subcategory_id
+    db = Database()
+    product = await db.get_product_card(subcategory_id, data.product_id)
 
-        db = Database()
-        products = await db.get_products_by_subcategory(subcategory_id)
+    if product:
+        logger.info(f"🛍 {callback.from_user.id} листает товар {product['name']} (ID {product['id']}).", extra=SAMPLED)
 
-        if 0 <= product_index < len(products):
-            product = products[product_index]
-            logger.info(
-                f"🛍 {callback.from_user.id} листает товар {product['name']} (ID {product['id']}), позиция {product_index}.")
+        text = f"🛍 *{product['name']}*\n💰 Цена: ${product['price']}\n📜 {product['description']}"
+        keyboard = await product_navigation_keyboard(subcategory_id, product['id'], product['prev_id'],
+                                                     product['next_id'])
 
-            text = f"🛍 *{product['name']}*\n💰 Цена: ${product['price']}\n📜 {product['description']}"
-            keyboard = await product_navigation_keyboard(subcategory_id, product_index, len(products), product['id'])
+        # Одно сообщение-карусель: меняем фото, подпись и кнопки одним запросом
+        await edit_product_photo(callback.message, product, caption=text, reply_markup=keyboard,
+                                 parse_mode="Markdown")
+        db.prefetch_product_cards(subcategory_id, product['prev_id'], product['next_id'])
+    else:
+        await callback.answer("❌ Ошибка загрузки товара.")
 
-            await callback.message.delete()
-            await callback.message.answer_photo(photo=product['image_url'], caption=text, reply_markup=keyboard,
-                                                parse_mode="Markdown")
-        else:
-            await callback.answer("❌ Ошибка загрузки товара.")
 
-    except (ValueError, IndexError) as e:
-        logger.error(f"❌ Ошибка обработки пагинации товаров: {e}")
-        await callback.answer("❌ Ошибка загрузки товаров.")
+@callbacks.register(ProductIndex)
+async def legacy_product_pagination_callback(callback: types.CallbackQuery, data: ProductIndex):
+    """Кнопки листания из старых сообщений: номер товара переводится в его ID."""
+    product_id = await Database().get_product_id_at(data.subcategory_id, data.index)
+    # Если товаров стало меньше, показываем первый товар подкатегории
+    await product_pagination_callback(callback, ProductPage(data.subcategory_id, product_id or 0))
 
 
-@router.callback_query(lambda c: c.data.startswith("add_to_cart_"))
-async def add_to_cart_callback(callback: types.CallbackQuery, state: FSMContext):
+@router.inline_query()
+async def inline_search_handler(inline_query: types.InlineQuery):
+    """Ищет товары по тексту inline-запроса (@bot запрос) и отдаёт их страницами."""
+    offset = int(inline_query.offset) if inline_query.offset.isdigit() else 0
+    db = Database()
+    products, has_next = await db.search_products(inline_query.query, INLINE_PAGE_SIZE, offset)
+
+    results = []
+    for product in products:
+        caption = f"🛍 *{product['name']}*\n💰 Цена: ${product['price']}\n📜 {product['description']}"
+        common = dict(id=str(product['id']), title=product['name'], description=f"💰 ${product['price']}",
+                      caption=caption, parse_mode="Markdown")
+        file_id = db.get_product_file_id(product)
+        if file_id:
+            # Фото уже загружено в Telegram: клиент не будет скачивать его по ссылке
+            results.append(types.InlineQueryResultCachedPhoto(photo_file_id=file_id, **common))
+        elif product['image_url']:  # Фото обязательно для результата
+            results.append(types.InlineQueryResultPhoto(photo_url=product['image_url'],
+                                                        thumbnail_url=product['image_url'], **common))
+    logger.info(f"🔎 User {inline_query.from_user.id} ищет '{inline_query.query}': {len(results)} товаров.", extra=SAMPLED)
+    await inline_query.answer(results, cache_time=INLINE_CACHE_TIME, is_personal=False,
+                              next_offset=str(offset + INLINE_PAGE_SIZE) if has_next else "")
+
+
+@callbacks.register(AddToCart)
+async def add_to_cart_callback(callback: types.CallbackQuery, data: AddToCart, state: FSMContext):
     """Запрашивает количество товара для добавления в корзину."""
-    try:
-        data = callback.data.split("_")
-        product_id = int(data[3])
-        await state.update_data(product_id=product_id)
-        await state.set_state(CartState.waiting_for_quantity)
-        logger.info(f"🛒 {callback.from_user.id} выбрал товар {product_id}, запрашиваем количество.")
-        await callback.message.delete()
-        await callback.message.answer("🔢 Введите количество товаров (число):")
-
-    except ValueError as e:
-        logger.error(f"❌ Ошибка обработки добавления в корзину: {e}")
-        await callback.answer("❌ Ошибка при добавлении в корзину.")
+    product_id = data.product_id
+    await state.update_data(product_id=product_id)
+    await state.set_state(CartState.waiting_for_quantity)
+    logger.info(f"🛒 {callback.from_user.id} выбрал товар {product_id}, запрашиваем количество.")
+    await callback.message.delete()
+    await callback.message.answer("🔢 Введите количество товаров (число):")
 
 
 @router.message(CartState.waiting_for_quantity)
@@ -198,24 +224,23 @@ async def process_quantity(message: types.Message, state: FSMContext):
     logger.info(f"🛒 {message.from_user.id} выбрал {quantity} шт., ждем подтверждения.")
     await message.answer(f"Добавить {quantity} шт. в корзину?", reply_markup=await confirm_keyboard())
 
-@router.callback_query(lambda c: c.data == "confirm_cart")
-async def confirm_cart_callback(callback: types.CallbackQuery, state: FSMContext):
+@callbacks.register(ConfirmCart)
+async def confirm_cart_callback(callback: types.CallbackQuery, data: ConfirmCart, state: FSMContext):
     """Добавляет товар в корзину после подтверждения."""
-    data = await state.get_data()
+    state_data = await state.get_data()
     user_id = callback.from_user.id
-    product_id = data.get("product_id")
-    quantity = data.get("quantity")
+    product_id = state_data.get("product_id")
+    quantity = state_data.get("quantity")
 
-    db = Database()
-    await db.add_to_cart(user_id, product_id, quantity)
+    await CartService().add(user_id, product_id, quantity)
 
     logger.info(f"✅ {user_id} добавил {quantity} шт. товара {product_id} в корзину.")
     await state.clear()
     await callback.message.delete()
     await callback.message.answer("✅ Товар добавлен в корзину!\n\n📍 Главное меню:", reply_markup=await main_keyboard())
 
-@router.callback_query(lambda c: c.data == "cancel_cart")
-async def cancel_cart_callback(callback: types.CallbackQuery, state: FSMContext):
+@callbacks.register(CancelCart)
+async def cancel_cart_callback(callback: types.CallbackQuery, data: CancelCart, state: FSMContext):
     """Отмена добавления в корзину."""
     await state.clear()
     logger.info(f"❌ {callback.from_user.id} отменил добавление в корзину.")
@@ -229,63 +254,47 @@ async def cancel_cart_callback(callback: types.CallbackQuery, state: FSMContext)
 @router.message(lambda message: message.text == "🛒 Корзина")
 async def show_cart_handler(message: types.Message):
     """Показывает содержимое корзины пользователя."""
-    db = Database()
-    cart_items = await db.get_cart(message.from_user.id)
+    cart = await CartService().snapshot(message.from_user.id)
 
-    if not cart_items:
+    if not cart:
         await message.answer("🛒 Ваша корзина пуста.")
         return
 
-    text = "🛒 *Ваша корзина:*\n"
-    total_price = 0
-
-    for item in cart_items:
-        item_total = float(item['price']) * item['quantity']
-        total_price += item_total
-        text += f"🔹 {item['name']} - {item['quantity']} шт. *${item_total:.2f}*\n"
-
-    text += f"\n💰 *Итого: ${total_price:.2f}*"
-
-    keyboard = await cart_keyboard(message.from_user.id)
-
     logger.info(f"🛒 User {message.from_user.id} открыл корзину.")
-    await message.answer(text, reply_markup=keyboard, parse_mode="Markdown")
+    await message.answer(render_cart(cart), reply_markup=await cart_keyboard(cart), parse_mode="Markdown")
 
-@router.callback_query(lambda c: c.data.startswith("remove_"))
-async def remove_from_cart_callback(callback: types.CallbackQuery):
+@callbacks.register(RemoveFromCart)
+async def remove_from_cart_callback(callback: types.CallbackQuery, data: RemoveFromCart):
     """Удаляет товар из корзины."""
-    product_id = int(callback.data.split("_")[1])
+    product_id = data.product_id
     user_id = callback.from_user.id
-    db = Database()
 
-    await db.remove_from_cart(user_id, product_id)
+    # Удаление и новое содержимое корзины — один запрос
+    cart = await CartService().remove(user_id, product_id)
     logger.info(f"🗑 {user_id} удалил товар ID {product_id} из корзины.")
 
     await callback.answer("✅ Товар удалён.")
-    await callback.message.delete()
 
-    # Обновляем корзину
-    keyboard = await cart_keyboard(user_id)
-    if keyboard:
-        await callback.message.answer("🛒 *Обновлённая корзина:*", reply_markup=keyboard, parse_mode="Markdown")
+    # Обновляем корзину в том же сообщении
+    if cart:
+        await callback.message.edit_text(render_cart(cart, "🛒 *Обновлённая корзина:*"),
+                                         reply_markup=await cart_keyboard(cart), parse_mode="Markdown")
     else:
-        await callback.message.answer("🛒 Ваша корзина пуста.")
+        await callback.message.edit_text("🛒 Ваша корзина пуста.")
 
-@router.callback_query(lambda c: c.data == "clear_cart")
-async def clear_cart_callback(callback: types.CallbackQuery):
+@callbacks.register(ClearCart)
+async def clear_cart_callback(callback: types.CallbackQuery, data: ClearCart):
     """Очищает всю корзину пользователя."""
     user_id = callback.from_user.id
-    db = Database()
 
-    await db.clear_cart(user_id)
+    await CartService().clear(user_id)
     logger.info(f"🗑 {user_id} очистил корзину.")
 
     await callback.answer("🗑 Корзина очищена.")
-    await callback.message.delete()
-    await callback.message.answer("🛒 Ваша корзина пуста.")
+    await callback.message.edit_text("🛒 Ваша корзина пуста.")
 
-@router.callback_query(lambda c: c.data == "checkout")
-async def checkout_callback(callback: types.CallbackQuery, state: FSMContext):
+@callbacks.register(Checkout)
+async def checkout_callback(callback: types.CallbackQuery, data: Checkout, state: FSMContext):
     """Запрашивает адрес доставки."""
     await state.set_state(OrderState.waiting_for_address)
     logger.info(f"📦{callback.from_user.id} начал оформление заказа.")
@@ -322,51 +331,35 @@ async def process_phone(message: types.Message, state: FSMContext, bot: Bot):
         phone = data.get("phone")
 
         db = Database()
-        cart_items = await db.get_cart(user_id)
+        # Заказ и все его позиции создаются одним запросом, суммы в копейках считает БД
+        order = OrderTotals.from_rows(*await db.place_order(user_id, address, phone, MIN_ORDER_KOPECKS))
 
-        if not cart_items:
+        if not order:
             await message.answer("❌ Ошибка: ваша корзина пуста.")
             await state.clear()
             return
 
-        # Переводим сумму в копейки
-        total_price_cents = sum(int(round(float(item['price']) * item['quantity'] * 100)) for item in cart_items)
-
-        # Проверяем минимальную сумму заказа (100 рублей = 10000 копеек)
-        MIN_ORDER_AMOUNT_CENTS = 10000  # 100 рублей
-        if total_price_cents < MIN_ORDER_AMOUNT_CENTS:
-            await message.answer(f"❌ Ошибка: минимальная сумма заказа - 100 рублей.\nВаш заказ: {total_price_cents / 100:.2f} RUB.")
+        total = format_kopecks(order.total_kopecks)
+        if order.order_id is None:
+            await message.answer(f"❌ Ошибка: минимальная сумма заказа - {format_kopecks(MIN_ORDER_KOPECKS)} RUB.\n"
+                                 f"Ваш заказ: {total} RUB.")
             await state.clear()
             return
 
-        order_id = await db.create_order(user_id, address, phone, total_price_cents / 100)  # Храним сумму в рублях
-
-        for item in cart_items:
-            await db.add_order_item(order_id, item["product_id"], item["quantity"])
-
         await state.set_state(OrderState.waiting_for_payment)
 
-        logger.info(f"💰 User {user_id} оформил заказ #{order_id} на сумму {total_price_cents / 100:.2f} RUB.")
-
-        prices = [
-            types.LabeledPrice(
-                label=f"{item['name']} ({item['quantity']} шт.)",
-                amount=int(round(float(item['price']) * item['quantity'] * 100))  # Переводим в копейки
-            )
-            for item in cart_items
-        ]
+        logger.info(f"💰 User {user_id} оформил заказ #{order.order_id} на сумму {total} RUB.")
 
         await bot.send_invoice(
             chat_id=user_id,
             title="Оплата заказа",
-            description=f"Заказ #{order_id}, сумма: {total_price_cents / 100:.2f} RUB",
+            description=f"Заказ #{order.order_id}, сумма: {total} RUB",
             provider_token=YOOKASSA_PROVIDER_TOKEN,
             currency="RUB",
-            prices=prices,
+            prices=order.labeled_prices(),
             start_parameter="order_payment",
-            payload=str(order_id)
+            payload=str(order.order_id)
         )
-        print('WQE')
     except Exception as e:
         logger.error(f" Error occurred while processing order: {e}")
         await message.answer("Ошибка: Произошла непредвиденная ошибка.")
@@ -375,54 +368,99 @@ async def process_phone(message: types.Message, state: FSMContext, bot: Bot):
 
 @router.pre_checkout_query(lambda query: True)
 async def process_pre_checkout_query(pre_checkout_query: types.PreCheckoutQuery, bot: Bot):
-    """Подтверждает предварительный запрос на оплату."""
+    """Подтверждает предварительный запрос на оплату, если заказ ещё ждёт оплаты."""
     try:
-        await bot.answer_pre_checkout_query(pre_checkout_query.id, ok=True)
-        print('W32QE')
+        # Оплатить можно только заказ без статуса: оплаченный или просроченный (expired) — нельзя
+        order_id = int(pre_checkout_query.invoice_payload)
+        payable = await Database().fetchval("SELECT status IS NULL FROM orders WHERE order_id = $1", order_id,
+                                            statement="process_pre_checkout_query")
+        if payable:
+            await bot.answer_pre_checkout_query(pre_checkout_query.id, ok=True)
+            logger.info(f"💳 {pre_checkout_query.from_user.id} подтверждает оплату заказа #{order_id}.")
+        else:
+            await bot.answer_pre_checkout_query(pre_checkout_query.id, ok=False,
+                                                error_message="Заказ уже оплачен или срок его оплаты истёк.")
+            logger.warning(f"⚠️ {pre_checkout_query.from_user.id}: заказ #{order_id} уже оплачен или просрочен.")
 
     except Exception as e:
-        print('Z asd')
-        logger.error(f"Error occurred while processing pre-checkout query: {e}")
+        logger.error(f"❌ Ошибка предварительной проверки оплаты: {e}")
 
 
 @router.message(lambda message: message.successful_payment)
 async def process_successful_payment(message: types.Message, bot: Bot):
     """Обрабатывает успешную оплату."""
     try:
-        print("✅ Оплата подтверждена")
-
         user_id = message.from_user.id
         order_id = int(message.successful_payment.invoice_payload)
 
         logger.info(f"✅  {user_id} оплатил заказ #{order_id}.")
         db = Database()
-        await db.execute("UPDATE orders SET status = 'paid' WHERE order_id = $1", order_id)
+        await db.execute("UPDATE orders SET status = 'paid' WHERE order_id = $1", order_id,
+                         statement="process_successful_payment")
         await bot.send_message(user_id, "✅ Оплата прошла успешно! Ваш заказ будет обработан.")
 
     except Exception as e:
-        print("❌ Ошибка обработки платежа")
-        logger.error(f"Error occurred while processing successful payment: {e}")
+        logger.error(f"❌ Ошибка обработки платежа: {e}")
         await message.answer("Ошибка: Произошла непредвиденная ошибка.")
 
+def parse_orders_filters(args: str | None) -> dict:
+    """Разбирает аргументы /orders: status=paid from=2025-01-01 to=2025-02-01 gzip."""
+    filters = {}
+    for arg in (args or "").split():
+        key, _, value = arg.partition("=")
+        if key == "status" and value:
+            filters["status"] = value
+        elif key in ("from", "to") and value:
+            date = datetime.strptime(value, "%Y-%m-%d").replace(tzinfo=timezone.utc)
+            filters["date_from" if key == "from" else "date_to"] = date
+        elif key == "gzip" and not value:
+            filters["compress"] = True
+        else:
+            raise ValueError(arg)
+    return filters
+
+
 @router.message(Command("orders"))
-async def send_orders_csv(message: types.Message, bot: Bot):
-    """Отправляет CSV-файл со всеми заказами."""
+async def send_orders_csv(message: types.Message, bot: Bot, command: CommandObject):
+    """Отправляет CSV-файл с заказами (с фильтрами по статусу и датам)."""
+    try:
+        filters = parse_orders_filters(command.args)
+    except ValueError as e:
+        await message.answer(f"❌ Неверный параметр: {e}\n"
+                             "Формат: /orders status=paid from=2025-01-01 to=2025-02-01 gzip")
+        return
+
     db = Database()
-    file_path = await db.generate_orders_csv()
+    file_path = await db.export_orders_csv(**filters)
 
     if not file_path:
         await message.answer("📂 В базе данных нет заказов.")
         return
 
-    # Отправляем CSV-файл
-    await bot.send_document(message.chat.id, types.FSInputFile(file_path), caption="📦 Все заказы в CSV-файле")
-
-    # Удаляем файл после отправки
-    os.remove(file_path)
+    try:
+        # Отправляем CSV-файл
+        file_name = "orders.csv.gz" if filters.get("compress") else "orders.csv"
+        await bot.send_document(message.chat.id, types.FSInputFile(file_path, filename=file_name),
+                                caption="📦 Заказы в CSV-файле")
+    finally:
+        # Удаляем файл после отправки
+        os.remove(file_path)
 
     logger.info(f"📂 User {message.from_user.id} запросил CSV с заказами.")
 
 
+@router.message(Command("warmup_images"))
+async def warmup_images_handler(message: types.Message, bot: Bot):
+    """Заранее загружает в Telegram фото всех товаров (только для администраторов)."""
+    if message.from_user.id not in ADMIN_IDS:
+        return
+
+    await message.answer("🖼 Загружаю фото товаров...")
+    uploaded, failed = await warm_up_product_photos(bot, message.chat.id)
+    logger.info(f"🖼 User {message.from_user.id} прогрел фото: загружено {uploaded}, ошибок {failed}.")
+    await message.answer(f"✅ Фото загружены: {uploaded}, ошибок: {failed}.")
+
+
 @router.message(lambda message: message.text == "ℹ️ FAQ")
 async def show_faq_handler(message: types.Message):
     """Показывает список вопросов FAQ."""
@@ -438,25 +476,28 @@ async def show_faq_handler(message: types.Message):
 
     for item in faq_items:
         text += f"❓ {item['question']}\n"
-        buttons.append([InlineKeyboardButton(text=item["question"], callback_data=f"faq_{item['id']}")])
+        buttons.append([InlineKeyboardButton(text=item["question"], callback_data=FaqAnswer(item['id']).pack())])
 
     keyboard = InlineKeyboardMarkup(inline_keyboard=buttons)
 
     logger.info(f"ℹ️ {message.from_user.id} открыл FAQ.")
     await message.answer(text, reply_markup=keyboard, parse_mode="Markdown")
 
-@router.callback_query(lambda c: c.data.startswith("faq_"))
-async def faq_answer_callback(callback: types.CallbackQuery):
+@callbacks.register(FaqAnswer)
+async def faq_answer_callback(callback: types.CallbackQuery, data: FaqAnswer):
     """Показывает ответ на выбранный вопрос."""
-    faq_id = int(callback.data.split("_")[1])
-    db = Database()
-    faq_items = await db.get_faq()
-
-    for item in faq_items:
-        if item["id"] == faq_id:
-            logger.info(f"📌 {callback.from_user.id} прочитал ответ на FAQ: {item['question']}")
-            await callback.message.edit_text(f"📌 *{item['question']}*\n\n{item['answer']}", parse_mode="Markdown")
-            return
+    faq_id = data.faq_id
+    item = faq_index.get(faq_id)
+    if item is None:
+        # Индекс мог ещё не получить уведомление о новом вопросе
+        row = await Database().get_faq_by_id(faq_id)
+        item = (row["question"], row["answer"]) if row else None
+
+    if item:
+        question, answer = item
+        logger.info(f"📌 {callback.from_user.id} прочитал ответ на FAQ: {question}")
+        await callback.message.edit_text(f"📌 *{question}*\n\n{answer}", parse_mode="Markdown")
+        return
 
     await callback.answer("❌ Вопрос не найден.")
 
@@ -468,7 +509,8 @@ async def save_faq_answer(message: types.Message, state: FSMContext):
     answer = message.text
 
     db = Database()
-    await db.add_faq(question, answer)
+    faq_id = await db.add_faq(question, answer)
+    faq_index.add(faq_id, question, answer)
 
     logger.info(f"✅ Вопрос-ответ добавлен: {question} - {answer}")
 
@@ -480,11 +522,14 @@ async def save_faq_answer(message: types.Message, state: FSMContext):
 @router.message()
 async def auto_add_faq(message: types.Message, state: FSMContext):
     """Автоматически добавляет вопрос в FAQ, если его нет."""
-    db = Database()
-    existing_answer = await db.get_faq_by_question(message.text)
+    if not message.text:
+        return
 
-    if existing_answer:
-        await message.answer(f"ℹ️ {existing_answer['answer']}")
+    # Нечёткий поиск по индексу в памяти, без запроса к БД
+    match = faq_index.search(message.text)
+    if match:
+        faq_id, _ = match
+        await message.answer(f"ℹ️ {faq_index.get(faq_id)[1]}")
         return
 
     await message.answer("❌ Вопрос не найден в базе. Введите ответ на него:")
@@ -1,17 +1,32 @@
+from functools import lru_cache
+
 from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup,ReplyKeyboardMarkup, KeyboardButton
 from database import Database
+from cart import CartSnapshot
+from callbacks import (SubCheck, CategoriesPage, Category, SubcategoriesPage, Subcategory, ProductPage,
+                       AddToCart, ConfirmCart, CancelCart, RemoveFromCart, ClearCart, Checkout)
+
+# Клавиатуры не меняются после создания, поэтому одни и те же объекты отдаются всем
+# пользователям: статические собираются один раз, страницы каталога — один раз на
+# страницу и лежат в кэше каталога рядом с данными (и сбрасываются вместе с ними).
+
 
 # Клавиатура для подписки
-async def subscribe_keyboard(channel_link: str):
-    keyboard = InlineKeyboardMarkup(inline_keyboard=[
+@lru_cache(maxsize=8)
+def build_subscribe_keyboard(channel_link: str) -> InlineKeyboardMarkup:
+    return InlineKeyboardMarkup(inline_keyboard=[
         [InlineKeyboardButton(text="📢 Подписаться", url=channel_link)],
-        [InlineKeyboardButton(text="✅ Подписался", callback_data="sub_check")]
+        [InlineKeyboardButton(text="✅ Подписался", callback_data=SubCheck().pack())]
     ])
-    return keyboard
+
+
+async def subscribe_keyboard(channel_link: str):
+    return build_subscribe_keyboard(channel_link)
+
 
 # Главное меню
-async def main_keyboard():
-    keyboard = ReplyKeyboardMarkup(
+def build_main_keyboard() -> ReplyKeyboardMarkup:
+    return ReplyKeyboardMarkup(
         keyboard=[
             [KeyboardButton(text="📦 Каталог"), KeyboardButton(text="🛒 Корзина")],
             [KeyboardButton(text="ℹ️ FAQ")]
@@ -19,90 +34,122 @@ async def main_keyboard():
         resize_keyboard=True,
         one_time_keyboard=False
     )
-    return keyboard
+
+
+MAIN_KEYBOARD = build_main_keyboard()
+
+
+async def main_keyboard():
+    return MAIN_KEYBOARD
 
 
 CATEGORIES_PER_PAGE = 3  # Количество категорий на странице. Можно сделать, что бы пользователь задавал сам,
 # сколько он хочет видеть на странице
-async def categories_keyboard(page: int = 0) -> InlineKeyboardMarkup:
-    """Создаёт инлайн-клавиатуру с категориями (с пагинацией)."""
-    db = Database()
-    categories = await db.get_categories()
-    total_pages = (len(categories) - 1) // CATEGORIES_PER_PAGE + 1
-    start, end = page * CATEGORIES_PER_PAGE, (page + 1) * CATEGORIES_PER_PAGE
-    buttons = [[InlineKeyboardButton(text=cat["name"], callback_data=f"category_{cat['id']}")] for cat in categories[start:end]]
+def build_categories_keyboard(categories, page: int, has_next: bool) -> InlineKeyboardMarkup:
+    buttons = [[InlineKeyboardButton(text=cat["name"], callback_data=Category(cat['id']).pack())] for cat in categories]
 
     navigation_buttons = []
     if page > 0:
-        navigation_buttons.append(InlineKeyboardButton(text="⬅ Назад", callback_data=f"page_{page - 1}"))
-    if page < total_pages - 1:
-        navigation_buttons.append(InlineKeyboardButton(text="Вперёд ➡", callback_data=f"page_{page + 1}"))
+        navigation_buttons.append(InlineKeyboardButton(text="⬅ Назад", callback_data=CategoriesPage(page - 1).pack()))
+    if has_next:
+        navigation_buttons.append(InlineKeyboardButton(text="Вперёд ➡", callback_data=CategoriesPage(page + 1).pack()))
 
     return InlineKeyboardMarkup(inline_keyboard=buttons + [navigation_buttons] if navigation_buttons else buttons)
 
-SUBCATEGORIES_PER_PAGE = 3  # Количество подкатегорий на одной странице
 
-async def subcategories_keyboard(category_id: int, page: int = 0) -> InlineKeyboardMarkup:
-    """Создаёт инлайн-клавиатуру с подкатегориями (с пагинацией)."""
+async def categories_keyboard(page: int = 0) -> InlineKeyboardMarkup:
+    """Создаёт инлайн-клавиатуру с категориями (с пагинацией)."""
     db = Database()
-    subcategories = await db.get_subcategories(category_id)
-    total_pages = (len(subcategories) - 1) // SUBCATEGORIES_PER_PAGE + 1
-    start, end = page * SUBCATEGORIES_PER_PAGE, (page + 1) * SUBCATEGORIES_PER_PAGE
-    buttons = [[InlineKeyboardButton(text=sub["name"], callback_data=f"subcategory_{sub['id']}")] for sub in subcategories[start:end]]
+    key = ("categories_keyboard", page)
+    keyboard = db.catalog_cache.get(key)
+    if keyboard is None:
+        categories, has_next = await db.get_categories_page(page, CATEGORIES_PER_PAGE)
+        keyboard = build_categories_keyboard(categories, page, has_next)
+        db.catalog_cache.set(key, keyboard)
+    return keyboard
+
+SUBCATEGORIES_PER_PAGE = 3  # Количество подкатегорий на одной странице
+
+def build_subcategories_keyboard(subcategories, category_id: int, page: int, has_next: bool) -> InlineKeyboardMarkup:
+    buttons = [[InlineKeyboardButton(text=sub["name"], callback_data=Subcategory(sub['id']).pack())] for sub in subcategories]
 
     navigation_buttons = []
     if page > 0:
-        navigation_buttons.append(InlineKeyboardButton(text="⬅ Назад", callback_data=f"subcat_page_{category_id}_{page - 1}"))
-    if page < total_pages - 1:
-        navigation_buttons.append(InlineKeyboardButton(text="Вперёд ➡", callback_data=f"subcat_page_{category_id}_{page + 1}"))
+        navigation_buttons.append(InlineKeyboardButton(text="⬅ Назад", callback_data=SubcategoriesPage(category_id, page - 1).pack()))
+    if has_next:
+        navigation_buttons.append(InlineKeyboardButton(text="Вперёд ➡", callback_data=SubcategoriesPage(category_id, page + 1).pack()))
 
     return InlineKeyboardMarkup(inline_keyboard=buttons + [navigation_buttons] if navigation_buttons else buttons)
 
 
-async def product_navigation_keyboard(subcategory_id: int, product_index: int, total_products: int,
-                                      product_id: int) -> InlineKeyboardMarkup:
-    """Создаёт инлайн-клавиатуру для переключения товаров в подкатегории."""
+async def subcategories_keyboard(category_id: int, page: int = 0) -> InlineKeyboardMarkup:
+    """Создаёт инлайн-клавиатуру с подкатегориями (с пагинацией)."""
+    db = Database()
+    key = ("subcategories_keyboard", category_id, page)
+    keyboard = db.catalog_cache.get(key)
+    if keyboard is None:
+        subcategories, has_next = await db.get_subcategories_page(category_id, page, SUBCATEGORIES_PER_PAGE)
+        keyboard = build_subcategories_keyboard(subcategories, category_id, page, has_next)
+        db.catalog_cache.set(key, keyboard)
+    return keyboard
+
+
+@lru_cache(maxsize=4096)
+def build_product_navigation_keyboard(subcategory_id: int, product_id: int, prev_id: int | None,
+                                      next_id: int | None) -> InlineKeyboardMarkup:
     buttons = [
-        [InlineKeyboardButton(text="🛒 Добавить в корзину", callback_data=f"add_to_cart_{product_id}")]
+        [InlineKeyboardButton(text="🛒 Добавить в корзину", callback_data=AddToCart(product_id).pack())]
     ]
 
     navigation_buttons = []
-    if product_index > 0:
+    if prev_id is not None:
         navigation_buttons.append(
-            InlineKeyboardButton(text="⬅ Назад", callback_data=f"product_page_{subcategory_id}_{product_index - 1}"))
-    if product_index < total_products - 1:
+            InlineKeyboardButton(text="⬅ Назад", callback_data=ProductPage(subcategory_id, prev_id).pack()))
+    if next_id is not None:
         navigation_buttons.append(
-            InlineKeyboardButton(text="Вперёд ➡", callback_data=f"product_page_{subcategory_id}_{product_index + 1}"))
+            InlineKeyboardButton(text="Вперёд ➡", callback_data=ProductPage(subcategory_id, next_id).pack()))
 
     if navigation_buttons:
         buttons.append(navigation_buttons)
 
     return InlineKeyboardMarkup(inline_keyboard=buttons)
 
+
+async def product_navigation_keyboard(subcategory_id: int, product_id: int, prev_id: int | None,
+                                      next_id: int | None) -> InlineKeyboardMarkup:
+    """Создаёт инлайн-клавиатуру для переключения товаров в подкатегории.
+
+    Клавиатура зависит только от ID, поэтому кэшируется без сброса.
+    """
+    return build_product_navigation_keyboard(subcategory_id, product_id, prev_id, next_id)
+
+
+def build_confirm_keyboard() -> InlineKeyboardMarkup:
+    return InlineKeyboardMarkup(inline_keyboard=[
+        [InlineKeyboardButton(text="✅ Подтвердить", callback_data=ConfirmCart().pack()),
+         InlineKeyboardButton(text="❌ Отмена", callback_data=CancelCart().pack())]
+    ])
+
+
+CONFIRM_KEYBOARD = build_confirm_keyboard()
+
+
 async def confirm_keyboard():
     """Создает инлайн клавиатуру для подвеждрения добавления товара в корзине"""
-    keyboard = InlineKeyboardMarkup(inline_keyboard=[
-        [InlineKeyboardButton(text="✅ Подтвердить", callback_data="confirm_cart"),
-         InlineKeyboardButton(text="❌ Отмена", callback_data="cancel_cart")]
-    ])
-    return keyboard
+    return CONFIRM_KEYBOARD
 
 
 
-async def cart_keyboard(user_id: int) -> InlineKeyboardMarkup:
+async def cart_keyboard(cart: CartSnapshot) -> InlineKeyboardMarkup:
     """Создаёт клавиатуру для корзины."""
-    db = Database()
-    cart_items = await db.get_cart(user_id)
-
     buttons = []
-    if not cart_items:
+    if not cart:
         return None
 
-    for item in cart_items:
-        buttons.append([InlineKeyboardButton(text=f"❌ Удалить {item['name']}", callback_data=f"remove_{item['product_id']}")])
+    for line in cart.lines:
+        buttons.append([InlineKeyboardButton(text=f"❌ Удалить {line.name}", callback_data=RemoveFromCart(line.product_id).pack())])
 
-    buttons.append([InlineKeyboardButton(text="🗑 Очистить корзину", callback_data="clear_cart")])
-    buttons.append([InlineKeyboardButton(text="✅ Оформить заказ", callback_data="checkout")])
+    buttons.append([InlineKeyboardButton(text="🗑 Очистить корзину", callback_data=ClearCart().pack())])
+    buttons.append([InlineKeyboardButton(text="✅ Оформить заказ", callback_data=Checkout().pack())])
 
     return InlineKeyboardMarkup(inline_keyboard=buttons)
-
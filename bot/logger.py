@@ -1,15 +1,139 @@
+import atexit
+import contextvars
+import json
 import logging
+import queue
+import random
+import time
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler, TimedRotatingFileHandler
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+
+from config import (LOG_LEVEL, LOG_FILE, LOG_JSON, LOG_MAX_BYTES, LOG_BACKUP_COUNT, LOG_ROTATE_WHEN,
+                    LOG_SAMPLE_RATES)
+
+# Пометка для частых малоинтересных событий (листание каталога и т.п.):
+# logger.info(..., extra=SAMPLED) пишется в лог с вероятностью из LOG_SAMPLE_RATES
+SAMPLED = {"sampled": True}
+
+# Контекст текущего обновления: попадает в каждую запись лога
+user_id_var = contextvars.ContextVar("user_id", default=None)
+handler_var = contextvars.ContextVar("handler", default=None)
+
+# Поля, которые LogRecord заводит сам: всё остальное пришло через extra
+RECORD_FIELDS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "sampled"}
+
+
+class ContextFilter(logging.Filter):
+    """Добавляет в запись user_id и handler текущего обновления и прореживает частые события."""
+
+    def __init__(self, sample_rates: dict[int, float]):
+        super().__init__()
+        self.sample_rates = sample_rates
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if getattr(record, "sampled", False) and random.random() >= self.sample_rates.get(record.levelno, 1.0):
+            return False
+        if not hasattr(record, "user_id"):
+            record.user_id = user_id_var.get()
+        if not hasattr(record, "handler"):
+            record.handler = handler_var.get()
+        return True
+
+
+class BackgroundQueueHandler(QueueHandler):
+    """Кладёт запись в очередь как есть: форматирование и запись на диск — в потоке QueueListener."""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+class JsonFormatter(logging.Formatter):
+    """Одна запись — одна строка JSON со всеми полями из extra."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        entry.update((key, value) for key, value in vars(record).items()
+                     if key not in RECORD_FIELDS and value is not None)
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+def parse_sample_rates(value: str) -> dict[int, float]:
+    """"DEBUG=0.01,INFO=0.1" -> {10: 0.01, 20: 0.1}"""
+    rates = {}
+    for item in filter(None, (part.strip() for part in value.split(","))):
+        level, rate = item.split("=")
+        rates[logging.getLevelName(level.strip().upper())] = float(rate)
+    return rates
+
+
+def file_handler() -> logging.Handler:
+    """Файл лога с ротацией по времени (LOG_ROTATE_WHEN) или по размеру."""
+    if LOG_ROTATE_WHEN:
+        return TimedRotatingFileHandler(LOG_FILE, when=LOG_ROTATE_WHEN, backupCount=LOG_BACKUP_COUNT,
+                                        encoding="utf-8")
+    return RotatingFileHandler(LOG_FILE, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT, encoding="utf-8")
+
+
+def setup_logging() -> QueueListener:
+    """Направляет все логи через очередь в фоновый поток, который пишет в файл и в консоль.
+
+    Вызывается при запуске бота (bot.main), а не при импорте: тесты и утилиты
+    импортируют модули бота, не трогая файл лога.
+    """
+    text_formatter = logging.Formatter("%(asctime)s - [%(levelname)s] - %(message)s", datefmt="%Y-%m-%d %H:%M:%S")
+    log_file = file_handler()
+    log_file.setFormatter(JsonFormatter() if LOG_JSON else text_formatter)
+    console = logging.StreamHandler()
+    console.setFormatter(text_formatter)
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = BackgroundQueueHandler(log_queue)
+    queue_handler.addFilter(ContextFilter(parse_sample_rates(LOG_SAMPLE_RATES)))
+
+    root = logging.getLogger()
+    root.setLevel(LOG_LEVEL)
+    root.handlers[:] = [queue_handler]
+
+    listener = QueueListener(log_queue, log_file, console, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)  # Дописывает оставшиеся в очереди записи при выходе
+    return listener
+
+
+class LoggingMiddleware(BaseMiddleware):
+    """Запоминает пользователя и обработчик для записей лога и пишет время обработки обновления."""
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        user = data.get("event_from_user")
+        handler_object = data.get("handler")
+        user_token = user_id_var.set(user.id if user else None)
+        handler_token = handler_var.set(handler_object.callback.__name__ if handler_object else None)
+        started = time.perf_counter()
+        try:
+            return await handler(event, data)
+        finally:
+            latency_ms = round((time.perf_counter() - started) * 1000, 2)
+            logger.info(f"⏱ {type(event).__name__} обработан за {latency_ms} мс",
+                        extra={"event": type(event).__name__, "latency_ms": latency_ms, **SAMPLED})
+            handler_var.reset(handler_token)
+            user_id_var.reset(user_token)
 
-# Настройка логирования
-logging.basicConfig(
-    level=logging.INFO,  # Уровень логов (DEBUG, INFO, WARNING, ERROR, CRITICAL)
-    format="%(asctime)s - [%(levelname)s] - %(message)s",  # Формат логов
-    datefmt="%Y-%m-%d %H:%M:%S",
-    handlers=[
-        logging.FileHandler("bot.log", encoding="utf-8"),  # Лог в файл
-        logging.StreamHandler()  # Вывод в консоль
-    ],
-)
 
 # Создаём объект логирования
 logger = logging.getLogger(__name__)
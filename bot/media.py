@@ -0,0 +1,104 @@
+import asyncio
+
+from aiogram import Bot, types
+from aiogram.exceptions import TelegramAPIError, TelegramBadRequest, TelegramRetryAfter
+
+from config import IMAGE_WARMUP_CONCURRENCY
+from database import Database
+from logger import logger
+
+WARMUP_BATCH_SIZE = 100
+
+
+def is_file_id_error(error: TelegramBadRequest) -> bool:
+    """Telegram отклонил сам file_id (устарел или не от этого бота), а не подпись или разметку."""
+    return "file" in error.message.lower()
+
+
+async def _deliver_product_photo(product, deliver):
+    """Вызывает deliver(photo) с file_id фото товара, а если его нет или он устарел — с image_url.
+
+    После отправки по ссылке file_id сохраняется в БД.
+    """
+    db = Database()
+    file_id = db.get_product_file_id(product)
+    if file_id:
+        try:
+            return await deliver(file_id)
+        except TelegramBadRequest as e:
+            if not is_file_id_error(e):
+                raise
+            logger.warning(f"⚠️ file_id товара {product['id']} не принят Telegram: {e.message}")
+
+    sent = await deliver(product['image_url'])
+    if isinstance(sent, types.Message) and sent.photo:
+        await db.set_product_file_id(product['id'], sent.photo[-1].file_id)
+    return sent
+
+
+async def send_product_photo(message: types.Message, product, **kwargs) -> types.Message:
+    """Отправляет фото товара новым сообщением, по возможности по file_id."""
+    return await _deliver_product_photo(product, lambda photo: message.answer_photo(photo=photo, **kwargs))
+
+
+async def edit_product_photo(message: types.Message, product, caption: str, reply_markup=None,
+                             parse_mode: str = None):
+    """Заменяет фото, подпись и клавиатуру сообщения одним запросом edit_message_media."""
+    def deliver(photo):
+        media = types.InputMediaPhoto(media=photo, caption=caption, parse_mode=parse_mode)
+        return message.edit_media(media=media, reply_markup=reply_markup)
+
+    try:
+        return await _deliver_product_photo(product, deliver)
+    except TelegramBadRequest as e:
+        if "message is not modified" not in e.message:  # Повторное нажатие на ту же кнопку
+            raise
+
+
+async def upload_product_photo(bot: Bot, chat_id: int, product) -> bool:
+    """Загружает фото товара в чат, запоминает file_id и удаляет сообщение.
+
+    Ошибки Telegram и сети (TelegramNetworkError) пишутся в лог и возвращают False:
+    прогрев продолжается со следующим товаром.
+    """
+    while True:
+        try:
+            sent = await bot.send_photo(chat_id, photo=product['image_url'], disable_notification=True)
+            break
+        except TelegramRetryAfter as e:
+            await asyncio.sleep(e.retry_after)
+        except TelegramAPIError as e:
+            logger.warning(f"⚠️ Не удалось загрузить фото товара {product['id']}: {e}")
+            return False
+
+    await Database().set_product_file_id(product['id'], sent.photo[-1].file_id)
+    try:
+        await bot.delete_message(chat_id, sent.message_id)
+    except TelegramAPIError as e:
+        logger.warning(f"⚠️ Не удалось удалить фото товара {product['id']} из чата {chat_id}: {e}")
+    return True
+
+
+async def warm_up_product_photos(bot: Bot, chat_id: int,
+                                 concurrency: int = IMAGE_WARMUP_CONCURRENCY) -> tuple[int, int]:
+    """Заранее загружает в Telegram фото всех товаров без file_id.
+
+    Фото отправляются в chat_id (например, в чат администратора) не больше
+    concurrency одновременно. Возвращает (загружено, ошибок).
+    """
+    db = Database()
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def upload(product) -> bool:
+        async with semaphore:
+            return await upload_product_photo(bot, chat_id, product)
+
+    uploaded = failed = 0
+    after_id = 0
+    while products := await db.get_products_without_file_id(after_id, WARMUP_BATCH_SIZE):
+        results = await asyncio.gather(*(upload(product) for product in products))
+        uploaded += sum(results)
+        failed += len(results) - sum(results)
+        after_id = products[-1]['id']
+        logger.info(f"🖼 Прогрев фото: загружено {uploaded}, ошибок {failed} (до товара {after_id})")
+    return uploaded, failed
@@ -0,0 +1,183 @@
+import bisect
+import contextvars
+import time
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.methods import TelegramMethod
+from aiogram.types import TelegramObject
+from aiohttp import web
+
+from logger import handler_var
+
+# Метрики в формате Prometheus (text exposition) без сторонних библиотек:
+# гистограммы считаются в памяти процесса и отдаются по GET /metrics.
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+ROWS_BUCKETS = (0, 1, 5, 10, 50, 100, 500, 1000, 10000)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50)
+
+REGISTRY = []
+
+# Счётчик запросов к БД, сделанных при обработке текущего обновления: [число] или None
+db_queries_var = contextvars.ContextVar("db_queries", default=None)
+
+
+class Histogram:
+    """Гистограмма Prometheus с метками: на каждый набор меток — счётчики корзин, сумма и количество."""
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = (), buckets: tuple = LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = tuple(sorted(buckets))
+        self.series = {}  # значения меток -> [счётчики по корзинам (не накопленные), сумма, количество]
+        REGISTRY.append(self)
+
+    def observe(self, value: float, *labels):
+        series = self.series.get(labels)
+        if series is None:
+            series = self.series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        series[0][bisect.bisect_left(self.buckets, value)] += 1
+        series[1] += value
+        series[2] += 1
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for labels, (counts, total, count) in sorted(self.series.items()):
+            pairs = label_pairs(self.labelnames, labels)
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += bucket_count
+                bucket_labels = ",".join(pairs + [f'le="{bound}"'])
+                lines.append(f"{self.name}_bucket{{{bucket_labels}}} {cumulative}")
+            suffix = "{" + ",".join(pairs) + "}" if pairs else ""
+            lines.append(f"{self.name}_sum{suffix} {total}")
+            lines.append(f"{self.name}_count{suffix} {count}")
+        return lines
+
+
+class Counter:
+    """Счётчик Prometheus с метками: только растёт."""
+    type = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.values = {}  # значения меток -> число
+        REGISTRY.append(self)
+
+    def inc(self, *labels, amount: float = 1):
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+        for labels, value in sorted(self.values.items()):
+            pairs = label_pairs(self.labelnames, labels)
+            suffix = "{" + ",".join(pairs) + "}" if pairs else ""
+            lines.append(f"{self.name}{suffix} {value}")
+        return lines
+
+
+class Gauge(Counter):
+    """Текущее значение (например, длина очереди): растёт и убывает."""
+    type = "gauge"
+
+    def dec(self, *labels, amount: float = 1):
+        self.inc(*labels, amount=-amount)
+
+
+def label_pairs(labelnames: tuple, labels: tuple) -> list[str]:
+    return [f'{name}="{escape(value)}"' for name, value in zip(labelnames, labels)]
+
+
+def escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def render_metrics() -> str:
+    return "\n".join(line for metric in REGISTRY for line in metric.render()) + "\n"
+
+
+HANDLER_DURATION = Histogram("bot_handler_duration_seconds", "Время обработки обновления по обработчикам",
+                             ("handler",))
+TELEGRAM_REQUEST_DURATION = Histogram("bot_telegram_request_duration_seconds",
+                                      "Время запросов к Telegram Bot API по методам", ("method",))
+DB_QUERY_DURATION = Histogram("bot_db_query_duration_seconds", "Время выполнения SQL-запросов", ("statement",))
+DB_POOL_WAIT = Histogram("bot_db_pool_wait_seconds", "Ожидание свободного соединения в пуле", ("statement",))
+DB_ROWS = Histogram("bot_db_rows", "Строк возвращено или затронуто запросом", ("statement",), ROWS_BUCKETS)
+HANDLER_DB_QUERIES = Histogram("bot_handler_db_queries", "Запросов к БД на одно обновление по обработчикам",
+                               ("handler",), QUERY_COUNT_BUCKETS)
+JOB_DURATION = Histogram("bot_job_duration_seconds", "Время фоновых задач по результату (ok, error, skipped, cancelled)",
+                         ("job", "result"))
+OUTGOING_QUEUE_DEPTH = Gauge("bot_outgoing_queue_depth", "Запросы к Bot API, ждущие своей очереди по лимитам скорости",
+                             ("method",))
+OUTGOING_WAIT = Histogram("bot_outgoing_wait_seconds", "Ожидание запроса к Bot API в очереди по лимитам скорости",
+                          ("method",))
+OUTGOING_RETRIES = Counter("bot_outgoing_retry_after_total", "Повторы запросов к Bot API после ответа 429",
+                           ("method",))
+OUTGOING_COALESCED = Counter("bot_outgoing_coalesced_edits_total",
+                             "Правки сообщений, поглощённые более новой правкой того же сообщения", ("method",))
+
+
+def count_db_query():
+    counter = db_queries_var.get()
+    if counter is not None:
+        counter[0] += 1
+
+
+class MetricsMiddleware(BaseMiddleware):
+    """Считает время и число запросов к БД по обработчикам.
+
+    Для нажатий кнопок имя — настоящий обработчик из CallbackDispatcher.
+    """
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        counter = db_queries_var.get()
+        token = None
+        if counter is None:
+            counter = [0]
+            token = db_queries_var.set(counter)
+        queries_before = counter[0]
+        started = time.perf_counter()
+        try:
+            return await handler(event, data)
+        finally:
+            handler_object = data.get("handler")
+            name = handler_var.get() or (handler_object.callback.__name__ if handler_object else "unknown")
+            HANDLER_DURATION.observe(time.perf_counter() - started, name)
+            HANDLER_DB_QUERIES.observe(counter[0] - queries_before, name)
+            if token is not None:
+                db_queries_var.reset(token)
+
+
+class RequestMetricsMiddleware(BaseRequestMiddleware):
+    """Считает время запросов к Bot API: bot.session.middleware(RequestMetricsMiddleware())."""
+
+    async def __call__(self, make_request: NextRequestMiddlewareType, bot, method: TelegramMethod):
+        started = time.perf_counter()
+        try:
+            return await make_request(bot, method)
+        finally:
+            TELEGRAM_REQUEST_DURATION.observe(time.perf_counter() - started, type(method).__name__)
+
+
+async def handle_metrics(request: web.Request) -> web.Response:
+    return web.Response(text=render_metrics(), content_type="text/plain", charset="utf-8")
+
+
+async def run_metrics_server(host: str, port: int) -> web.AppRunner:
+    """Отдельный HTTP-сервер с /metrics для режима polling (в режиме webhook /metrics отдаёт webhook-сервер)."""
+    app = web.Application()
+    app.router.add_get("/metrics", handle_metrics)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return runner
@@ -0,0 +1,47 @@
+from dataclasses import dataclass
+
+from aiogram.types import LabeledPrice
+
+# Деньги в боте считаются в целых копейках. Сумма позиции — round(price * quantity * 100)
+# в SQL по numeric, итог — сумма позиций тем же запросом. Из этих чисел строятся и текст
+# корзины, и счёт в Telegram, и orders.total_price, поэтому они всегда совпадают.
+
+MIN_ORDER_KOPECKS = 10000  # Минимальная сумма заказа: 100 рублей
+
+
+def format_kopecks(kopecks: int) -> str:
+    """Форматирует сумму в копейках как рубли с двумя знаками: 12345 -> '123.45'."""
+    return f"{kopecks // 100}.{kopecks % 100:02d}"
+
+
+@dataclass(frozen=True)
+class PricedLine:
+    product_id: int
+    name: str
+    quantity: int
+    total_kopecks: int
+
+    @property
+    def label(self) -> str:
+        return f"{self.name} ({self.quantity} шт.)"
+
+
+@dataclass(frozen=True)
+class OrderTotals:
+    """Позиции заказа и итог в копейках, посчитанные в БД (см. Database.place_order)."""
+    order_id: int | None  # None — заказ не создан (пустая корзина или сумма меньше минимальной)
+    lines: tuple[PricedLine, ...]
+    total_kopecks: int
+
+    @classmethod
+    def from_rows(cls, order_id: int | None, rows) -> "OrderTotals":
+        lines = tuple(PricedLine(row["product_id"], row["name"], row["quantity"], row["total_kopecks"])
+                      for row in rows)
+        return cls(order_id, lines, rows[0]["order_total_kopecks"] if rows else 0)
+
+    def __bool__(self):
+        return bool(self.lines)
+
+    def labeled_prices(self) -> list[LabeledPrice]:
+        """Позиции для send_invoice: Telegram принимает суммы в копейках."""
+        return [LabeledPrice(label=line.label, amount=line.total_kopecks) for line in self.lines]
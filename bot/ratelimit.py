@@ -0,0 +1,199 @@
+import asyncio
+import time
+
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import TelegramMethod
+
+from config import (RATE_LIMIT_GLOBAL_PER_SECOND, RATE_LIMIT_PRIVATE_PER_SECOND, RATE_LIMIT_GROUP_PER_MINUTE,
+                    RATE_LIMIT_CHAT_BURST, RATE_LIMIT_MAX_RETRIES, RATE_LIMIT_MAX_WAIT)
+from logger import logger
+from metrics import OUTGOING_QUEUE_DEPTH, OUTGOING_WAIT, OUTGOING_RETRIES, OUTGOING_COALESCED
+
+# Лимиты Telegram касаются сообщений: отправки и правок. Ответы на нажатия, inline-запросы
+# и pre_checkout должны уходить сразу (у pre_checkout всего 10 секунд), поэтому не ждут.
+LIMITED_PREFIXES = ("send", "edit", "copy", "forward")
+EDIT_PREFIX = "edit"
+MAX_CHAT_BUCKETS = 10000  # Сверх этого из памяти удаляются корзины чатов, которые уже простаивают
+
+
+class TokenBucket:
+    """Корзина токенов: rate запросов в секунду и запас burst на короткий всплеск.
+
+    Каждый запрос сразу резервирует время отправки (алгоритм GCRA), поэтому
+    очередь к корзине — это просто запросы, которые спят до своего времени,
+    без фоновых задач, и обслуживаются они в порядке поступления.
+    """
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.interval = 1 / rate
+        self.tolerance = (max(burst, 1) - 1) * self.interval
+        self.tat = 0.0  # Теоретическое время следующего запроса (time.monotonic)
+
+    def reserve(self, at: float) -> float:
+        """Резервирует отправку не раньше at; возвращает, сколько ещё ждать после at."""
+        tat = max(self.tat, at)
+        self.tat = tat + self.interval
+        return max(0.0, tat - at - self.tolerance)
+
+    def pause(self, seconds: float, now: float):
+        """После 429: следующий запрос уйдёт не раньше чем через seconds."""
+        self.tat = max(self.tat, now + seconds + self.tolerance)
+
+    def idle(self, now: float) -> bool:
+        return self.tat <= now
+
+
+class PendingEdit:
+    """Правка сообщения, ждущая очереди. Более новая правка того же сообщения
+    подменяет method и ждёт результата вместо отдельной отправки.
+
+    Отправляет правку задача task от имени всех ожидающих (waiters): отмена
+    одного из них не отменяет запрос для остальных.
+    """
+
+    def __init__(self, method: TelegramMethod):
+        self.method = method
+        self.done = asyncio.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+        self.task = None
+
+    def finish(self, result=None, error: BaseException = None):
+        self.result, self.error = result, error
+        self.done.set()
+
+    async def wait(self):
+        await self.done.wait()
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+class RateLimitMiddleware(BaseRequestMiddleware):
+    """Исходящие запросы к Bot API в пределах лимитов Telegram.
+
+    Подключается первым: bot.session.middleware(RateLimitMiddleware()).
+    - Отправки и правки ждут токена в корзине чата (личный чат и группа
+      ограничены по-разному) и в общей корзине бота.
+    - На 429 (TelegramRetryAfter) запрос ждёт retry_after и повторяется;
+      корзина чата на это время закрывается и для остальных запросов в чат.
+    - Пока правка сообщения ждёт очереди, более новая правка того же
+      сообщения тем же методом занимает её место: уходит только последняя,
+      а обе вызывающие стороны получают её результат. Если одну из них
+      отменят, правка всё равно уйдёт для остальных.
+    """
+
+    def __init__(self, global_rate: float = RATE_LIMIT_GLOBAL_PER_SECOND,
+                 private_rate: float = RATE_LIMIT_PRIVATE_PER_SECOND,
+                 group_rate: float = RATE_LIMIT_GROUP_PER_MINUTE / 60, chat_burst: int = RATE_LIMIT_CHAT_BURST,
+                 max_retries: int = RATE_LIMIT_MAX_RETRIES, max_wait: float = RATE_LIMIT_MAX_WAIT):
+        self.global_bucket = TokenBucket(global_rate, burst=int(global_rate))
+        self.private_rate = private_rate
+        self.group_rate = group_rate
+        self.chat_burst = chat_burst
+        self.max_retries = max_retries
+        self.max_wait = max_wait
+        self.chat_buckets = {}  # chat_id -> TokenBucket
+        self.pending_edits = {}  # (метод, чат, сообщение) -> PendingEdit
+
+    async def __call__(self, make_request: NextRequestMiddlewareType, bot, method: TelegramMethod):
+        if not method.__api_method__.startswith(LIMITED_PREFIXES):
+            return await self._send(make_request, bot, method, limited=False)
+        if not method.__api_method__.startswith(EDIT_PREFIX):
+            await self._throttle(method)
+            return await self._send(make_request, bot, method)
+
+        key = (type(method), getattr(method, "chat_id", None), getattr(method, "message_id", None),
+               getattr(method, "inline_message_id", None))
+        pending = self.pending_edits.get(key)
+        if pending is not None:
+            pending.method = method
+            OUTGOING_COALESCED.inc(type(method).__name__)
+        else:
+            pending = self.pending_edits[key] = PendingEdit(method)
+            pending.task = asyncio.create_task(self._send_edit(make_request, bot, key, pending))
+        return await self._wait_edit(key, pending)
+
+    async def _send_edit(self, make_request: NextRequestMiddlewareType, bot, key: tuple, pending: PendingEdit):
+        """Ждёт очереди и отправляет последнюю правку из pending; результат или ошибку получают все ожидающие."""
+        try:
+            await self._throttle(pending.method)
+            del self.pending_edits[key]  # С этого момента новые правки встают в очередь заново
+            pending.finish(await self._send(make_request, bot, pending.method))
+        except BaseException as e:
+            if self.pending_edits.get(key) is pending:
+                del self.pending_edits[key]
+            pending.finish(error=e)
+
+    async def _wait_edit(self, key: tuple, pending: PendingEdit):
+        pending.waiters += 1
+        try:
+            return await pending.wait()
+        finally:
+            pending.waiters -= 1
+            if not pending.waiters and not pending.done.is_set():
+                # Все ожидающие отменены: правка больше не нужна
+                if self.pending_edits.get(key) is pending:
+                    del self.pending_edits[key]
+                pending.task.cancel()
+
+    def _chat_bucket(self, chat_id, now: float) -> TokenBucket | None:
+        if chat_id is None:
+            return None
+        bucket = self.chat_buckets.get(chat_id)
+        if bucket is None:
+            if len(self.chat_buckets) >= MAX_CHAT_BUCKETS:
+                self.chat_buckets = {key: value for key, value in self.chat_buckets.items() if not value.idle(now)}
+            # Группы и каналы — отрицательные ID или @username
+            private = isinstance(chat_id, int) and chat_id > 0
+            bucket = self.chat_buckets[chat_id] = TokenBucket(self.private_rate if private else self.group_rate,
+                                                              self.chat_burst)
+        return bucket
+
+    async def _throttle(self, method: TelegramMethod):
+        """Ждёт своей очереди в корзине чата, затем в общей корзине бота.
+
+        Общий токен берётся только после ожидания в чате: иначе запрос,
+        отложенный лимитом чата, занимал бы место в общей очереди заранее
+        и задерживал запросы в другие чаты.
+        """
+        name = type(method).__name__
+        started = time.monotonic()
+        bucket = self._chat_bucket(getattr(method, "chat_id", None), started)
+        delay = bucket.reserve(started) if bucket else 0.0
+        OUTGOING_QUEUE_DEPTH.inc(name)
+        try:
+            if delay > 0:
+                await asyncio.sleep(delay)
+            now = time.monotonic()
+            delay = self.global_bucket.reserve(now)
+            if delay > 0:
+                await asyncio.sleep(delay)
+        finally:
+            OUTGOING_QUEUE_DEPTH.dec(name)
+        OUTGOING_WAIT.observe(time.monotonic() - started, name)
+
+    async def _send(self, make_request: NextRequestMiddlewareType, bot, method: TelegramMethod,
+                    limited: bool = True):
+        """Выполняет запрос, повторяя его после 429 не больше max_retries раз."""
+        attempt = 0
+        while True:
+            try:
+                return await make_request(bot, method)
+            except TelegramRetryAfter as e:
+                if attempt >= self.max_retries or e.retry_after > self.max_wait:
+                    raise
+                attempt += 1
+                name = type(method).__name__
+                OUTGOING_RETRIES.inc(name)
+                chat_id = getattr(method, "chat_id", None)
+                logger.warning(f"⏳ Telegram просит подождать {e.retry_after} с ({name}, чат {chat_id}), "
+                               f"повтор {attempt} из {self.max_retries}")
+                if not limited:
+                    await asyncio.sleep(e.retry_after)
+                    continue
+                now = time.monotonic()
+                (self._chat_bucket(chat_id, now) or self.global_bucket).pause(e.retry_after, now)
+                await self._throttle(method)
@@ -0,0 +1,226 @@
+import asyncio
+import contextlib
+import random
+import time
+import zlib
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable
+
+from config import (SHUTDOWN_TIMEOUT, SCHEDULER_JITTER, MAINTENANCE_BATCH_SIZE, CART_TTL, CART_CLEANUP_INTERVAL,
+                    ORDER_PAYMENT_TTL, ORDER_EXPIRY_INTERVAL, CATALOG_WARMUP_INTERVAL, FSM_CLEANUP_CRON)
+from database import Database
+from keyboards import CATEGORIES_PER_PAGE, SUBCATEGORIES_PER_PAGE
+from logger import logger
+from metrics import JOB_DURATION
+
+LOCK_NAMESPACE = 5003  # Первый ключ advisory-блокировки фоновых задач (второй — хэш имени задачи)
+
+# Поля расписания cron: минута, час, день месяца, месяц, день недели (0 — воскресенье)
+CRON_FIELDS = ((0, 59), (0, 23), (1, 31), (1, 12), (0, 6))
+CRON_SEARCH_LIMIT = timedelta(days=8 * 366)  # Дальше следующий запуск не ищется (29 февраля бывает раз в 8 лет)
+
+
+def parse_cron_field(field: str, low: int, high: int) -> frozenset:
+    """Разбирает поле cron: "*", "5", "1-5", "*/15", "0-30/10" и списки через запятую."""
+    values = set()
+    for part in field.split(","):
+        part, _, step = part.partition("/")
+        if part == "*":
+            start, end = low, high
+        elif "-" in part:
+            start, end = map(int, part.split("-", 1))
+        else:
+            start = int(part)
+            end = high if step else start
+        step = int(step) if step else 1
+        if not low <= start <= end <= high or step < 1:
+            raise ValueError(f"Недопустимое поле cron: {field}")
+        values.update(range(start, end + 1, step))
+    return frozenset(values)
+
+
+class CronSchedule:
+    """Расписание в формате cron из пяти полей, по местному времени процесса."""
+
+    def __init__(self, expression: str):
+        fields = expression.split()
+        if len(fields) != len(CRON_FIELDS):
+            raise ValueError(f"В расписании cron должно быть 5 полей: {expression}")
+        self.expression = expression
+        self.minutes, self.hours, self.days, self.months, self.weekdays = (
+            parse_cron_field(field, low, high) for field, (low, high) in zip(fields, CRON_FIELDS))
+        # Как в cron: если заданы и день месяца, и день недели, достаточно совпадения одного из них
+        self.any_day = fields[2] != "*" and fields[4] != "*"
+
+    def _day_matches(self, moment: datetime) -> bool:
+        day, weekday = moment.day in self.days, (moment.weekday() + 1) % 7 in self.weekdays
+        return (day or weekday) if self.any_day else (day and weekday)
+
+    def next_after(self, moment: datetime) -> datetime:
+        """Ближайшее время запуска строго после moment."""
+        moment = moment.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limit = moment + CRON_SEARCH_LIMIT
+        while moment <= limit:
+            if moment.month not in self.months:
+                moment = (moment.replace(day=1, hour=0, minute=0) + timedelta(days=32)).replace(day=1)
+            elif not self._day_matches(moment):
+                moment = moment.replace(hour=0, minute=0) + timedelta(days=1)
+            elif moment.hour not in self.hours:
+                moment = moment.replace(minute=0) + timedelta(hours=1)
+            elif moment.minute not in self.minutes:
+                moment += timedelta(minutes=1)
+            else:
+                return moment
+        raise ValueError(f"По расписанию {self.expression} нет ни одного запуска")
+
+
+@dataclass
+class Job:
+    name: str
+    func: Callable[[], Awaitable[Any]]
+    interval: float | None = None  # Пауза между запусками, сек
+    cron: CronSchedule | None = None
+    jitter: float = 0  # Случайная добавка к паузе, сек: реплики не запускают задачу в одну секунду
+    single_flight: bool = True  # Выполнять только в одном процессе (advisory-блокировка в Postgres)
+    run_at_start: bool = False
+
+    @property
+    def lock_key(self) -> int:
+        """Второй ключ блокировки: crc32 имени задачи как знаковое 32-битное число."""
+        key = zlib.crc32(self.name.encode())
+        return key - 2 ** 32 if key >= 2 ** 31 else key
+
+    def next_delay(self) -> float:
+        if self.cron:
+            now = datetime.now()
+            delay = (self.cron.next_after(now) - now).total_seconds()
+        else:
+            delay = self.interval
+        return delay + random.uniform(0, self.jitter)
+
+
+class Scheduler:
+    """Фоновые задачи в процессе бота: по интервалу или по расписанию cron.
+
+    У каждой задачи свой цикл asyncio. Задачи с single_flight перед запуском
+    берут advisory-блокировку (pg_try_advisory_lock) на отдельном соединении
+    пула: если задача уже выполняется в другой реплике, запуск пропускается.
+    При остановке задачи перестают запускаться, а выполняющиеся получают
+    shutdown_timeout секунд на завершение и затем отменяются.
+    """
+
+    def __init__(self, db: Database = None, shutdown_timeout: float = SHUTDOWN_TIMEOUT):
+        self.db = db or Database()
+        self.shutdown_timeout = shutdown_timeout
+        self.jobs = []
+        self.tasks = set()
+        self.stopping = asyncio.Event()
+
+    def add(self, name: str, func: Callable[[], Awaitable[Any]], *, interval: float = None, cron: str = None,
+            jitter: float = SCHEDULER_JITTER, single_flight: bool = True, run_at_start: bool = False) -> Job:
+        """Добавляет задачу func(): задаётся либо interval (сек), либо cron ("30 4 * * *")."""
+        if (interval is None) == (cron is None):
+            raise ValueError(f"Для задачи {name} нужен либо interval, либо cron")
+        if interval is not None and interval <= 0:
+            raise ValueError(f"Интервал задачи {name} должен быть положительным")
+        job = Job(name, func, interval, CronSchedule(cron) if cron else None, jitter, single_flight, run_at_start)
+        self.jobs.append(job)
+        return job
+
+    def start(self):
+        for job in self.jobs:
+            task = asyncio.create_task(self._loop(job), name=f"job:{job.name}")
+            self.tasks.add(task)
+            task.add_done_callback(self.tasks.discard)
+        logger.info(f"⏰ Фоновых задач запущено: {len(self.jobs)}")
+
+    async def stop(self):
+        """Останавливает планировщик, дожидаясь выполняющихся задач не дольше shutdown_timeout."""
+        self.stopping.set()
+        if not self.tasks:
+            return
+        _, pending = await asyncio.wait(set(self.tasks), timeout=self.shutdown_timeout)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        logger.info(f"⏰ Фоновые задачи остановлены (прервано: {len(pending)})")
+
+    async def _sleep(self, delay: float) -> bool:
+        """Ждёт delay секунд; False — планировщик останавливается."""
+        try:
+            await asyncio.wait_for(self.stopping.wait(), timeout=delay)
+        except asyncio.TimeoutError:
+            return True
+        return False
+
+    async def _loop(self, job: Job):
+        if not job.run_at_start and not await self._sleep(job.next_delay()):
+            return
+        while not self.stopping.is_set():
+            await self.run(job)
+            if not await self._sleep(job.next_delay()):
+                return
+
+    async def run(self, job: Job):
+        """Выполняет задачу один раз: ошибки пишутся в лог и не останавливают её расписание."""
+        started = time.perf_counter()
+        result = "ok"
+        try:
+            async with self._lock(job) as acquired:
+                if not acquired:
+                    result = "skipped"
+                    logger.debug(f"⏭ Задача {job.name} уже выполняется в другом процессе")
+                    return
+                outcome = await job.func()
+                logger.info(f"⏰ Задача {job.name} выполнена за {time.perf_counter() - started:.2f} с: {outcome}")
+        except asyncio.CancelledError:
+            result = "cancelled"
+            logger.warning(f"⚠️ Задача {job.name} прервана при остановке")
+            raise
+        except Exception as e:
+            result = "error"
+            logger.error(f"❌ Ошибка фоновой задачи {job.name}: {e}")
+        finally:
+            JOB_DURATION.observe(time.perf_counter() - started, job.name, result)
+
+    @contextlib.asynccontextmanager
+    async def _lock(self, job: Job):
+        if not job.single_flight:
+            yield True
+            return
+        async with self.db.pool.acquire() as conn:
+            acquired = await conn.fetchval("SELECT pg_try_advisory_lock($1, $2)", LOCK_NAMESPACE, job.lock_key)
+            try:
+                yield acquired
+            finally:
+                if acquired:
+                    await conn.execute("SELECT pg_advisory_unlock($1, $2)", LOCK_NAMESPACE, job.lock_key)
+
+
+def setup_jobs(scheduler: Scheduler, storage=None):
+    """Встроенные задачи обслуживания: корзины, неоплаченные заказы, кэш каталога и FSM-сессии."""
+    db = scheduler.db
+
+    async def delete_abandoned_carts():
+        deleted = await db.delete_abandoned_carts(timedelta(seconds=CART_TTL), MAINTENANCE_BATCH_SIZE)
+        return f"удалено позиций корзин: {deleted}"
+
+    async def expire_unpaid_orders():
+        expired = await db.expire_unpaid_orders(timedelta(seconds=ORDER_PAYMENT_TTL), MAINTENANCE_BATCH_SIZE)
+        return f"просрочено заказов: {expired}"
+
+    async def warm_up_catalog():
+        return f"записей в кэше: {await db.warm_up_catalog(CATEGORIES_PER_PAGE, SUBCATEGORIES_PER_PAGE)}"
+
+    async def delete_expired_fsm():
+        return f"удалено FSM-сессий: {await storage.delete_expired()}"
+
+    scheduler.add("delete_abandoned_carts", delete_abandoned_carts, interval=CART_CLEANUP_INTERVAL)
+    scheduler.add("expire_unpaid_orders", expire_unpaid_orders, interval=ORDER_EXPIRY_INTERVAL)
+    if CATALOG_WARMUP_INTERVAL:
+        # Кэш у каждого процесса свой, поэтому прогрев идёт во всех репликах
+        scheduler.add("warm_up_catalog", warm_up_catalog, interval=CATALOG_WARMUP_INTERVAL,
+                      single_flight=False, run_at_start=True)
+    if storage is not None:
+        scheduler.add("delete_expired_fsm", delete_expired_fsm, cron=FSM_CLEANUP_CRON)
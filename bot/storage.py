@@ -0,0 +1,120 @@
+import json
+from datetime import timedelta
+from typing import Any, Dict, Optional
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, DefaultKeyBuilder, KeyBuilder, StateType, StorageKey
+
+from config import FSM_STATE_TTL, FSM_CACHE_TTL, FSM_CACHE_SIZE
+from database import Database, TTLCache
+from logger import logger
+
+LOAD_QUERY = """
+    SELECT state, data FROM fsm_storage
+    WHERE key = $1 AND updated_at > now() - $2::interval
+"""
+
+
+class PostgresStorage(BaseStorage):
+    """Хранилище состояний FSM в таблице fsm_storage на пуле Database.
+
+    Состояние и данные пишутся в БД сразу (write-through), а чтения
+    обслуживаются из небольшого кэша в памяти процесса. Сессии, которые
+    не менялись дольше state_ttl, считаются брошенными и не читаются.
+    Если бот запущен в нескольких процессах без привязки пользователя
+    к процессу, кэш лучше выключить (FSM_CACHE_TTL=0).
+    """
+
+    def __init__(self, db: Database, key_builder: Optional[KeyBuilder] = None,
+                 state_ttl: float = FSM_STATE_TTL, cache_ttl: float = FSM_CACHE_TTL,
+                 cache_size: int = FSM_CACHE_SIZE):
+        self.db = db
+        self.key_builder = key_builder or DefaultKeyBuilder(with_bot_id=True, with_destiny=True)
+        self.state_ttl = timedelta(seconds=state_ttl)
+        self.cache = TTLCache(maxsize=cache_size, ttl=cache_ttl) if cache_ttl > 0 else None
+
+    def _remember(self, key: str, state: Optional[str], data: Dict[str, Any]):
+        if self.cache is not None:
+            self.cache.set(key, (state, data))
+
+    async def _load(self, key: StorageKey):
+        """Возвращает (state, data) из кэша или из БД."""
+        db_key = self.key_builder.build(key)
+        if self.cache is not None:
+            cached = self.cache.get(db_key)
+            if cached is not None:
+                return cached
+
+        row = await self.db.fetchrow(LOAD_QUERY, db_key, self.state_ttl, statement="PostgresStorage._load")
+        state, data = (row["state"], json.loads(row["data"])) if row else (None, {})
+        self._remember(db_key, state, data)
+        return state, data
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        db_key = self.key_builder.build(key)
+        state = state.state if isinstance(state, State) else state
+        row = await self.db.fetchrow("""
+            INSERT INTO fsm_storage (key, state, data, updated_at)
+            VALUES ($1, $2, '{}', now())
+            ON CONFLICT (key) DO UPDATE
+            SET state = EXCLUDED.state,
+                data = CASE WHEN fsm_storage.updated_at > now() - $3::interval
+                            THEN fsm_storage.data ELSE '{}' END,
+                updated_at = now()
+            RETURNING data
+        """, db_key, state, self.state_ttl, statement="PostgresStorage.set_state")
+        self._remember(db_key, state, json.loads(row["data"]))
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        state, _ = await self._load(key)
+        return state
+
+    async def set_data(self, key: StorageKey, data: Dict[str, Any]) -> None:
+        db_key = self.key_builder.build(key)
+        row = await self.db.fetchrow("""
+            INSERT INTO fsm_storage (key, data, updated_at)
+            VALUES ($1, $2::jsonb, now())
+            ON CONFLICT (key) DO UPDATE
+            SET state = CASE WHEN fsm_storage.updated_at > now() - $3::interval
+                             THEN fsm_storage.state END,
+                data = EXCLUDED.data,
+                updated_at = now()
+            RETURNING state
+        """, db_key, json.dumps(data), self.state_ttl, statement="PostgresStorage.set_data")
+        self._remember(db_key, row["state"], dict(data))
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        _, data = await self._load(key)
+        return dict(data)
+
+    async def update_data(self, key: StorageKey, data: Dict[str, Any]) -> Dict[str, Any]:
+        """Сливает data с текущими данными на стороне БД за один запрос."""
+        db_key = self.key_builder.build(key)
+        row = await self.db.fetchrow("""
+            INSERT INTO fsm_storage (key, data, updated_at)
+            VALUES ($1, $2::jsonb, now())
+            ON CONFLICT (key) DO UPDATE
+            SET state = CASE WHEN fsm_storage.updated_at > now() - $3::interval
+                             THEN fsm_storage.state END,
+                data = CASE WHEN fsm_storage.updated_at > now() - $3::interval
+                            THEN fsm_storage.data ELSE '{}' END || EXCLUDED.data,
+                updated_at = now()
+            RETURNING state, data
+        """, db_key, json.dumps(data), self.state_ttl, statement="PostgresStorage.update_data")
+        merged = json.loads(row["data"])
+        self._remember(db_key, row["state"], merged)
+        return dict(merged)
+
+    async def delete_expired(self) -> int:
+        """Удаляет брошенные сессии. Возвращает число удалённых записей."""
+        result = await self.db.execute("DELETE FROM fsm_storage WHERE updated_at < now() - $1::interval",
+                                       self.state_ttl, statement="PostgresStorage.delete_expired")
+        deleted = int(result.split()[-1])
+        if deleted:
+            logger.info(f"🧹 Удалено устаревших FSM-сессий: {deleted}")
+        return deleted
+
+    async def close(self) -> None:
+        """Пул соединений принадлежит Database и закрывается вместе с ней."""
+        if self.cache is not None:
+            self.cache.clear()
@@ -0,0 +1,106 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware, Bot
+from aiogram.types import CallbackQuery, Message, TelegramObject
+
+from callbacks import SubCheck, unpack
+from config import CHANNEL, SUBSCRIPTION_POSITIVE_TTL, SUBSCRIPTION_NEGATIVE_TTL
+from database import TTLCache
+from keyboards import subscribe_keyboard
+from logger import logger
+
+SUBSCRIBED_STATUSES = ("member", "administrator", "creator")
+
+# Устаревший ответ используется, только если Telegram не ответил
+STALE_TTL = 24 * 60 * 60
+
+
+class SubscriptionChecker:
+    """Проверка подписки на канал с кэшем и объединением одновременных запросов.
+
+    Подписанные пользователи кэшируются на positive_ttl, неподписанные — на
+    negative_ttl. Одновременные проверки одного пользователя ждут один общий
+    запрос get_chat_member.
+    """
+
+    def __init__(self, positive_ttl: float = SUBSCRIPTION_POSITIVE_TTL,
+                 negative_ttl: float = SUBSCRIPTION_NEGATIVE_TTL, maxsize: int = 100_000):
+        self.positive_ttl = positive_ttl
+        self.negative_ttl = negative_ttl
+        self.cache = TTLCache(maxsize=maxsize, ttl=positive_ttl)
+        self.stale = TTLCache(maxsize=maxsize, ttl=STALE_TTL)
+        self.in_flight = {}
+
+    async def is_subscribed(self, user_id: int, bot: Bot, refresh: bool = False) -> bool:
+        """Проверяет подписку. refresh=True игнорирует кэш (кнопка «Подписался»)."""
+        if not refresh:
+            cached = self.cache.get(user_id)
+            if cached is not None:
+                return cached
+
+        task = self.in_flight.get(user_id)
+        if task is None:
+            task = asyncio.ensure_future(self._fetch(user_id, bot))
+            self.in_flight[user_id] = task
+            task.add_done_callback(lambda _: self.in_flight.pop(user_id, None))
+        return await asyncio.shield(task)
+
+    async def _fetch(self, user_id: int, bot: Bot) -> bool:
+        try:
+            chat_member = await bot.get_chat_member(chat_id=CHANNEL, user_id=user_id)
+        except Exception as e:
+            stale = self.stale.get(user_id, False)
+            logger.error(f"❌ Ошибка при проверке подписки у User {user_id}: {e}")
+            return stale  # Последний известный ответ, иначе считаем, что не подписан
+
+        is_subscribed = self.update(user_id, chat_member.status, getattr(chat_member, "is_member", False))
+        logger.info(f"👤 Проверка подписки: User {user_id} {'ПОДПИСАН' if is_subscribed else 'НЕ подписан'}")
+        return is_subscribed
+
+    def update(self, user_id: int, status: str, is_member: bool = False) -> bool:
+        """Запоминает статус участника канала (из get_chat_member или chat_member)."""
+        is_subscribed = status in SUBSCRIBED_STATUSES or (status == "restricted" and is_member)
+        self.cache.set(user_id, is_subscribed, self.positive_ttl if is_subscribed else self.negative_ttl)
+        self.stale.set(user_id, is_subscribed)
+        return is_subscribed
+
+
+subscription_checker = SubscriptionChecker()
+
+
+class SubscriptionMiddleware(BaseMiddleware):
+    """Пропускает к обработчикам только подписчиков канала.
+
+    /start и кнопка «Подписался» проверяют подписку сами, поэтому
+    пропускаются без проверки.
+    """
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        user = data.get("event_from_user")
+        if user is None or self._is_exempt(event):
+            return await handler(event, data)
+
+        if await subscription_checker.is_subscribed(user.id, data["bot"]):
+            return await handler(event, data)
+
+        keyboard = await subscribe_keyboard(f"https://t.me/{CHANNEL.lstrip('@')}")
+        if isinstance(event, CallbackQuery):
+            await event.answer("❌ Вы не подписаны на канал!", show_alert=True)
+        elif isinstance(event, Message):
+            await event.answer("❌ Вы не подписаны на канал!\n"
+                               "Для использования бота, подпишитесь и нажмите '✅ Подписался'.",
+                               reply_markup=keyboard)
+
+    @staticmethod
+    def _is_exempt(event: TelegramObject) -> bool:
+        if isinstance(event, Message):
+            return bool(event.successful_payment) or (event.text or "").startswith("/start")
+        if isinstance(event, CallbackQuery):
+            return isinstance(unpack(event.data), SubCheck)
+        return True
@@ -0,0 +1,15 @@
+"""Модульные тесты бота, без БД и Telegram.
+
+Запуск из каталога bot:
+    python -m pytest -q tests
+"""
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+# Лог тестов не должен попадать в bot.log репозитория, даже если тест вызовет setup_logging()
+os.environ.setdefault("LOG_FILE", os.path.join(tempfile.gettempdir(), "bot-tests.log"))
+
+# Модули бота импортируются как верхнеуровневые (from config import ...)
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
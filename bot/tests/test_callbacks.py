@@ -0,0 +1,92 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from aiogram.dispatcher.event.bases import UNHANDLED
+
+from callbacks import (ACTIONS, MAX_LENGTH, CallbackData, CallbackDispatcher, CategoriesPage, ClearCart,
+                       ProductIndex, ProductPage, SubcategoriesPage, callback_data, to_base36, unpack)
+
+
+@pytest.mark.parametrize("value, expected", [
+    (0, "0"), (9, "9"), (10, "a"), (35, "z"), (36, "10"), (1295, "zz"), (-37, "-11"),
+])
+def test_to_base36(value, expected):
+    assert to_base36(value) == expected
+    assert int(expected, 36) == value
+
+
+def test_pack_uses_version_action_and_base36():
+    assert ProductPage(subcategory_id=12, product_id=123456).pack() == "1pp:c:2n9c"
+    assert ClearCart().pack() == "1cl"
+
+
+def test_round_trip():
+    for data in (ProductPage(1, 2 ** 40), CategoriesPage(0), SubcategoriesPage(77, 3), ClearCart()):
+        assert unpack(data.pack()) == data
+
+
+def test_missing_fields_take_defaults():
+    # Кнопка, отправленная до появления поля page
+    assert unpack("1sp:25") == SubcategoriesPage(category_id=77, page=0)
+
+
+def test_extra_fields_are_dropped():
+    # Кнопка от более новой версии бота
+    assert unpack("1cp:3:zz") == CategoriesPage(page=3)
+
+
+@pytest.mark.parametrize("data", [None, "", "1", "1zz:1", "1pp:c", "1pp:c:!", "2pp:c:1", "unknown_1"])
+def test_unknown_or_broken_data(data):
+    assert unpack(data) is None
+
+
+@pytest.mark.parametrize("data, expected", [
+    ("page_3", CategoriesPage(3)),
+    ("subcat_page_12_2", SubcategoriesPage(12, 2)),
+    ("clear_cart", ClearCart()),
+    # Старые кнопки листания несли номер товара, а не ID
+    ("product_page_12_3", ProductIndex(subcategory_id=12, index=3)),
+])
+def test_legacy_format(data, expected):
+    assert unpack(data) == expected
+
+
+def test_legacy_numbers_are_decimal():
+    assert unpack("page_10") == CategoriesPage(10)
+
+
+def test_too_long_data_is_rejected():
+    with pytest.raises(ValueError):
+        ProductPage(36 ** 40, 36 ** 40).pack()
+    assert len(ProductPage(2 ** 63, 2 ** 63).pack()) <= MAX_LENGTH
+
+
+def test_unsupported_schema_is_rejected():
+    with pytest.raises(TypeError):
+        @callback_data("x:y")
+        class BadAction(CallbackData):
+            pass
+    with pytest.raises(TypeError):
+        @callback_data("xf")
+        class BadField(CallbackData):
+            price: float
+    assert "x:y" not in ACTIONS and "xf" not in ACTIONS
+
+
+def test_dispatcher_routes_by_data_type():
+    dispatcher = CallbackDispatcher()
+    calls = []
+
+    @dispatcher.register(ProductPage)
+    async def product_handler(callback, data, db):
+        calls.append((data, db))
+        return "ok"
+
+    async def press(data):
+        return await dispatcher.dispatch(SimpleNamespace(data=data), db="db", state="лишний аргумент")
+
+    assert asyncio.run(press("1pp:1:2")) == "ok"
+    assert calls == [(ProductPage(1, 2), "db")]
+    assert asyncio.run(press("1cl")) is UNHANDLED
+    assert asyncio.run(press("мусор")) is UNHANDLED
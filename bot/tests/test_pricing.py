@@ -0,0 +1,42 @@
+import pytest
+
+from pricing import OrderTotals, PricedLine, format_kopecks
+
+
+@pytest.mark.parametrize("kopecks, expected", [
+    (0, "0.00"), (5, "0.05"), (99, "0.99"), (100, "1.00"), (12345, "123.45"), (10 ** 12 + 1, "10000000000.01"),
+])
+def test_format_kopecks(kopecks, expected):
+    assert format_kopecks(kopecks) == expected
+
+
+def cart_rows():
+    # Строки place_order: сумма позиции и итог заказа посчитаны в SQL
+    return [
+        {"product_id": 1, "name": "Чай", "quantity": 3, "total_kopecks": 29997, "order_total_kopecks": 30147},
+        {"product_id": 2, "name": "Сахар", "quantity": 1, "total_kopecks": 150, "order_total_kopecks": 30147},
+    ]
+
+
+def test_totals_from_rows():
+    totals = OrderTotals.from_rows(7, cart_rows())
+
+    assert totals
+    assert totals.order_id == 7
+    assert totals.total_kopecks == 30147
+    assert totals.lines == (PricedLine(1, "Чай", 3, 29997), PricedLine(2, "Сахар", 1, 150))
+    assert sum(line.total_kopecks for line in totals.lines) == totals.total_kopecks
+
+
+def test_empty_cart():
+    totals = OrderTotals.from_rows(None, [])
+
+    assert not totals
+    assert totals.total_kopecks == 0
+    assert totals.labeled_prices() == []
+
+
+def test_labeled_prices_are_in_kopecks():
+    prices = OrderTotals.from_rows(7, cart_rows()).labeled_prices()
+
+    assert [(price.label, price.amount) for price in prices] == [("Чай (3 шт.)", 29997), ("Сахар (1 шт.)", 150)]
@@ -0,0 +1,160 @@
+import asyncio
+
+import pytest
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import AnswerCallbackQuery, EditMessageText, SendMessage
+
+from ratelimit import RateLimitMiddleware, TokenBucket
+
+
+def test_bucket_spaces_requests_by_interval():
+    bucket = TokenBucket(rate=2)
+
+    assert [bucket.reserve(10.0) for _ in range(4)] == [0, 0.5, 1.0, 1.5]
+
+
+def test_bucket_allows_burst_then_rate():
+    bucket = TokenBucket(rate=1, burst=3)
+
+    assert [bucket.reserve(0.0) for _ in range(5)] == [0, 0, 0, 1, 2]
+
+
+def test_bucket_refills_while_idle():
+    bucket = TokenBucket(rate=1, burst=3)
+    for _ in range(3):
+        bucket.reserve(0.0)
+
+    assert not bucket.idle(2.5)
+    assert bucket.idle(3.0)
+    # За 3 секунды простоя запас восстановился полностью
+    assert [bucket.reserve(3.0) for _ in range(4)] == [0, 0, 0, 1]
+
+
+def test_bucket_does_not_bank_more_than_burst():
+    bucket = TokenBucket(rate=1, burst=2)
+
+    assert [bucket.reserve(1000.0) for _ in range(3)] == [0, 0, 1]
+
+
+@pytest.mark.parametrize("burst", [1, 3])
+def test_pause_after_429(burst):
+    bucket = TokenBucket(rate=1, burst=burst)
+    bucket.reserve(10.0)
+    bucket.pause(5, now=10.0)
+
+    assert bucket.reserve(10.0) == 5
+    # После паузы запаса на всплеск нет: следующие запросы идут с интервалом 1 / rate
+    assert bucket.reserve(15.0) == 1
+
+
+class FakeApi:
+    """make_request для middleware: записывает запросы и отвечает 429 первые retry_after_times раз."""
+
+    def __init__(self, retry_after_times: int = 0, retry_after: int = 0):
+        self.retry_after_times = retry_after_times
+        self.retry_after = retry_after
+        self.sent = []
+
+    async def __call__(self, bot, method):
+        self.sent.append(method)
+        if self.retry_after_times:
+            self.retry_after_times -= 1
+            raise TelegramRetryAfter(method, "Too Many Requests", self.retry_after)
+        return f"result {len(self.sent)}"
+
+
+def test_retries_after_429():
+    middleware = RateLimitMiddleware(private_rate=1000, chat_burst=10, max_retries=2)
+    api = FakeApi(retry_after_times=2)
+
+    result = asyncio.run(middleware(api, None, SendMessage(chat_id=1, text="привет")))
+
+    assert result == "result 3"
+    assert len(api.sent) == 3
+
+
+def test_gives_up_after_max_retries():
+    middleware = RateLimitMiddleware(max_retries=1)
+    api = FakeApi(retry_after_times=5)
+
+    with pytest.raises(TelegramRetryAfter):
+        asyncio.run(middleware(api, None, AnswerCallbackQuery(callback_query_id="1")))
+    assert len(api.sent) == 2
+
+
+def test_does_not_wait_longer_than_max_wait():
+    middleware = RateLimitMiddleware(max_wait=10)
+    api = FakeApi(retry_after_times=1, retry_after=60)
+
+    with pytest.raises(TelegramRetryAfter):
+        asyncio.run(middleware(api, None, SendMessage(chat_id=1, text="привет")))
+    assert len(api.sent) == 1
+
+
+def test_private_and_group_chats_get_own_rates():
+    middleware = RateLimitMiddleware(private_rate=1, group_rate=1 / 3, chat_burst=1)
+
+    assert middleware._chat_bucket(42, 0.0).interval == 1
+    assert middleware._chat_bucket(-100123, 0.0).interval == 3
+    assert middleware._chat_bucket("@channel", 0.0).interval == 3
+    assert middleware._chat_bucket(None, 0.0) is None
+
+
+def test_queued_edit_is_replaced_by_newer_one():
+    middleware = RateLimitMiddleware(private_rate=20, chat_burst=1)
+    api = FakeApi()
+    first = EditMessageText(chat_id=1, message_id=5, text="страница 1")
+    second = EditMessageText(chat_id=1, message_id=5, text="страница 2")
+
+    async def scenario():
+        await middleware(api, None, SendMessage(chat_id=1, text="занимает токен чата"))
+        waiting = asyncio.create_task(middleware(api, None, first))
+        await asyncio.sleep(0)  # Первая правка встала в очередь
+        return await asyncio.gather(waiting, middleware(api, None, second))
+
+    results = asyncio.run(scenario())
+
+    assert [method.text for method in api.sent[1:]] == ["страница 2"]
+    assert results == ["result 2", "result 2"]
+    assert not middleware.pending_edits
+
+
+def test_cancelled_owner_does_not_cancel_newer_edit():
+    middleware = RateLimitMiddleware(private_rate=20, chat_burst=1)
+    api = FakeApi()
+    first = EditMessageText(chat_id=1, message_id=5, text="страница 1")
+    second = EditMessageText(chat_id=1, message_id=5, text="страница 2")
+
+    async def scenario():
+        await middleware(api, None, SendMessage(chat_id=1, text="занимает токен чата"))
+        owner = asyncio.create_task(middleware(api, None, first))
+        await asyncio.sleep(0)  # Первая правка встала в очередь
+        newer = asyncio.create_task(middleware(api, None, second))
+        await asyncio.sleep(0)  # Вторая заняла её место
+        owner.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await owner
+        return await newer
+
+    assert asyncio.run(scenario()) == "result 2"
+    assert [method.text for method in api.sent[1:]] == ["страница 2"]
+    assert not middleware.pending_edits
+
+
+def test_cancelled_edit_is_not_sent():
+    middleware = RateLimitMiddleware(private_rate=20, chat_burst=1)
+    api = FakeApi()
+
+    async def scenario():
+        await middleware(api, None, SendMessage(chat_id=1, text="занимает токен чата"))
+        edit = asyncio.create_task(middleware(api, None, EditMessageText(chat_id=1, message_id=5, text="правка")))
+        await asyncio.sleep(0)
+        edit.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await edit
+        await asyncio.sleep(0.1)  # Очередь правки прошла бы за это время
+
+    asyncio.run(scenario())
+
+    assert len(api.sent) == 1
+    assert not middleware.pending_edits
@@ -0,0 +1,101 @@
+from datetime import datetime
+
+import pytest
+
+from scheduler import CronSchedule, Job, parse_cron_field, setup_jobs, Scheduler
+
+
+@pytest.mark.parametrize("field, low, high, expected", [
+    ("*", 0, 6, set(range(7))),
+    ("5", 0, 59, {5}),
+    ("1-5", 0, 59, {1, 2, 3, 4, 5}),
+    ("*/15", 0, 59, {0, 15, 30, 45}),
+    ("0-30/10", 0, 59, {0, 10, 20, 30}),
+    ("5/20", 0, 59, {5, 25, 45}),
+    ("1,3-4,10", 1, 31, {1, 3, 4, 10}),
+])
+def test_parse_cron_field(field, low, high, expected):
+    assert parse_cron_field(field, low, high) == expected
+
+
+@pytest.mark.parametrize("field", ["60", "5-1", "*/0", "a", "", "1,", "-1"])
+def test_parse_cron_field_rejects_invalid(field):
+    with pytest.raises(ValueError):
+        parse_cron_field(field, 0, 59)
+
+
+def test_wrong_number_of_fields():
+    with pytest.raises(ValueError):
+        CronSchedule("30 4 * *")
+
+
+def test_next_after_is_strictly_later():
+    schedule = CronSchedule("30 4 * * *")
+
+    assert schedule.next_after(datetime(2026, 10, 18, 4, 29, 59)) == datetime(2026, 10, 18, 4, 30)
+    assert schedule.next_after(datetime(2026, 10, 18, 4, 30)) == datetime(2026, 10, 19, 4, 30)
+
+
+def test_every_quarter_hour():
+    schedule = CronSchedule("*/15 * * * *")
+
+    assert schedule.next_after(datetime(2026, 10, 18, 23, 50)) == datetime(2026, 10, 19, 0, 0)
+
+
+def test_rolls_over_month_and_year():
+    assert CronSchedule("0 0 1 1 *").next_after(datetime(2026, 10, 18, 12, 0)) == datetime(2027, 1, 1, 0, 0)
+    assert CronSchedule("0 0 31 * *").next_after(datetime(2026, 10, 31, 0, 0)) == datetime(2026, 12, 31, 0, 0)
+
+
+def test_weekday_zero_is_sunday():
+    # 18.10.2026 — воскресенье
+    schedule = CronSchedule("0 12 * * 0")
+
+    assert schedule.next_after(datetime(2026, 10, 18, 11, 0)) == datetime(2026, 10, 18, 12, 0)
+    assert schedule.next_after(datetime(2026, 10, 18, 13, 0)) == datetime(2026, 10, 25, 12, 0)
+
+
+def test_day_of_month_or_weekday():
+    # Как в cron: 13-е число или пятница, что наступит раньше
+    schedule = CronSchedule("0 12 13 * 5")
+
+    assert schedule.next_after(datetime(2026, 10, 18)) == datetime(2026, 10, 23, 12, 0)
+    assert schedule.next_after(datetime(2026, 11, 12, 13, 0)) == datetime(2026, 11, 13, 12, 0)
+
+
+def test_leap_day():
+    # 2100 год не високосный
+    assert CronSchedule("0 0 29 2 *").next_after(datetime(2097, 3, 1)) == datetime(2104, 2, 29, 0, 0)
+
+
+def test_impossible_schedule():
+    with pytest.raises(ValueError):
+        CronSchedule("0 0 30 2 *").next_after(datetime(2026, 10, 18))
+
+
+def test_lock_key_is_signed_32_bit_and_stable():
+    keys = {Job(name, None).lock_key for name in ("delete_abandoned_carts", "expire_unpaid_orders", "x" * 100)}
+
+    assert len(keys) == 3
+    assert all(-2 ** 31 <= key < 2 ** 31 for key in keys)
+    assert Job("delete_abandoned_carts", None).lock_key == Job("delete_abandoned_carts", None).lock_key
+
+
+def test_add_requires_interval_or_cron():
+    scheduler = Scheduler(db=object())
+
+    with pytest.raises(ValueError):
+        scheduler.add("job", None)
+    with pytest.raises(ValueError):
+        scheduler.add("job", None, interval=60, cron="* * * * *")
+    with pytest.raises(ValueError):
+        scheduler.add("job", None, interval=0)
+
+
+def test_setup_jobs_without_storage():
+    scheduler = Scheduler(db=object())
+    setup_jobs(scheduler)
+
+    names = {job.name for job in scheduler.jobs}
+    assert {"delete_abandoned_carts", "expire_unpaid_orders"} <= names
+    assert "delete_expired_fsm" not in names
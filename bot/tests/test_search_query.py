@@ -0,0 +1,25 @@
+from database import SEARCH_MAX_WORDS, to_prefix_tsquery
+
+
+def test_last_word_is_prefix():
+    assert to_prefix_tsquery("Чай") == "чай:*"
+    assert to_prefix_tsquery("зелёный чай") == "зелёный & чай:*"
+
+
+def test_punctuation_and_operators_are_dropped():
+    assert to_prefix_tsquery("  чай!! & (зелёный) | :* 'улун'") == "чай & зелёный & улун:*"
+
+
+def test_empty_input():
+    assert to_prefix_tsquery("") is None
+    assert to_prefix_tsquery("  !?&|  ") is None
+
+
+def test_words_are_limited():
+    words = [f"слово{i}" for i in range(SEARCH_MAX_WORDS + 3)]
+    query = to_prefix_tsquery(" ".join(words))
+    assert query.split(" & ") == words[:SEARCH_MAX_WORDS - 1] + [f"{words[SEARCH_MAX_WORDS - 1]}:*"]
+
+
+def test_digits_and_underscore_are_words():
+    assert to_prefix_tsquery("iphone 15_pro") == "iphone & 15_pro:*"
@@ -0,0 +1,85 @@
+import pytest
+
+import database
+from database import TTLCache
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(database.time, "monotonic", clock)
+    return clock
+
+
+def test_entry_expires_after_ttl(clock):
+    cache = TTLCache(maxsize=10, ttl=5)
+    cache.set(("categories",), [1, 2])
+
+    clock.now += 5
+    assert cache.get(("categories",)) == [1, 2]
+
+    clock.now += 0.001
+    assert cache.get(("categories",), "нет") == "нет"
+    assert len(cache) == 0  # Устаревшая запись удаляется при чтении
+
+
+def test_ttl_per_entry(clock):
+    cache = TTLCache(maxsize=10, ttl=5)
+    cache.set(("short",), 1, ttl=1)
+    cache.set(("long",), 2)
+
+    clock.now += 2
+    assert cache.get(("short",)) is None
+    assert cache.get(("long",)) == 2
+
+
+def test_set_renews_expiry(clock):
+    cache = TTLCache(maxsize=10, ttl=5)
+    cache.set(("key",), 1)
+    clock.now += 4
+    cache.set(("key",), 2)
+    clock.now += 4
+    assert cache.get(("key",)) == 2
+
+
+def test_least_recently_used_is_evicted(clock):
+    cache = TTLCache(maxsize=2, ttl=5)
+    cache.set(("a",), 1)
+    cache.set(("b",), 2)
+    cache.get(("a",))  # "a" теперь читали последним
+    cache.set(("c",), 3)
+
+    assert cache.get(("b",)) is None
+    assert cache.get(("a",)) == 1
+    assert cache.get(("c",)) == 3
+
+
+def test_invalidate_namespace(clock):
+    cache = TTLCache(maxsize=10, ttl=5)
+    cache.set(("products", 1), "p1")
+    cache.set(("products", 2, 0), "p2")
+    cache.set(("categories",), "c")
+
+    cache.invalidate("products")
+
+    assert len(cache) == 1
+    assert cache.get(("categories",)) == "c"
+
+
+def test_pop_and_clear(clock):
+    cache = TTLCache(maxsize=10, ttl=5)
+    cache.set(("a",), 1)
+    cache.set(("b",), 2)
+
+    assert cache.pop(("a",)) == 1
+    assert cache.pop(("a",), "нет") == "нет"
+    cache.clear()
+    assert len(cache) == 0
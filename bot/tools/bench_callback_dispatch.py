@@ -0,0 +1,149 @@
+"""Бенчмарк маршрутизации нажатий inline-кнопок.
+
+Сравнивает стоимость обработки одного callback_query в Dispatcher.feed_update:
+- по-старому: обработчик на каждую кнопку с фильтром lambda c: c.data.startswith(...)
+  и разбором c.data.split("_") внутри;
+- по-новому: один обработчик CallbackDispatcher, разбор callback_data и поиск
+  обработчика в словаре (callbacks.py).
+
+Обработчики пустые, поэтому замер показывает только накладные расходы
+маршрутизации. Запуск из каталога bot:
+    python tools/bench_callback_dispatch.py --updates 20000
+"""
+import argparse
+import asyncio
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from aiogram import Bot, Dispatcher, Router  # noqa: E402
+from aiogram.types import CallbackQuery, Chat, Message, Update, User  # noqa: E402
+
+import callbacks  # noqa: E402
+
+# Фильтры в том порядке, в каком обработчики были зарегистрированы в handlers.py
+LEGACY_FILTERS = [
+    lambda c: c.data == "sub_check",
+    lambda c: c.data.startswith("page_"),
+    lambda c: c.data.startswith("category_"),
+    lambda c: c.data.startswith("subcat_page_"),
+    lambda c: c.data.startswith("subcategory_"),
+    lambda c: c.data.startswith("product_page_"),
+    lambda c: c.data.startswith("add_to_cart_"),
+    lambda c: c.data == "confirm_cart",
+    lambda c: c.data == "cancel_cart",
+    lambda c: c.data.startswith("remove_"),
+    lambda c: c.data == "clear_cart",
+    lambda c: c.data == "checkout",
+    lambda c: c.data.startswith("faq_"),
+]
+
+# (доля нажатий, старый callback_data, новые данные кнопки): чаще всего листают товары
+TRAFFIC = [
+    (50, "product_page_{a}_{b}", lambda a, b: callbacks.ProductPage(a, b)),
+    (10, "page_{a}", lambda a, b: callbacks.CategoriesPage(a % 10)),
+    (10, "category_{a}", lambda a, b: callbacks.Category(a)),
+    (5, "subcat_page_{a}_{b}", lambda a, b: callbacks.SubcategoriesPage(a, b % 10)),
+    (10, "subcategory_{a}", lambda a, b: callbacks.Subcategory(a)),
+    (8, "add_to_cart_{b}", lambda a, b: callbacks.AddToCart(b)),
+    (4, "remove_{b}", lambda a, b: callbacks.RemoveFromCart(b)),
+    (3, "faq_{a}", lambda a, b: callbacks.FaqAnswer(a)),
+]
+
+
+async def legacy_handler(callback: CallbackQuery):
+    callback.data.split("_")
+
+
+async def new_handler(callback: CallbackQuery, data):
+    pass
+
+
+def legacy_router() -> Router:
+    router = Router()
+    for callback_filter in LEGACY_FILTERS:
+        router.callback_query.register(legacy_handler, callback_filter)
+    return router
+
+
+def new_router() -> Router:
+    router = Router()
+    dispatcher = callbacks.CallbackDispatcher()
+    for data_type in callbacks.ACTIONS.values():
+        dispatcher.register(data_type)(new_handler)
+    router.callback_query.register(dispatcher.dispatch)
+    return router
+
+
+def make_updates(rng: random.Random, count: int, legacy: bool) -> list[Update]:
+    user = User(id=1, is_bot=False, first_name="bench")
+    message = Message(message_id=1, date=0, chat=Chat(id=1, type="private"), text="bench")
+    weights = [weight for weight, _, _ in TRAFFIC]
+    updates = []
+    for update_id in range(count):
+        _, template, factory = rng.choices(TRAFFIC, weights)[0]
+        a, b = rng.randrange(1, 10_000), rng.randrange(1, 10_000_000)
+        data = template.format(a=a, b=b) if legacy else factory(a, b).pack()
+        updates.append(Update(update_id=update_id, callback_query=CallbackQuery(
+            id=str(update_id), from_user=user, chat_instance="bench", data=data, message=message)))
+    return updates
+
+
+async def bench(router: Router, updates: list[Update]) -> float:
+    """Среднее время feed_update на одно нажатие, мкс."""
+    dp = Dispatcher()
+    dp.include_router(router)
+    bot = Bot("123:bench")
+    try:
+        for update in updates[:1000]:  # Прогрев
+            await dp.feed_update(bot, update)
+        started = time.perf_counter()
+        for update in updates:
+            await dp.feed_update(bot, update)
+        return (time.perf_counter() - started) / len(updates) * 1e6
+    finally:
+        await bot.session.close()
+
+
+def bench_decode(updates: list[Update], decode) -> float:
+    """Среднее время разбора callback_data, нс."""
+    data = [update.callback_query.data for update in updates]
+    started = time.perf_counter()
+    for item in data:
+        decode(item)
+    return (time.perf_counter() - started) / len(data) * 1e9
+
+
+async def main(args):
+    rng = random.Random(42)
+    legacy_updates = make_updates(rng, args.updates, legacy=True)
+    new_updates = make_updates(rng, args.updates, legacy=False)
+
+    def legacy_decode(data):
+        for number, callback_filter in enumerate(LEGACY_FILTERS):
+            if callback_filter(_Data(data)):
+                return number, data.split("_")
+
+    print(f"{'маршрутизация':<34} | {'feed_update, мкс':>16} | {'разбор, нс':>10}")
+    print(f"{'фильтры startswith':<34} | {await bench(legacy_router(), legacy_updates):>16.1f} | "
+          f"{bench_decode(legacy_updates, legacy_decode):>10.0f}")
+    print(f"{'CallbackDispatcher':<34} | {await bench(new_router(), new_updates):>16.1f} | "
+          f"{bench_decode(new_updates, callbacks.unpack):>10.0f}")
+    print(f"{'CallbackDispatcher, старые кнопки':<34} | {await bench(new_router(), legacy_updates):>16.1f} | "
+          f"{bench_decode(legacy_updates, callbacks.unpack):>10.0f}")
+
+
+class _Data:
+    __slots__ = ("data",)
+
+    def __init__(self, data: str):
+        self.data = data
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--updates", type=int, default=20_000)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,81 @@
+"""Бенчмарк поиска по индексу FAQ.
+
+Строит индекс из синтетических вопросов разного размера и замеряет
+время поиска (точное совпадение, вопрос с опечаткой, вопрос без ответа).
+
+Запуск из каталога bot:
+    python tools/bench_faq_index.py --sizes 1000 10000 50000
+"""
+import argparse
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from faq_index import FaqIndex  # noqa: E402
+
+COMMON_WORDS = "как где когда почему можно ли мне я у вас на в с по для".split()
+CONSONANTS = "бвгджзклмнпрстфхцчшщ"
+VOWELS = "аеиоуыэюя"
+
+
+def make_vocabulary(rng: random.Random, size: int = 20_000) -> list[str]:
+    """Словарь псевдослов: в реальных FAQ кроме частых слов много редких."""
+    return ["".join(rng.choice(CONSONANTS) + rng.choice(VOWELS) for _ in range(rng.randint(2, 4)))
+            for _ in range(size)]
+
+
+def make_question(rng: random.Random, vocabulary: list[str]) -> str:
+    words = rng.sample(COMMON_WORDS, 2) + [
+        vocabulary[min(int(rng.paretovariate(1.2)) - 1, len(vocabulary) - 1)] if rng.random() < 0.3
+        else rng.choice(vocabulary)
+        for _ in range(rng.randint(2, 6))
+    ]
+    rng.shuffle(words)
+    return " ".join(words) + "?"
+
+
+def typo(text: str, rng: random.Random) -> str:
+    i = rng.randrange(len(text) - 1)
+    return text[:i] + text[i + 1:]
+
+
+def bench(index: FaqIndex, queries: list[str]) -> tuple[float, float]:
+    timings = []
+    for query in queries:
+        started = time.perf_counter()
+        index.search(query)
+        timings.append((time.perf_counter() - started) * 1e6)
+    return statistics.mean(timings), statistics.quantiles(timings, n=20)[-1]
+
+
+def main(args):
+    rng = random.Random(42)
+    vocabulary = make_vocabulary(rng)
+    print(f"{'вопросов':>9} | {'загрузка, мс':>12} | {'запрос':<10} | {'среднее, мкс':>12} | {'p95, мкс':>9}")
+    for size in args.sizes:
+        rows = [{"id": i, "question": make_question(rng, vocabulary), "answer": "ответ"} for i in range(size)]
+        index = FaqIndex()
+        started = time.perf_counter()
+        index.load(rows)
+        load_ms = (time.perf_counter() - started) * 1000
+
+        sample = [rng.choice(rows)["question"] for _ in range(args.queries)]
+        cases = {
+            "точный": sample,
+            "опечатка": [typo(question, rng) for question in sample],
+            "нет ответа": [make_question(rng, vocabulary) for _ in range(args.queries)],
+        }
+        for name, queries in cases.items():
+            mean, p95 = bench(index, queries)
+            print(f"{size:>9} | {load_ms:>12.0f} | {name:<10} | {mean:>12.1f} | {p95:>9.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 50_000])
+    parser.add_argument("--queries", type=int, default=500)
+    main(parser.parse_args())
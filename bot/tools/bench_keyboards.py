@@ -0,0 +1,92 @@
+"""Бенчмарк построения клавиатур.
+
+Для каждой клавиатуры сравнивает сборку заново на каждый вызов (функции
+build_* из keyboards.py — так клавиатуры строились раньше) и кэшированную
+версию, которую теперь получают обработчики. Показывает время на вызов и
+сколько памяти остаётся занятым на одну клавиатуру (tracemalloc).
+
+Данные каталога берутся из БД один раз, дальше — из кэша каталога.
+Запуск из каталога bot:
+    python tools/bench_keyboards.py --calls 20000
+"""
+import argparse
+import asyncio
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import keyboards  # noqa: E402
+from database import Database  # noqa: E402
+
+
+async def measure(factory, calls: int) -> tuple[float, float]:
+    """Возвращает (мкс на вызов, байт памяти, удерживаемых результатом одного вызова)."""
+    await factory()  # Прогрев кэшей
+    started = time.perf_counter()
+    for _ in range(calls):
+        await factory()
+    elapsed = (time.perf_counter() - started) / calls * 1e6
+
+    tracemalloc.start()
+    results = [await factory() for _ in range(1000)]
+    memory, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del results
+    return elapsed, memory / 1000
+
+
+async def main(args):
+    db = Database()
+    await db.connect()
+    try:
+        category_id = await db.fetchval("SELECT category_id FROM subcategories ORDER BY id LIMIT 1")
+        subcategory_id = await db.fetchval("SELECT min(subcategory_id) FROM products")
+        product = await db.get_product_card(subcategory_id)
+
+        async def categories_built():
+            categories, has_next = await db.get_categories_page(0, keyboards.CATEGORIES_PER_PAGE)
+            return keyboards.build_categories_keyboard(categories, 0, has_next)
+
+        async def subcategories_built():
+            subcategories, has_next = await db.get_subcategories_page(category_id, 0, keyboards.SUBCATEGORIES_PER_PAGE)
+            return keyboards.build_subcategories_keyboard(subcategories, category_id, 0, has_next)
+
+        async def product_built():
+            return keyboards.build_product_navigation_keyboard.__wrapped__(  # Без lru_cache
+                subcategory_id, product['id'], product['prev_id'], product['next_id'])
+
+        async def product_cached():
+            return await keyboards.product_navigation_keyboard(subcategory_id, product['id'], product['prev_id'],
+                                                               product['next_id'])
+
+        async def built(function):
+            return function()
+
+        link = "https://t.me/channel"
+        cases = [
+            ("главное меню", lambda: built(keyboards.build_main_keyboard), keyboards.main_keyboard),
+            ("подтверждение", lambda: built(keyboards.build_confirm_keyboard), keyboards.confirm_keyboard),
+            ("подписка", lambda: built(lambda: keyboards.build_subscribe_keyboard.__wrapped__(link)),
+             lambda: keyboards.subscribe_keyboard(link)),
+            ("категории", categories_built, lambda: keyboards.categories_keyboard(0)),
+            ("подкатегории", subcategories_built, lambda: keyboards.subcategories_keyboard(category_id, 0)),
+            ("товар", product_built, product_cached),
+        ]
+
+        print(f"{'клавиатура':<14} | {'сборка, мкс':>11} | {'кэш, мкс':>8} | {'сборка, Б':>9} | {'кэш, Б':>6}")
+        for name, before, after in cases:
+            before_time, before_memory = await measure(before, args.calls)
+            after_time, after_memory = await measure(after, args.calls)
+            print(f"{name:<14} | {before_time:>11.2f} | {after_time:>8.2f} | "
+                  f"{before_memory:>9.0f} | {after_memory:>6.0f}")
+    finally:
+        await db.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=20_000)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,119 @@
+"""Бенчмарк полнотекстового поиска товаров (Database.search_products).
+
+Создаёт в отдельной схеме копию таблицы products (с тем же поисковым
+вектором и GIN-индексом), заполняет её синтетическим каталогом и замеряет
+задержку поиска для запросов разного типа. Основные таблицы не трогаются.
+
+Запуск из каталога bot (после миграций Django):
+    python tools/bench_product_search.py --rows 1000000
+    python tools/bench_product_search.py --reuse  # без повторного заполнения
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import asyncpg  # noqa: E402
+from config import DB_NAME, DB_USER, DB_PASSWORD, DB_HOST, DB_PORT  # noqa: E402
+from database import Database  # noqa: E402
+
+SCHEMA = "bench_search"
+
+KINDS = ["смартфон", "ноутбук", "наушники", "чехол", "зарядка", "кабель", "планшет", "монитор",
+         "клавиатура", "мышь", "колонка", "часы", "роутер", "принтер", "камера", "телевизор",
+         "пылесос", "чайник", "утюг", "фен", "кофеварка", "микроволновка", "холодильник", "плита"]
+BRANDS = ["Samsung", "Xiaomi", "Apple", "Huawei", "Sony", "LG", "Philips", "Bosch", "Lenovo", "Asus",
+          "Acer", "Dell", "HP", "Logitech", "JBL", "Tefal", "Braun", "Redmond", "Polaris", "Vitek"]
+ADJECTIVES = ["беспроводной", "компактный", "игровой", "мощный", "тихий", "лёгкий", "прочный",
+              "быстрый", "умный", "складной", "металлический", "пластиковый", "водонепроницаемый"]
+COLORS = ["чёрный", "белый", "серый", "синий", "красный", "зелёный", "золотой", "серебристый"]
+
+FILL_SQL = """
+INSERT INTO products (name, description, price, image_url)
+SELECT k.kinds[1 + (random() * (array_length(k.kinds, 1) - 1))::int] || ' ' ||
+       k.brands[1 + (random() * (array_length(k.brands, 1) - 1))::int] || ' ' ||
+       upper(substr(md5(g::text), 1, 2)) || (g % 1000),
+       k.adjectives[1 + (random() * (array_length(k.adjectives, 1) - 1))::int] || ', ' ||
+       k.colors[1 + (random() * (array_length(k.colors, 1) - 1))::int] || ', гарантия ' ||
+       (1 + g % 3) || ' года',
+       (g % 100000) / 100.0 + 0.99,
+       'https://example.com/' || g || '.jpg'
+FROM generate_series(1, $1) g,
+     (SELECT $2::text[] AS kinds, $3::text[] AS brands, $4::text[] AS adjectives, $5::text[] AS colors) k
+"""
+
+
+def make_queries(rng: random.Random, count: int) -> dict[str, list[str]]:
+    return {
+        "тип": [rng.choice(KINDS) for _ in range(count)],
+        "тип+бренд": [f"{rng.choice(KINDS)} {rng.choice(BRANDS)}" for _ in range(count)],
+        "префикс": [rng.choice(KINDS)[:rng.randint(3, 5)] for _ in range(count)],
+        "модель": [f"{rng.choice(BRANDS)} {rng.randrange(1000)}" for _ in range(count)],
+        "описание": [f"{rng.choice(ADJECTIVES)} {rng.choice(COLORS)}" for _ in range(count)],
+        "нет товара": [rng.choice(["дрель", "велосипед", "палатка", "гитара"]) for _ in range(count)],
+    }
+
+
+async def fill(connection: asyncpg.Connection, rows: int):
+    """Пересоздаёт схему и заполняет её товарами; структура таблицы берётся из public.products."""
+    await connection.execute(f"""
+        DROP SCHEMA IF EXISTS {SCHEMA} CASCADE;
+        CREATE SCHEMA {SCHEMA};
+        CREATE TABLE {SCHEMA}.products (LIKE public.products INCLUDING ALL);
+    """)
+    started = time.perf_counter()
+    await connection.execute(f"SET search_path = {SCHEMA}")
+    await connection.execute("SELECT setseed(0.42)")  # Одинаковый каталог от запуска к запуску
+    await connection.execute(FILL_SQL, rows, KINDS, BRANDS, ADJECTIVES, COLORS)
+    await connection.execute("ANALYZE products")
+    print(f"🌱 {rows} товаров за {time.perf_counter() - started:.0f} с")
+
+
+async def bench(db: Database, queries: list[str], limit: int) -> tuple[float, float]:
+    timings = []
+    for query in queries:
+        started = time.perf_counter()
+        await db.search_products(query, limit)
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.mean(timings), statistics.quantiles(timings, n=20)[-1]
+
+
+async def main(args):
+    params = dict(database=DB_NAME, user=DB_USER, password=DB_PASSWORD, host=DB_HOST, port=DB_PORT)
+    if not args.reuse:
+        connection = await asyncpg.connect(**params)
+        try:
+            await fill(connection, args.rows)
+        finally:
+            await connection.close()
+
+    # Тот же код, что в боте, но запросы идут в таблицу схемы бенчмарка
+    db = Database()
+    db.pool = await asyncpg.create_pool(**params, server_settings={"search_path": SCHEMA})
+    try:
+        rng = random.Random(42)
+        print(f"{'запрос':<11} | {'среднее, мс':>11} | {'p95, мс':>8}")
+        for name, queries in make_queries(rng, args.queries).items():
+            mean, p95 = await bench(db, queries, args.limit)
+            print(f"{name:<11} | {mean:>11.2f} | {p95:>8.2f}")
+    finally:
+        await db.pool.close()
+        if args.drop:
+            connection = await asyncpg.connect(**params)
+            await connection.execute(f"DROP SCHEMA {SCHEMA} CASCADE")
+            await connection.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--queries", type=int, default=200, help="запросов каждого типа")
+    parser.add_argument("--limit", type=int, default=20, help="результатов на страницу")
+    parser.add_argument("--reuse", action="store_true", help="не заполнять схему заново")
+    parser.add_argument("--drop", action="store_true", help="удалить схему после замера")
+    asyncio.run(main(parser.parse_args()))
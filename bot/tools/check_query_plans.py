@@ -0,0 +1,146 @@
+"""Проверка планов SQL-запросов бота.
+
+Собирает все SQL-запросы из модулей бота (database.py, storage.py, ...), выполняет для каждого EXPLAIN
+на локальной БД и завершается с ошибкой, если хоть один запрос читает
+большую таблицу последовательным сканированием (Seq Scan).
+
+Запуск из каталога bot:
+    python tools/check_query_plans.py --seed --min-rows 10000
+"""
+import argparse
+import ast
+import asyncio
+import json
+import re
+import sys
+from datetime import date, datetime, timedelta, timezone
+from pathlib import Path
+
+BOT_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BOT_DIR))
+
+import asyncpg  # noqa: E402
+from config import DB_NAME, DB_USER, DB_PASSWORD, DB_HOST, DB_PORT  # noqa: E402
+
+SQL_START = re.compile(r"^\s*(--[^\n]*\n\s*)*(SELECT|INSERT|UPDATE|DELETE|WITH)\b")
+
+# Пометка в тексте запроса, который намеренно читает таблицу целиком (выгрузки)
+FULL_SCAN_MARK = "-- plan: full scan"
+
+# Значения параметров для EXPLAIN по типу параметра. Запрос с параметром другого типа
+# пропускается: с NULL планировщик сворачивает условие (updated_at < now() - NULL)
+# в false и показывает план, которого на самом деле не будет.
+SAMPLE_VALUES = {
+    "int2": 1, "int4": 1, "int8": 1,
+    "numeric": 1, "float4": 1.0, "float8": 1.0,
+    "text": "test", "varchar": "test", "bool": True,
+    "interval": timedelta(days=1), "timestamptz": datetime.now(timezone.utc), "timestamp": datetime.now(),
+    "date": date.today(), "json": "{}", "jsonb": "{}",
+    "int4[]": [1], "int8[]": [1], "text[]": ["test"],
+}
+
+SEED_SQL = """
+INSERT INTO categories (name)
+SELECT 'Категория ' || g FROM generate_series(1, 100) g;
+
+INSERT INTO subcategories (name, category_id)
+SELECT 'Подкатегория ' || g, (SELECT min(id) FROM categories) + g % 100
+FROM generate_series(1, 5000) g;
+
+INSERT INTO products (name, description, price, image_url, subcategory_id)
+SELECT 'Товар ' || g, 'Описание товара ' || g, (g % 1000) + 0.99,
+       'https://example.com/' || g || '.jpg', (SELECT min(id) FROM subcategories) + g * 4999 / {products}
+FROM generate_series(1, {products}) g;
+
+INSERT INTO cart (user_id, product_id, quantity)
+SELECT g, (SELECT min(id) FROM products) + g % {products}, 1 + g % 5
+FROM generate_series(1, {products}) g
+ON CONFLICT DO NOTHING;
+
+INSERT INTO orders (user_id, address, phone, total_price, status)
+SELECT g, 'Адрес ' || g, '+7900000' || g, 100, CASE WHEN g % 10 = 0 THEN NULL ELSE 'paid' END
+FROM generate_series(1, {orders}) g;
+
+INSERT INTO order_items (order_id, product_id, quantity)
+SELECT o.order_id, (SELECT min(id) FROM products) + (o.order_id * k) % {products}, k
+FROM orders o CROSS JOIN generate_series(1, 3) k;
+
+ANALYZE;
+"""
+
+
+def collect_queries(path: Path) -> list[str]:
+    """Возвращает все строковые литералы файла, похожие на SQL-запрос."""
+    tree = ast.parse(path.read_text(encoding="utf-8"))
+    nodes = sorted(
+        (node for node in ast.walk(tree)
+         if isinstance(node, ast.Constant) and isinstance(node.value, str) and SQL_START.match(node.value)),
+        key=lambda node: node.lineno)
+    queries = []
+    for node in nodes:
+        if node.value not in queries:
+            queries.append(node.value)
+    return queries
+
+
+def seq_scans(plan: dict, large_tables: dict[str, float]):
+    """Находит в плане Seq Scan по большим таблицам."""
+    if plan.get("Node Type") == "Seq Scan" and plan.get("Relation Name") in large_tables:
+        yield plan["Relation Name"]
+    for child in plan.get("Plans", []):
+        yield from seq_scans(child, large_tables)
+
+
+async def main(args):
+    conn = await asyncpg.connect(database=DB_NAME, user=DB_USER, password=DB_PASSWORD,
+                                 host=DB_HOST, port=DB_PORT)
+    try:
+        if args.seed:
+            print(f"🌱 Заполняем БД тестовыми данными ({args.products} товаров)...")
+            await conn.execute(SEED_SQL.format(products=args.products, orders=args.products // 2))
+
+        large_tables = {
+            row["relname"]: row["reltuples"]
+            for row in await conn.fetch(
+                "SELECT relname, reltuples FROM pg_class WHERE relkind = 'r' AND reltuples >= $1",
+                args.min_rows)
+        }
+
+        failed = 0
+        queries = [query for path in sorted(BOT_DIR.glob("*.py")) for query in collect_queries(path)]
+        for query in queries:
+            text = " ".join(query.split())
+            try:
+                stmt = await conn.prepare(f"EXPLAIN (FORMAT JSON) {query}")
+                types = [param.name for param in stmt.get_parameters()]
+                unknown = sorted(set(types) - SAMPLE_VALUES.keys())
+                if unknown:
+                    print(f"➖ ПРОПУСК  {text}\n           нет примера значения для типов: {', '.join(unknown)}")
+                    continue
+                plan = json.loads(await stmt.fetchval(*(SAMPLE_VALUES[name] for name in types)))[0]["Plan"]
+            except asyncpg.PostgresError as e:
+                failed += 1
+                print(f"❌ ОШИБКА   {text}\n           {e}")
+                continue
+
+            scanned = sorted(set(seq_scans(plan, large_tables)))
+            if scanned and FULL_SCAN_MARK in query:
+                print(f"➖ ПРОПУСК  {text}")
+            elif scanned:
+                failed += 1
+                print(f"❌ SEQ SCAN {', '.join(scanned)}  {text}")
+            else:
+                print(f"✅ OK       {text}")
+    finally:
+        await conn.close()
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seed", action="store_true", help="заполнить БД тестовыми данными перед проверкой")
+    parser.add_argument("--products", type=int, default=200_000, help="число товаров при заполнении")
+    parser.add_argument("--min-rows", type=int, default=10_000,
+                        help="таблицы с таким числом строк и больше считаются большими")
+    sys.exit(asyncio.run(main(parser.parse_args())))
@@ -0,0 +1,361 @@
+"""Нагрузочный тест: синтетические пользователи проходят сценарии через Dispatcher.feed_update.
+
+Каждый пользователь — своя сессия: /start → «📦 Каталог» → категория →
+подкатегория → листание товаров; в сценарии покупки дальше добавление в
+корзину, корзина, оформление заказа и оплата. Пользователь нажимает те
+кнопки, которые бот ему действительно прислал: запросы к Bot API принимает
+FakeTelegramSession (без сети, с настраиваемой задержкой) и запоминает
+последнюю клавиатуру в каждом чате. Остальное настоящее: обработчики,
+middleware, FSM в Postgres и локальная БД, заполненная
+tools/check_query_plans.py --seed.
+
+Отчёт: пропускная способность, p50/p95/p99 и запросы к БД по обработчикам,
+запросы к БД и к Bot API по сценариям.
+
+Тест пишет в БД (пользователи, корзины, заказы, file_id фото). ID
+пользователей начинаются с FIRST_USER_ID, их данные удаляются до и после
+прогона. Запуск из каталога bot:
+    python tools/load_test.py --users 1000 --concurrency 100 --buy-share 0.3
+"""
+import argparse
+import asyncio
+import itertools
+import logging
+import random
+import statistics
+import sys
+import time
+from collections import Counter, defaultdict
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from aiogram import BaseMiddleware, Bot, Dispatcher  # noqa: E402
+from aiogram.client.session.base import BaseSession  # noqa: E402
+from aiogram.methods import (EditMessageMedia, EditMessageText, GetChatMember, SendInvoice, SendMessage,  # noqa: E402
+                             SendPhoto)
+from aiogram.types import (CallbackQuery, Chat, ChatMemberMember, InlineKeyboardMarkup, Message,  # noqa: E402
+                           PhotoSize, PreCheckoutQuery, SuccessfulPayment, Update, User)
+
+from callbacks import (AddToCart, CategoriesPage, Category, Checkout, ConfirmCart, ProductPage,  # noqa: E402
+                       Subcategory, unpack)
+from database import Database  # noqa: E402
+from handlers import router  # noqa: E402
+from logger import LoggingMiddleware, handler_var, setup_logging  # noqa: E402
+from metrics import MetricsMiddleware, OUTGOING_COALESCED, OUTGOING_WAIT, db_queries_var  # noqa: E402
+from ratelimit import RateLimitMiddleware  # noqa: E402
+from storage import PostgresStorage  # noqa: E402
+
+BOT_ID = 123456
+BOT_TOKEN = f"{BOT_ID}:load-test"
+FIRST_USER_ID = 9_000_000_000
+FILE_ID_PREFIX = "load-test:"
+
+CLEANUP_SQL = [
+    "DELETE FROM order_items WHERE order_id IN (SELECT order_id FROM orders WHERE user_id >= $1)",
+    "DELETE FROM orders WHERE user_id >= $1",
+    "DELETE FROM cart WHERE user_id >= $1",
+    "DELETE FROM users WHERE user_id >= $1",
+]
+
+
+class FakeTelegramSession(BaseSession):
+    """Отвечает на запросы к Bot API без сети и запоминает, что бот показал пользователям."""
+
+    def __init__(self, latency: float = 0):
+        super().__init__()
+        self.latency = latency
+        self.message_ids = itertools.count(1)
+        self.keyboards = {}  # chat_id -> последняя inline-клавиатура
+        self.messages = {}  # chat_id -> ID последнего сообщения бота
+        self.invoices = {}  # chat_id -> payload последнего счёта
+        self.requests = Counter()  # метод -> запросов
+        self.requests_by_user = Counter()  # ID пользователя -> запросов
+        self.bot_user = User(id=BOT_ID, is_bot=True, first_name="bot")
+
+    async def make_request(self, bot, method, timeout=None):
+        self.requests[type(method).__name__] += 1
+        self.requests_by_user[self.user_id(method)] += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        chat_id = getattr(method, "chat_id", None)
+        if isinstance(getattr(method, "reply_markup", None), InlineKeyboardMarkup):
+            self.keyboards[chat_id] = method.reply_markup
+        if isinstance(method, SendInvoice):
+            self.invoices[chat_id] = method.payload
+        if isinstance(method, GetChatMember):
+            return ChatMemberMember(user=User(id=method.user_id, is_bot=False, first_name="user"))
+        if isinstance(method, (SendMessage, SendPhoto, SendInvoice, EditMessageText, EditMessageMedia)):
+            return self.message(chat_id, photo=isinstance(method, (SendPhoto, EditMessageMedia)))
+        return True
+
+    @staticmethod
+    def user_id(method) -> int | None:
+        """Чей это запрос: ID чата, а для ответов на нажатия и платежи — из ID запроса ("<user_id>:<n>")."""
+        if isinstance(method, GetChatMember):
+            return method.user_id
+        query_id = getattr(method, "callback_query_id", None) or getattr(method, "pre_checkout_query_id", None)
+        return int(query_id.split(":")[0]) if query_id else getattr(method, "chat_id", None)
+
+    def message(self, chat_id: int, photo: bool = False) -> Message:
+        message_id = next(self.message_ids)
+        self.messages[chat_id] = message_id
+        return Message(
+            message_id=message_id, date=int(time.time()), chat=Chat(id=chat_id, type="private"),
+            from_user=self.bot_user, text=None if photo else "...",
+            photo=[PhotoSize(file_id=f"{FILE_ID_PREFIX}{message_id}", file_unique_id=str(message_id),
+                             width=800, height=600)] if photo else None,
+        )
+
+    async def stream_content(self, *args, **kwargs):
+        raise NotImplementedError
+        yield
+
+    async def close(self):
+        pass
+
+
+class HandlerProbe(BaseMiddleware):
+    """Сообщает тесту, какой обработчик обработал обновление (feed_update(..., probe={}))."""
+
+    async def __call__(self, handler, event, data):
+        try:
+            return await handler(event, data)
+        finally:
+            handler_object = data.get("handler")
+            data["probe"]["handler"] = handler_var.get() or (handler_object.callback.__name__
+                                                              if handler_object else None)
+
+
+class Stats:
+    def __init__(self):
+        self.latencies = defaultdict(list)  # обработчик -> время обработки обновлений, с
+        self.queries = Counter()  # обработчик -> запросов к БД
+        self.errors = Counter()
+        self.scenarios = defaultdict(Counter)  # сценарий -> сессии, обновления, запросы к БД и Bot API
+        self.updates = 0
+
+
+class SimulatedUser:
+    """Пользователь Telegram, который шлёт боту сообщения и нажимает кнопки из последней клавиатуры."""
+
+    update_ids = itertools.count(1)
+
+    def __init__(self, user_id: int, dp: Dispatcher, bot: Bot, stats: Stats, rng: random.Random, think: float):
+        self.user = User(id=user_id, is_bot=False, first_name=f"Load {user_id}", username=f"load{user_id}")
+        self.chat = Chat(id=user_id, type="private")
+        self.dp, self.bot, self.session = dp, bot, bot.session
+        self.stats, self.rng, self.think = stats, rng, think
+        self.queries = [0]  # Запросы к БД за всю сессию, включая фоновую подгрузку карточек
+        self.updates = 0
+
+    async def feed(self, **update_fields) -> str | None:
+        if self.think:
+            await asyncio.sleep(self.rng.expovariate(1 / self.think))
+        update = Update(update_id=next(self.update_ids), **update_fields)
+        probe = {}
+        queries_before = self.queries[0]
+        token = db_queries_var.set(self.queries)
+        started = time.perf_counter()
+        try:
+            await self.dp.feed_update(self.bot, update, probe=probe)
+        except Exception as e:
+            self.stats.errors[f"{probe.get('handler')}: {type(e).__name__}: {e}"] += 1
+        finally:
+            elapsed = time.perf_counter() - started
+            db_queries_var.reset(token)
+        handler = probe.get("handler") or "unhandled"
+        self.stats.latencies[handler].append(elapsed)
+        self.stats.queries[handler] += self.queries[0] - queries_before
+        self.stats.updates += 1
+        self.updates += 1
+        return handler
+
+    def query_id(self) -> str:
+        return f"{self.user.id}:{next(self.update_ids)}"
+
+    def now(self) -> int:
+        return int(time.time())
+
+    async def send(self, text: str = None, **fields):
+        return await self.feed(message=Message(message_id=next(self.session.message_ids), date=self.now(),
+                                               chat=self.chat, from_user=self.user, text=text, **fields))
+
+    def buttons(self, data_type) -> list:
+        keyboard = self.session.keyboards.get(self.chat.id)
+        if keyboard is None:
+            return []
+        pressed = (unpack(button.callback_data) for row in keyboard.inline_keyboard for button in row
+                   if button.callback_data)
+        return [data for data in pressed if isinstance(data, data_type)]
+
+    async def press(self, data_type, choose=None) -> bool:
+        """Нажимает кнопку нужного типа из последней клавиатуры. False — такой кнопки нет."""
+        options = self.buttons(data_type)
+        if not options:
+            return False
+        data = (choose or self.rng.choice)(options)
+        message = Message(message_id=self.session.messages.get(self.chat.id, 1), date=self.now(), chat=self.chat,
+                          from_user=self.session.bot_user, text="...")
+        await self.feed(callback_query=CallbackQuery(id=self.query_id(), from_user=self.user,
+                                                     chat_instance=str(self.chat.id), message=message,
+                                                     data=data.pack()))
+        return True
+
+    async def browse(self, max_pages: int) -> bool:
+        """Доходит до карточки товара и листает товары. True — карточка открыта."""
+        await self.send("/start")
+        await self.send("📦 Каталог")
+        if self.rng.random() < 0.3:
+            await self.press(CategoriesPage)
+        if not await self.press(Category) or not await self.press(Subcategory):
+            return False
+        if not self.buttons(AddToCart):
+            return False  # В подкатегории нет товаров
+        for _ in range(self.rng.randint(0, max_pages)):
+            # Чаще вперёд: последняя кнопка навигации — «Вперёд ➡», если она есть
+            if not await self.press(ProductPage, lambda options: options[-1] if self.rng.random() < 0.8
+                                    else self.rng.choice(options)):
+                break
+        return True
+
+    async def buy(self):
+        """Покупает текущий товар: количество, подтверждение, корзина, адрес, телефон, оплата."""
+        await self.press(AddToCart)
+        await self.send(str(self.rng.randint(1, 3)))
+        await self.press(ConfirmCart)
+        await self.send("🛒 Корзина")
+        if not await self.press(Checkout):
+            return
+        await self.send(f"г. Москва, ул. Тестовая, д. {self.rng.randint(1, 200)}")
+        await self.send(f"+7900{self.user.id % 10_000_000:07d}")
+        payload = self.session.invoices.pop(self.chat.id, None)
+        if payload is None:
+            return  # Сумма меньше минимальной
+        total = 100_00
+        await self.feed(pre_checkout_query=PreCheckoutQuery(id=self.query_id(), from_user=self.user,
+                                                           currency="RUB", total_amount=total,
+                                                           invoice_payload=payload))
+        await self.send(successful_payment=SuccessfulPayment(
+            currency="RUB", total_amount=total, invoice_payload=payload,
+            telegram_payment_charge_id=f"tg-{payload}", provider_payment_charge_id=f"provider-{payload}"))
+
+    async def run(self, buy_share: float, max_pages: int):
+        self.scenario = "покупка" if self.rng.random() < buy_share else "просмотр"
+        if await self.browse(max_pages) and self.scenario == "покупка":
+            await self.buy()
+        totals = self.stats.scenarios[self.scenario]
+        totals["сессий"] += 1
+        totals["обновлений"] += self.updates
+        totals["запросов к Bot API"] += self.session.requests_by_user[self.user.id]
+
+    def finish(self):
+        """Дописывает запросы к БД после того, как закончилась фоновая подгрузка карточек."""
+        self.stats.scenarios[self.scenario]["запросов к БД"] += self.queries[0]
+
+
+def build_dispatcher(db: Database) -> Dispatcher:
+    """Dispatcher, собранный так же, как в bot.py, плюс HandlerProbe."""
+    dp = Dispatcher(storage=PostgresStorage(db))
+    for observer in (dp.message, dp.callback_query, dp.inline_query, dp.pre_checkout_query, dp.chat_member):
+        observer.middleware(LoggingMiddleware())
+        observer.middleware(MetricsMiddleware())
+        observer.middleware(HandlerProbe())
+    dp.include_router(router)
+    return dp
+
+
+async def cleanup(db: Database):
+    """Удаляет всё, что оставили синтетические пользователи."""
+    for query in CLEANUP_SQL:
+        await db.execute(query, FIRST_USER_ID, statement="cleanup")
+    await db.execute("DELETE FROM fsm_storage WHERE key LIKE $1", f"fsm:{BOT_ID}:%", statement="cleanup")
+    await db.execute("UPDATE products SET image_file_id = NULL WHERE image_file_id LIKE $1", f"{FILE_ID_PREFIX}%",
+                     statement="cleanup")
+
+
+def percentiles(values: list[float]) -> tuple[float, float, float]:
+    if len(values) < 2:
+        return (values[0],) * 3 if values else (0, 0, 0)
+    cuts = statistics.quantiles(values, n=100, method="inclusive")
+    return cuts[49], cuts[94], cuts[98]
+
+
+def report(stats: Stats, session: FakeTelegramSession, elapsed: float, users: int):
+    print(f"\nПользователей: {users}, обновлений: {stats.updates}, время: {elapsed:.1f} с, "
+          f"пропускная способность: {stats.updates / elapsed:.0f} обновлений/с")
+
+    print(f"\n{'обработчик':<30} | {'обновлений':>10} | {'p50, мс':>8} | {'p95, мс':>8} | {'p99, мс':>8} | "
+          f"{'БД/обн.':>7}")
+    for handler, latencies in sorted(stats.latencies.items(), key=lambda item: -sum(item[1])):
+        p50, p95, p99 = percentiles(latencies)
+        print(f"{handler:<30} | {len(latencies):>10} | {p50 * 1000:>8.2f} | {p95 * 1000:>8.2f} | "
+              f"{p99 * 1000:>8.2f} | {stats.queries[handler] / len(latencies):>7.2f}")
+
+    print(f"\n{'сценарий':<10} | {'сессий':>6} | {'обновлений':>10} | {'БД/сессию':>9} | {'Bot API/сессию':>14}")
+    for scenario, totals in stats.scenarios.items():
+        sessions = totals["сессий"]
+        print(f"{scenario:<10} | {sessions:>6} | {totals['обновлений'] / sessions:>10.1f} | "
+              f"{totals['запросов к БД'] / sessions:>9.1f} | {totals['запросов к Bot API'] / sessions:>14.1f}")
+
+    print("\nЗапросы к Bot API: " + ", ".join(f"{method} {count}" for method, count in session.requests.most_common()))
+    waited = [series for series in OUTGOING_WAIT.series.values() if series[2]]
+    if waited:
+        count, total = sum(series[2] for series in waited), sum(series[1] for series in waited)
+        print(f"Очередь по лимитам скорости: {count} запросов, ожидание в среднем {total / count * 1000:.0f} мс, "
+              f"объединено правок: {sum(OUTGOING_COALESCED.values.values())}")
+    if stats.errors:
+        print("\nОшибки:")
+        for error, count in stats.errors.most_common():
+            print(f"  {count} × {error}")
+
+
+async def main(args):
+    setup_logging()
+    logging.getLogger().setLevel(args.log_level)
+    db = Database()
+    await db.connect()
+    session = FakeTelegramSession(latency=args.api_latency_ms / 1000)
+    if args.rate_limit:
+        session.middleware(RateLimitMiddleware())
+    bot = Bot(BOT_TOKEN, session=session)
+    try:
+        await cleanup(db)
+        dp = build_dispatcher(db)
+        stats = Stats()
+        rng = random.Random(args.seed)
+        semaphore = asyncio.Semaphore(args.concurrency)
+
+        users = [SimulatedUser(FIRST_USER_ID + number, dp, bot, stats, random.Random(rng.random()),
+                               args.think_ms / 1000) for number in range(args.users)]
+
+        async def run_user(user: SimulatedUser):
+            async with semaphore:
+                await user.run(args.buy_share, args.max_pages)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(run_user(user) for user in users))
+        elapsed = time.perf_counter() - started
+        await asyncio.gather(*db.background_tasks)  # Фоновая подгрузка карточек
+        for user in users:
+            user.finish()
+        report(stats, session, elapsed, args.users)
+    finally:
+        if not args.keep:
+            await cleanup(db)
+        await db.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=500, help="сколько пользователей пройдут сценарий")
+    parser.add_argument("--concurrency", type=int, default=50, help="сколько пользователей активны одновременно")
+    parser.add_argument("--buy-share", type=float, default=0.3, help="доля пользователей, которые покупают")
+    parser.add_argument("--max-pages", type=int, default=10, help="сколько товаров пролистать, не больше")
+    parser.add_argument("--api-latency-ms", type=float, default=0, help="задержка ответа Bot API")
+    parser.add_argument("--think-ms", type=float, default=0, help="средняя пауза пользователя между действиями")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--log-level", default="WARNING", help="уровень логов бота на время теста")
+    parser.add_argument("--rate-limit", action="store_true", help="пропускать запросы к Bot API через RateLimitMiddleware")
+    parser.add_argument("--keep", action="store_true", help="не удалять данные пользователей после прогона")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,102 @@
+import asyncio
+import signal
+
+from aiogram import Bot, Dispatcher
+from aiogram.types import Update
+from aiohttp import web
+
+from config import (WEBHOOK_URL, WEBHOOK_PATH, WEBHOOK_SECRET, WEBAPP_HOST, WEBAPP_PORT,
+                    WEBHOOK_MAX_CONCURRENCY, SHUTDOWN_TIMEOUT)
+from logger import logger
+from metrics import handle_metrics
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+
+class WebhookServer:
+    """Принимает обновления от Telegram по HTTP и обрабатывает их параллельно.
+
+    Одновременно выполняется не больше max_concurrency обработчиков: когда все
+    слоты заняты, ответ Telegram задерживается, и он сам сбавляет темп.
+    При остановке сервер дожидается завершения уже принятых обновлений.
+    """
+
+    def __init__(self, dp: Dispatcher, bot: Bot, max_concurrency: int = WEBHOOK_MAX_CONCURRENCY):
+        self.dp = dp
+        self.bot = bot
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.tasks = set()
+
+    def create_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post(WEBHOOK_PATH, self.handle_update)
+        app.router.add_get("/healthz", self.handle_health)
+        app.router.add_get("/metrics", handle_metrics)
+        app.on_startup.append(self.on_startup)
+        app.on_shutdown.append(self.on_shutdown)
+        return app
+
+    async def handle_update(self, request: web.Request) -> web.Response:
+        if WEBHOOK_SECRET and request.headers.get(SECRET_HEADER) != WEBHOOK_SECRET:
+            return web.Response(status=401)
+        try:
+            update = Update.model_validate(await request.json(), context={"bot": self.bot})
+        except ValueError as e:
+            logger.warning(f"⚠️ Некорректное обновление от webhook: {e}")
+            return web.Response(status=400)
+
+        await self.semaphore.acquire()
+        task = asyncio.create_task(self._process(update))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+        return web.Response()
+
+    async def _process(self, update: Update):
+        try:
+            await self.dp.feed_update(self.bot, update)
+        except Exception as e:
+            logger.error(f"❌ Ошибка обработки обновления {update.update_id}: {e}")
+        finally:
+            self.semaphore.release()
+
+    async def handle_health(self, request: web.Request) -> web.Response:
+        return web.json_response({"status": "ok", "in_flight": len(self.tasks)})
+
+    async def on_startup(self, app: web.Application):
+        await self.dp.emit_startup(bot=self.bot)
+        if WEBHOOK_URL:
+            await self.bot.set_webhook(
+                url=f"{WEBHOOK_URL.rstrip('/')}{WEBHOOK_PATH}",
+                secret_token=WEBHOOK_SECRET or None,
+                allowed_updates=self.dp.resolve_used_update_types(),
+            )
+            logger.info(f"🌐 Webhook установлен: {WEBHOOK_URL}{WEBHOOK_PATH}")
+
+    async def on_shutdown(self, app: web.Application):
+        if self.tasks:
+            logger.info(f"⏳ Ждём завершения {len(self.tasks)} обработчиков...")
+            _, pending = await asyncio.wait(set(self.tasks), timeout=SHUTDOWN_TIMEOUT)
+            for task in pending:
+                task.cancel()
+        await self.dp.emit_shutdown(bot=self.bot)
+        await self.bot.session.close()
+
+
+async def run_webhook(dp: Dispatcher, bot: Bot):
+    """Запускает webhook-сервер и работает до SIGINT/SIGTERM."""
+    server = WebhookServer(dp, bot)
+    runner = web.AppRunner(server.create_app(), access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, WEBAPP_HOST, WEBAPP_PORT)
+    await site.start()
+    logger.info(f"✅ Webhook-сервер слушает {WEBAPP_HOST}:{WEBAPP_PORT}")
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+    try:
+        await stop.wait()
+    finally:
+        # Останавливает приём запросов и дожидается обработчиков (on_shutdown)
+        await runner.cleanup()